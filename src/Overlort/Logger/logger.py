@@ -1,5 +1,16 @@
+import atexit
+import copy
+import json
+import logging
+import time
+from datetime import datetime
+from functools import lru_cache
+from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+from typing import Dict, Optional
+
 from pydantic import BaseModel
-from typing import Dict
 
 class LogConfig(BaseModel):
     """Logging configuration to be set for the server"""
@@ -28,4 +39,126 @@ class LogConfig(BaseModel):
     loggers: Dict = {
         LOGGER_NAME: {"handlers": ["default"], "level": LOG_LEVEL},
     }
-    
+
+
+# the fields of a record written in addition to the message in JSON lines
+_JSON_FIELDS = ("workflow", "request", "quantity")
+
+
+@lru_cache(maxsize=4)
+def _cet_timetuple(second: int) -> time.struct_time:
+    # imported here, as it is only needed once the log is written
+    import pytz
+
+    return datetime.fromtimestamp(second, tz=pytz.timezone("CET")).timetuple()
+
+
+def cet_converter(timestamp: Optional[float] = None) -> time.struct_time:
+    """This function converts the time of a record to CET. The conversion is cached
+    per second, as the records of a tick share it.
+
+    :param timestamp: the seconds since the epoch, defaults to None for now
+    :type timestamp: Optional[float], optional
+    :return: the time in CET
+    :rtype: time.struct_time
+    """
+    return _cet_timetuple(int(time.time() if timestamp is None else timestamp))
+
+
+class JSONFormatter(logging.Formatter):
+    """A class formatting records as JSON lines, so they can be searched by the
+    UUIDs of the workflow and request they concern.
+
+    The UUIDs are passed as `extra={"workflow": ..., "request": ...}` to the call of
+    the logger.
+    """
+
+    converter = staticmethod(cet_converter)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + ".%03d" % record.msecs,
+            "level": record.levelname,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        for field in _JSON_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    # the message is merged in the calling thread, as its arguments may change
+    # later, but the traceback is kept apart for the formatters
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def formatException(self, exc_info) -> str:
+        return logging.Formatter().formatException(exc_info)
+
+
+class _QueueListener(QueueListener):
+    # stopping twice, by the caller and at exit, must not fail
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(settings: dict) -> QueueListener:
+    """This function sets up the logger of the Overlort. The logger only puts the
+    records in a queue, from which a background thread writes them to stderr and to
+    a file rotated by its size, so writing the log never stalls the loop.
+
+    It may be called again, e.g. in a worker process, and replaces the previous setup.
+
+    :param settings: the logging settings as in conf["logging"]
+    :type settings: dict
+    :return: the listener writing the records, to be stopped at the end
+    :rtype: QueueListener
+    """
+    config = LogConfig()
+    dictConfig(config.model_dump())
+    logger = logging.getLogger(config.LOGGER_NAME)
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        if handler.formatter is not None:
+            handler.formatter.converter = cet_converter
+    if settings.get("filepath"):
+        fileHandler = RotatingFileHandler(
+            filename=settings["filepath"],
+            maxBytes=settings.get("max_bytes", 0),
+            backupCount=settings.get("backup_count", 0),
+            encoding="utf-8",
+        )
+        if settings.get("json"):
+            fileHandler.setFormatter(JSONFormatter())
+        else:
+            logFileFormatter = logging.Formatter(
+                fmt="%(levelname)s %(asctime)s (%(relativeCreated)d) \t %(pathname)s request: %(funcName)s - Info: %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S CET",
+            )
+            logFileFormatter.converter = cet_converter
+            fileHandler.setFormatter(logFileFormatter)
+        fileHandler.setLevel(settings.get("file_level", logging.INFO))
+        handlers.append(fileHandler)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    queue = SimpleQueue()
+    logger.addHandler(_QueueHandler(queue))
+    logger.setLevel(settings.get("level", config.LOG_LEVEL))
+    listener = _QueueListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,316 @@
+import bisect
+import functools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger("Overlogger")
+
+# upper bounds of the buckets of the histograms in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_NULL = nullcontext()
+
+
+def endpoint(path: str) -> str:
+    """This function turns the path of a call into the endpoint it was sent to by
+    replacing the UUIDs in it.
+
+    :param path: the path, e.g. "/results_requested/<uuid>"
+    :type path: str
+    :return: the endpoint, e.g. "/results_requested/{id}"
+    :rtype: str
+    """
+    return _UUID.sub("{id}", path)
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(name: str, labels: tuple, extra: tuple = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return name
+    return name + "{" + ",".join(
+        key + '="' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for key, value in labels
+    ) + "}"
+
+
+class Metrics:
+    """A class collecting counters, gauges and histograms of the Overlort and
+    rendering them in the text format of Prometheus.
+
+    Metrics are identified by their name and labels. While the collection is
+    disabled, all calls return right away, so the instrumentation can stay in place.
+
+    :param enabled: collect the metrics, defaults to False
+    :type enabled: bool, optional
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        # (name, labels) -> [counts per bucket, sum, count]
+        self._histograms: dict[tuple, list] = {}
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        """This function sets the type and help text of a metric.
+
+        :param name: the name of the metric
+        :type name: str
+        :param kind: "counter", "gauge" or "histogram"
+        :type kind: str
+        :param text: the help text
+        :type text: str
+        """
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """This function increases a counter.
+
+        :param name: the name of the counter
+        :type name: str
+        :param value: the increase, defaults to 1
+        :type value: float, optional
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """This function sets a gauge.
+
+        :param name: the name of the gauge
+        :type name: str
+        :param value: the value
+        :type value: float
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """This function adds a value to a histogram.
+
+        :param name: the name of the histogram
+        :type name: str
+        :param value: the value, e.g. a duration in seconds
+        :type value: float
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            histogram[0][bisect.bisect_left(BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def timer(self, name: str, **labels):
+        """This function returns a context manager adding the time spent in it to a
+        histogram.
+
+        :param name: the name of the histogram
+        :type name: str
+        :return: the context manager
+        :rtype: ContextManager
+        """
+        if not self.enabled:
+            return _NULL
+        return self._timer(name, labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """This function returns a decorator adding the time spent in a function to
+        a histogram.
+
+        :param name: the name of the histogram
+        :type name: str
+        :return: the decorator
+        :rtype: Callable
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timer(name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        """This function renders all metrics in the text format of Prometheus.
+
+        :return: the metrics
+        :rtype: str
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                kind, text = self._help.get(name, (kind, ""))
+                if text:
+                    lines.append("# HELP " + name + " " + text)
+                lines.append("# TYPE " + name + " " + kind)
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(_format(name, labels) + " " + repr(float(value)))
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge")
+            lines.append(_format(name, labels) + " " + repr(float(value)))
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(_format(name + "_bucket", labels, (("le", le),)) + " " + str(cumulative))
+            lines.append(_format(name + "_sum", labels) + " " + repr(total))
+            lines.append(_format(name + "_count", labels) + " " + str(count))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """This function drops all values collected."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+
+class MetricsExporter:
+    """A class publishing the metrics on a local HTTP endpoint, in a file or both.
+
+    The endpoint answers GET /metrics. The file is written every `interval_s`
+    seconds and when the exporter is closed.
+
+    :param metrics: the metrics to publish
+    :type metrics: Metrics
+    :param host: the address to listen on, defaults to "127.0.0.1"
+    :type host: str, optional
+    :param port: the port to listen on, defaults to None for no endpoint
+    :type port: Optional[int], optional
+    :param filepath: the file to write the metrics to, defaults to None for no file
+    :type filepath: Optional[str], optional
+    :param interval_s: the time between two writes of the file, defaults to 60
+    :type interval_s: float, optional
+    """
+
+    def __init__(
+        self,
+        metrics: "Metrics",
+        host: str = "127.0.0.1",
+        port: Optional[int] = None,
+        filepath: Optional[str] = None,
+        interval_s: float = 60,
+    ):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.filepath = filepath or None
+        self.interval_s = interval_s
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        """This function starts publishing in background threads."""
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            self._threads.append(threading.Thread(
+                target=self._server.serve_forever, name="MetricsServer", daemon=True
+            ))
+            logger.info("Serving metrics on %s:%s/metrics", self.host, self.port)
+        if self.filepath is not None:
+            self._threads.append(threading.Thread(target=self._dump_loop, name="MetricsDump", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        """This function stops publishing and writes the file a last time."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.filepath is not None:
+            self.dump()
+
+    def dump(self) -> None:
+        """This function writes the metrics to the file."""
+        # imported here, as the storage package is no dependency of the logging
+        from ..storage.snapshots import write_atomic
+
+        write_atomic(self.filepath, self.metrics.render().encode("utf-8"))
+
+    def _dump_loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.dump()
+            except OSError as error:
+                logger.error("Could not write metrics to %s: %s", self.filepath, error)
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                data = exporter.metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# the metrics of the Overlort
+metrics = Metrics()
+metrics.describe("overlort_phase_seconds", "histogram", "Time spent in a phase of the loop")
+metrics.describe("overlort_ticks_total", "counter", "Iterations of the loop")
+metrics.describe("overlort_http_requests_total", "counter", "Calls to FINALES by endpoint and status")
+metrics.describe("overlort_open_workflows", "gauge", "Workflows in progress")
+metrics.describe("overlort_queue_length", "gauge", "Open requests by the quantity they wait for")
+metrics.describe("overlort_state_bytes", "gauge", "Size of the state on disk")
+metrics.describe("overlort_calculations_total", "counter", "Evaluations of a calculator, memoized or not")
+metrics.describe("overlort_calculation_seconds", "histogram", "Time spent in a calculator")
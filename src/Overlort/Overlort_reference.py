@@ -1,26 +1,46 @@
+import functools
 import json
+import threading
 import time
+from collections import Counter
 from datetime import datetime, timezone
-from typing import Any, Callable, Optional, Union, cast, Dict
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union, cast, Dict
 import os
 
-import requests
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
-from FINALES2.engine.main import RequestStatus, ResultStatus
-from FINALES2.schemas import GeneralMetaData, Quantity, ServerConfig, Method, Quantity
-from FINALES2.server.schemas import Request, Result
+from FINALES2.schemas import GeneralMetaData, Quantity, ServerConfig, Method
 from FINALES2.user_management.classes_user_manager import User
 
-from configuration.config import conf
-from calculations import volume, CV_I_cutoff, CV_I_cutoff_formation, capacity, I_max
-from calculations.default_values import default_values
+from .configuration.config import conf
+from .workflow.request_queue import RequestQueue
+from .calculations import registry as calculations
 import copy
 
-from logging.config import dictConfig
 import logging
-import pytz
-from Logger.logger import LogConfig
+from .Logger.metrics import metrics
+
+# the server schemas pull in the FINALES server, so they are imported where used.
+# The helpers of the tenant are imported, when a tenant is created, so importing
+# the class stays cheap.
+if TYPE_CHECKING:
+    from FINALES2.server.schemas import Request
+    from .connection.token_manager import TokenManager
+    from .connection.client import FINALESClient
+    from .connection.poller import ResultPoller
+    from .connection.poster import RequestPoster
+    from .connection.scheduler import PollScheduler
+    from .connection.subscription import ResultListener
+    from .storage.journal import StateJournal
+    from .storage.sqlite_store import SQLiteStore
+    from .storage.schema_cache import SchemaCache
+    from .storage.blobs import BlobStore
+    from .storage.final_result import FinalResultWriter
+    from .workflow.state_machine import WorkflowStateMachine
+    from .workflow.templates import TemplateCompiler
+    from .workflow.discovery import RequestDiscovery
+    from .workflow.limitations import LimitationValidator
+    from .Logger.metrics import MetricsExporter
 
 # Generate all the objects needed to instantiate the Overlort
 
@@ -36,8 +56,9 @@ class Overlort(BaseModel):
     :return: An instance of a tenant object
     :rtype: Tenant
     """
-    general_meta: GeneralMetaData = GeneralMetaData(name='Overlort', description='Workflow tenant')
-    quantities:  Dict = {
+    # the defaults are only built, when a tenant is created
+    general_meta: GeneralMetaData = Field(default_factory=lambda: GeneralMetaData(name='Overlort', description='Workflow tenant'))
+    quantities:  Dict = Field(default_factory=lambda: {
     "degradationEOL": Quantity(
         name = "degradationEOL", 
         is_active = "True",
@@ -217,18 +238,133 @@ class Overlort(BaseModel):
     )
     }
     )
-    }
+    })
     queue: list = []
-    sleep_time_s: int =conf["sleep_time_s"]
-    tenant_config: str = str(conf)
+    sleep_time_s: float = Field(default_factory=lambda: conf["sleep_time_s"])
+    tenant_config: str = Field(default_factory=lambda: str(conf))
     authorization_header: Optional[dict] = None
-    FINALES_server_config: ServerConfig = ServerConfig(host=conf["FINALES_server_conf"]['host'], port=conf["FINALES_server_conf"]['port'])
-    end_run_time: datetime = conf["end_run_time"]
-    operators: list = [User(**conf["operator"])]
-    tenant_user: User = User(**conf["tenant_user"])
+    FINALES_server_config: ServerConfig = Field(default_factory=lambda: ServerConfig(host=conf["FINALES_server_conf"]['host'], port=conf["FINALES_server_conf"]['port']))
+    end_run_time: datetime = Field(default_factory=lambda: conf["end_run_time"])
+    operators: list = Field(default_factory=lambda: [User(**conf["operator"])])
+    tenant_user: User = Field(default_factory=lambda: User(**conf["tenant_user"]))
     tenant_uuid: str =""
-    request_queue: list  = [] # list of lists with [request]  
+    request_queue: RequestQueue = Field(default_factory=RequestQueue) # open requests with [requestID, workflowID]
     resultobjects: Dict = {}
+    shard: int = 0 # the worker of a sharded Overlort
+    shards: int = 1
+    _token_manager: "TokenManager" = PrivateAttr()
+    _client: "FINALESClient" = PrivateAttr()
+    _result_poller: "ResultPoller" = PrivateAttr()
+    _request_poster: "RequestPoster" = PrivateAttr()
+    _poll_scheduler: "PollScheduler" = PrivateAttr()
+    _listener: Optional["ResultListener"] = PrivateAttr(default=None)
+    _next_discovery: float = PrivateAttr(default=0.0)
+    _schema_cache: "SchemaCache" = PrivateAttr()
+    _journal: Union["StateJournal", "SQLiteStore"] = PrivateAttr()
+    _workflow: "WorkflowStateMachine" = PrivateAttr()
+    _templates: "TemplateCompiler" = PrivateAttr()
+    _blobs: "BlobStore" = PrivateAttr()
+    _final_results: "FinalResultWriter" = PrivateAttr()
+    _discovery: "RequestDiscovery" = PrivateAttr()
+    _limitations: dict = PrivateAttr(default_factory=dict)
+    _exporter: Optional["MetricsExporter"] = PrivateAttr(default=None)
+    _queue_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _defer_saves: bool = PrivateAttr(default=False)
+    _save_pending: bool = PrivateAttr(default=False)
+    _ticks: int = PrivateAttr(default=0) # iterations of the loop
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def model_post_init(self, __context: Any) -> None:
+        from .connection.token_manager import TokenManager
+        from .connection.client import FINALESClient
+        from .connection.poller import ResultPoller
+        from .connection.poster import RequestPoster, TokenBucket
+        from .connection.scheduler import PollScheduler
+        from .connection.subscription import ResultListener
+        from .storage.journal import StateJournal
+        from .storage.sqlite_store import SQLiteStore
+        from .storage.schema_cache import SchemaCache
+        from .storage.blobs import BlobStore
+        from .storage.final_result import FinalResultWriter
+        from .workflow.state_machine import WorkflowStateMachine
+        from .workflow.templates import TemplateCompiler
+        from .workflow.discovery import RequestDiscovery
+        from .calculations.default_values import default_values
+
+        self._client = FINALESClient(
+            host=self.FINALES_server_config.host,
+            port=self.FINALES_server_config.port,
+            max_in_flight=conf["async_engine"]["max_concurrency"],
+            **conf["http_client"],
+        )
+        self._token_manager = TokenManager(
+            url=self._client.url("/user_management/authenticate"),
+            username=self.tenant_user.username,
+            password=self.tenant_user.password,
+            lifetime_s=conf["authentication"]["token_lifetime_s"],
+            refresh_margin_s=conf["authentication"]["refresh_margin_s"],
+            session=self._client.session,
+        )
+        self._client.token_manager = self._token_manager
+        self._result_poller = ResultPoller(self._client)
+        polling = dict(conf["polling"])
+        if conf["subscription"]["enabled"]:
+            subscription = conf["subscription"]
+            self._listener = ResultListener(
+                host=subscription["host"],
+                port=subscription["port"],
+                path=subscription["path"],
+                token=subscription["token"],
+                keep_s=subscription["keep_s"],
+            )
+            # results are pushed, the polls only catch the missed ones
+            polling["min_interval_s"] = max(polling["min_interval_s"], subscription["reconcile_interval_s"])
+        self._poll_scheduler = PollScheduler(**polling)
+        self._request_poster = RequestPoster(
+            self._client,
+            rate_limiter=TokenBucket(
+                rate_per_s=conf["request_posting"]["rate_per_s"],
+                burst=conf["request_posting"]["burst"],
+            ),
+            max_workers=conf["request_posting"]["max_workers"],
+        )
+        self._schema_cache = SchemaCache(
+            fetch=self._fetch_schema,
+            filepath=conf["schema_cache"]["filepath"],
+            ttl_s=conf["schema_cache"]["ttl_s"],
+            max_entries=conf["schema_cache"]["max_entries"],
+        )
+        if conf["state"]["backend"] == "sqlite":
+            self._journal = SQLiteStore(filepath=conf["state"]["database"])
+        else:
+            self._journal = StateJournal(
+                filepath=conf["state"]["filepath"],
+                compact_every=conf["state"]["compact_every"],
+                keep_snapshots=conf["state"]["keep_snapshots"],
+            )
+        self._workflow = WorkflowStateMachine(conf["workflow"])
+        self._discovery = RequestDiscovery(
+            supported=[
+                (quantity, method)
+                for quantity in self.quantities
+                for method in self.quantities[quantity].methods
+            ],
+            max_seen=conf["discovery"]["max_seen"],
+        )
+        self._final_results = FinalResultWriter(directory=conf["archive"]["directory"])
+        self._blobs = BlobStore(
+            directory=conf["blob_store"]["directory"],
+            min_bytes=conf["blob_store"]["min_bytes"],
+        )
+        self._templates = TemplateCompiler(
+            # results are memoized per workflow and cell by the registry
+            calculators={
+                name: functools.partial(calculations.calculate, name)
+                for name in calculations.names()
+            },
+            default_values=default_values,
+        )
 
 
     def tenant_object_to_json(self):
@@ -269,39 +405,17 @@ class Overlort(BaseModel):
     def _login(func: Callable):
         # Impelemented using this tutorial as an example:
         # https://realpython.com/primer-on-python-decorators/#is-the-user-logged-in
+        # The token is cached by the token manager and only renewed shortly before
+        # it expires, so wrapped calls do not cost an extra round trip. Requests are
+        # sent through `self._client`, which authenticates again once if the server
+        # rejects the token.
         def _login_func(self, *args, **kwargs):
-            #print("Logging in ...")
-            access_information = requests.post(
-                (
-                    f"http://{self.FINALES_server_config.host}:"
-                    f"{self.FINALES_server_config.port}/user_management/authenticate"
-                ),
-                data={
-                    "grant_type": "",
-                    "username": f"{self.tenant_user.username}",
-                    "password": f"{self.tenant_user.password}",
-                    "scope": "",
-                    "client_id": "",
-                    "client_secret": "",
-                },
-                headers={
-                    "accept": "application/json",
-                    "Content-Type": "application/x-www-form-urlencoded",
-                },
-            )
-            access_information = access_information.json()
-            self.authorization_header = {
-                "accept": "application/json",
-                "Authorization": (
-                    f"{access_information['token_type'].capitalize()} "
-                    f"{access_information['access_token']}"
-                ),
-            }
+            self.authorization_header = self._token_manager.header()
             return func(self, *args, **kwargs)
 
         return _login_func
 
-    def _checkQuantity(self, request: Request) -> bool:
+    def _checkQuantity(self, request: "Request") -> bool:
         """This function checks, if a quantity in a request can be provided by the
         tenant.
 
@@ -316,7 +430,7 @@ class Overlort(BaseModel):
         tenantQuantitites = self.quantities.keys()
         return requestedQuantity in tenantQuantitites
 
-    def _checkMethods(self, request: Request, requestedQuantity: str) -> list[str]:
+    def _checkMethods(self, request: "Request", requestedQuantity: str) -> list[str]:
         """This function checks the methods in the request, if they are available in
         from the tenant and returns the names of the matching methods in a list.
 
@@ -338,7 +452,7 @@ class Overlort(BaseModel):
                 matchingMethods.append(method)
         return matchingMethods
 
-    def _checkParameters(self, request: Request, method: str) -> bool:
+    def _checkParameters(self, request: "Request", method: str) -> bool:
         """This function checks the requested parameters for their compatibility
         with the tenant.
 
@@ -352,25 +466,37 @@ class Overlort(BaseModel):
         within the limitations of the tenant (True) or not (False)
         :rtype: bool
         """
-        # TODO: Reactivate this check. This requires a parsing of the input and
-        # limitations.
-        # parametersCheck = []
-        # requestParameters = request.parameters[method]
-        # methodForQuantity = self.quantities[request.quantity].methods[method]
-        # for p in requestParameters.keys():
-        #     if isinstance(requestParameters[p], (float, int)):
-        #         if isinstance(methodForQuantity.limitations[p], dict):
-        #             tenantMin = methodForQuantity.limitations[p]["min"]
-        #             tenantMax = methodForQuantity.limitations[p]["max"]
-        #         elif isinstance(methodForQuantity.limitations[p], float):
-
-        #         minimumOK = requestParameters[p] > tenantMin
-        #         maximumOK = requestParameters[p] < tenantMax
-        #         parametersCheck.append(minimumOK and maximumOK)
-        # parametersOK: bool = all(parametersCheck)
-        # return parametersOK
-        return True
+        validator = self._limitation_validator(request.quantity, method)
+        if validator is None:
+            return True
+        violations = validator.validate(request.parameters.get(method) or {})
+        if violations:
+            logger.info(
+                "Parameters for method %s out of the limitations: %s", method, "; ".join(violations)
+            )
+        # with the check switched off, violations are only logged
+        return not violations or not conf["discovery"]["check_limitations"]
     
+    def _limitation_validator(self, quantity: str, method: str) -> Optional["LimitationValidator"]:
+        """This function returns the validator of the limitations of a method. The
+        limitations of each method are compiled once, when they are first needed.
+
+        :param quantity: the quantity
+        :type quantity: str
+        :param method: the method
+        :type method: str
+        :return: the validator or None, if the tenant does not provide the method
+        :rtype: Optional[LimitationValidator]
+        """
+        from .workflow.limitations import LimitationValidator
+
+        key = (quantity, method)
+        if key not in self._limitations:
+            if quantity not in self.quantities or method not in self.quantities[quantity].methods:
+                return None
+            self._limitations[key] = LimitationValidator(self.quantities[quantity].methods[method].limitations)
+        return self._limitations[key]
+
     @_login
     def _update_queue(self) -> None:
         """This function clears and recreates the queue of the tenant."""
@@ -378,6 +504,7 @@ class Overlort(BaseModel):
         # listed in the queue are still pending and were not worked on by another
         # tenant
         self.queue.clear
+        from FINALES2.server.schemas import Request
 
         # get the pending requests from the FINALES server
         pendingRequests = self._get_pending_requests()
@@ -424,13 +551,21 @@ class Overlort(BaseModel):
         """
         #print("Looking for tasks ...")
         # get the pending requests from the FINALES server
-        pendingRequests = requests.get(
-            f"http://{self.FINALES_server_config.host}"
-            f":{self.FINALES_server_config.port}/pending_requests/",
-            params={},
-            headers=self.authorization_header,
-        )
-        return pendingRequests.json()
+        if not conf["discovery"]["server_filter"]:
+            pendingRequests = self._client.get(
+                "/pending_requests/",
+                params={},
+            )
+            return pendingRequests.json()
+        # let the server leave out the requests for other quantities
+        pendingRequests = []
+        for quantity in sorted(self._discovery.quantities):
+            response = self._client.get(
+                "/pending_requests/",
+                params={"quantity": quantity},
+            )
+            pendingRequests.extend(response.json())
+        return pendingRequests
 
     # TODO: implement (input) validations.
     @_login
@@ -451,6 +586,7 @@ class Overlort(BaseModel):
             keys are the names of the parameters
         :type parameters: dict[str, dict[str, Any]]
         """
+        from FINALES2.server.schemas import Request
 
         request = Request(
             quantity=quantity,
@@ -459,15 +595,13 @@ class Overlort(BaseModel):
             tenant_uuid=self.tenant_uuid,
         ).model_dump()
 
-        _posted_request = requests.post(
-            f"http://{self.FINALES_server_config.host}"
-            f":{self.FINALES_server_config.port}/requests/",
+        _posted_request = self._client.post(
+            "/requests/",
             json=request,
             params={},
-            headers=self.authorization_header,
         )
         _posted_request.raise_for_status()
-        logger.info(f"Request is posted {_posted_request.json()}!")
+        logger.info("Request is posted %s!", _posted_request.json())
 
     # TODO: implement (input) validations.
     @_login
@@ -502,11 +636,9 @@ class Overlort(BaseModel):
                     "be specified."
                 )
             # get the results from the FINALES server
-            results = requests.get(
-                f"http://{self.FINALES_server_config.host}"
-                f":{self.FINALES_server_config.port}/results_requested/",
+            results = self._client.get(
+                "/results_requested/",
                 params={"quantity": quantity, "method": method},
-                headers=self.authorization_header,
             )
             return results.json()
         else:
@@ -516,11 +648,9 @@ class Overlort(BaseModel):
                     "be specified."
                 )
             # get the result for this ID from the FINALES server
-            result = requests.get(
-                f"http://{self.FINALES_server_config.host}"
-                f":{self.FINALES_server_config.port}/results_requested/{request_id}",
+            result = self._client.get(
+                f"/results_requested/{request_id}",
                 params={},
-                headers=self.authorization_header,
             )
             return result.json()
 
@@ -539,26 +669,23 @@ class Overlort(BaseModel):
         result_formatted["tenant_uuid"] = self.tenant_uuid
 
         # post the result
-        _posted_result = requests.post(
-            f"http://{self.FINALES_server_config.host}"
-            f":{self.FINALES_server_config.port}/results/",
+        _posted_result = self._client.post(
+            "/results/",
             json=result_formatted,
             params={},
-            headers=self.authorization_header,
         )
         _posted_result.raise_for_status()
-        logger.info(f"Result is posted {_posted_result.json()}!")
+        logger.info("Result is posted %s!", _posted_result.json())
 
         # delete the request from the queue
         self.queue.remove(request)
         requestUUID = request["uuid"]
-        logger.info(f"Removed request with UUID {requestUUID} from the queue.")
+        logger.info("Removed request with UUID %s from the queue.", requestUUID)
 
     @_login
     def change_status(self,requestID, new_status):
-        reserved = requests.post("http://{}:{}/requests/{}/update_status/".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"], requestID),
+        reserved = self._client.post(f"/requests/{requestID}/update_status/",
                                             params={'request_id' : requestID, 'new_status': new_status},
-                                            headers=self.authorization_header,
                                             ).json()
         logger.info(reserved)
         
@@ -566,11 +693,7 @@ class Overlort(BaseModel):
     def _check_Input(self,request):
         quantity = request["quantity"]
         method = request["methods"][0]
-        schemas = requests.get(
-            "http://{}:{}/capabilities/templates".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-            params={'quantity': quantity, 'method': method},
-            headers=self.authorization_header,
-        ).json()
+        schemas = self._get_schema(quant=quantity, met=method)
        
         
     def update_resultobject(self,result,resultobjects):
@@ -582,38 +705,26 @@ class Overlort(BaseModel):
                     self.resultobjects[l][original_request_id][n] = result
         
     def check_next_quantity(self,last_req,resultobjects_req):
-        logger.info('Check next quantity after '+ str(last_req['quantity']))
-        if resultobjects_req["request_0"]["request"]["request"]["quantity"] == conf['workflow'][0][0] and resultobjects_req["request_0"]["request"]["request"]["methods"][0]==conf['workflow'][0][1]: # inital request is step 0 in worklflow
-            next_quantity = conf['workflow'][0][0]
-            next_method =  conf['workflow'][0][1]
-            return(next_quantity, next_method) 
-        if last_req['quantity'] == "degradationEOL" and last_req['methods'][0]=="degradation_workflow": # inital request is step 0 in worklflow
-            next_quantity = conf['workflow'][0][0]
-            next_method =  conf['workflow'][0][1]
-            return(next_quantity, next_method) 
-        if "transport-1" in list(resultobjects_req.keys()) and "cell_assembly" in list(resultobjects_req.keys()) and "capacity" not in list(resultobjects_req.keys()): # checks for second transport
-            next_quantity = conf['workflow'][5][0]
-            next_method =  conf['workflow'][5][1]
-            return(next_quantity, next_method) 
-        for o in range(len(conf['workflow'])):   
-            flag = False     
-            if last_req['quantity'] in conf['workflow'][o] and last_req['methods'][0] in conf['workflow'][o] and o != 0: 
-                for n in range(o,-1,-1): # runs backwards through workflow
-                    if conf['workflow'][n][0] == list(resultobjects_req.keys())[-1] or conf['workflow'][n][0]=="capacity":
-                        next_quantity = conf['workflow'][o+1][0]
-                        next_method =  conf['workflow'][o+1][1]
-                        flag = True
-                        break
-                    else:
-                        next_quantity = conf['workflow'][0][0]
-                        next_method =  conf['workflow'][0][1]
-                if flag ==True:
-                    break
-            else:
-                next_quantity = conf['workflow'][1][0]
-                next_method =  conf['workflow'][1][1]
-        return(next_quantity, next_method)       
+        """This function looks up the step to request after the step of a request in
+        the compiled workflow.
+
+        :param last_req: the request, whose result arrived, or the initial request of
+            the workflow
+        :type last_req: dict
+        :param resultobjects_req: the requests and results of the workflow
+        :type resultobjects_req: dict
+        :raises ValueError: if the request is of the last step or of no step of the
+            workflow
+        :return: the quantity and method of the next step
+        :rtype: tuple[str, str]
+        """
+        logger.info("Check next quantity after %s", last_req['quantity'])
+        next_step = self._workflow.next_step(resultobjects_req, last_req)
+        if next_step is None:
+            raise ValueError("The workflow has no step after " + str(last_req['quantity']))
+        return(next_step.quantity, next_step.method)
 
+    @metrics.timed("overlort_phase_seconds", phase="discover")
     @_login
     def _update_new_request(self):
         """This function clears and recreates the queue of the tenant."""
@@ -622,92 +733,92 @@ class Overlort(BaseModel):
         # tenant
         # get the pending requests from the FINALES server
         pendingRequests = self._get_pending_requests()
-        # update the queue of the tenant
-        validatedRequests = []
-        for pendingItem in pendingRequests:
-            # create the Request object from the json string
-            requestDict = pendingItem["request"]
-            request = Request(**requestDict)
-            # check, if the pending request fits with the tenant
-            # check the quantity matches
-            if not self._checkQuantity(request=request):
-                continue
-            # check, if the methods match with the tenant methods
-            # This overwrites the request object. If an appropriate method was found
-            # for the tenant, the methods list of the returned request only contains
-            # the found method. Otherwise, the returned request is unchanged to the
-            # original one
-            matchedMethods = self._checkMethods(
-                request=request, requestedQuantity=request.quantity
-            )
-            if matchedMethods == []:
-                continue
-            # check, if the parameters match with the tenant method
-            #for method in matchedMethods:
-            #    if self._checkParameters(request=request, method=method):
-            #        request.methods = [method]
-            #        break
-            #if _check_Input(requestDict):
-            #    print("Input for Laura")
-            #    break
-            # Reassemble the pendingItem to collect the full request in the queue with
-            # only the method changed to the one, which can be performed by the tenant
-            pendingItem["request"] = request.__dict__
-            validatedRequests.append(pendingItem)
-        return validatedRequests
+        # update the queue of the tenant; requests seen in an earlier tick are not
+        # validated again and those for other tenants not at all
+        accepted = self._discovery.filter(pendingRequests, self._validate_pending_request)
+        if self.shards == 1:
+            return accepted
+        from .workflow.sharding import shard_of
+
+        # a worker of a sharded Overlort only starts the workflows it owns; each
+        # workflow has exactly one owner, so no other worker reserves it as well
+        return [
+            pendingItem for pendingItem in accepted
+            if shard_of(pendingItem["uuid"], self.shards) == self.shard
+        ]
+
+    def _validate_pending_request(self, pendingItem: dict) -> Optional[dict]:
+        """This function checks a pending request for its compatibility with the
+        tenant.
+
+        :param pendingItem: the pending request as received from the FINALES server
+        :type pendingItem: dict
+        :return: the validated request or None, if the tenant cannot work on it
+        :rtype: Optional[dict]
+        """
+        from FINALES2.server.schemas import Request
+
+        # create the Request object from the json string
+        requestDict = pendingItem["request"]
+        request = Request(**requestDict)
+        # check, if the pending request fits with the tenant
+        # check the quantity matches
+        if not self._checkQuantity(request=request):
+            return None
+        # check, if the methods match with the tenant methods
+        # This overwrites the request object. If an appropriate method was found
+        # for the tenant, the methods list of the returned request only contains
+        # the found method. Otherwise, the returned request is unchanged to the
+        # original one
+        matchedMethods = self._checkMethods(
+            request=request, requestedQuantity=request.quantity
+        )
+        if matchedMethods == []:
+            return None
+        # check, if the parameters match with the tenant method, so requests out of
+        # the limitations are never reserved
+        for method in matchedMethods:
+            if self._checkParameters(request=request, method=method):
+                request.methods = [method]
+                break
+        else:
+            return None
+        #if _check_Input(requestDict):
+        #    print("Input for Laura")
+        #    break
+        # Reassemble the pendingItem to collect the full request in the queue with
+        # only the method changed to the one, which can be performed by the tenant
+        return request.__dict__
     
+    @metrics.timed("overlort_phase_seconds", phase="get_schema")
     @_login
     def _get_schema(self, quant , met):
-        schema = requests.get(
-                "http://{}:{}/capabilities/templates".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-                params={'quantity': quant, 'method': met},
-                headers=self.authorization_header,
-            ).json()
+        schema = self._schema_cache.get(quantity=quant, method=met)
         return schema
-    
-    def copy_matching_keys(self,source, target):
-            mismatch_keys=[]
-            for key in source.keys():
-                for targetkey in target.keys():
-                    if key == targetkey:
-                        if isinstance(source[key], dict):
-                            for sourcekey in source[key].keys():
-                                if sourcekey in target[key] :
-                                    source[key][sourcekey] = target[key][sourcekey]
-                                else:
-                                    continue
-                        else:
-                            source[key] = target[key]                                             
-                    elif key in globals():
-                        function = globals()[key]
-                        inst = function(parameter=target)
-                        param_calc= inst.calculate(parameter=target)
-                        source[key] = param_calc
-                        #print('Calculated: '+ str(key))
-                    elif key in default_values:
-                        source[key] = default_values[key]
-                    elif isinstance(target[targetkey], dict): # check if source key in subkey of target
-                        for subtargetkey in target[targetkey].keys():
-                            if key == subtargetkey:
-                                if isinstance(source[key], dict) and isinstance(target[targetkey][subtargetkey], dict) and source[key].keys() == target[targetkey][subtargetkey].keys():
-                                    source[key] =target[targetkey][subtargetkey]
-                                elif isinstance(source[key], dict) and isinstance(target[targetkey][subtargetkey], list): 
-                                    for subkey in source[key].keys():  # check if subkey in source is key yo
-                                        if isinstance(source[key][subkey], list):
-                                            for chemdic in source[key][subkey]:   # check if list of dicts have same keys
-                                                for targetchemdic in target[targetkey][subtargetkey]:
-                                                    if targetchemdic.keys() == chemdic.keys():
-                                                        source[key][subkey] = target[targetkey][subtargetkey]
-                                else:
-                                    continue
-                            else:
-                                if isinstance(source[key], dict):
-                                    self.copy_matching_keys(source[key], target)
-                    elif isinstance(source[key], dict):
-                        self.copy_matching_keys(source[key], target)
-                    else:
-                        mismatch_keys.append(key)
-            return mismatch_keys, source, target
+
+    def _fetch_schema(self, quantity: str, method: str, etag: Optional[str] = None):
+        """This function requests the template of a quantity and method from the
+        server for the schema cache.
+
+        :param quantity: the name of the quantity
+        :type quantity: str
+        :param method: the name of the method
+        :type method: str
+        :param etag: the ETag of the cached template, defaults to None
+        :type etag: Optional[str], optional
+        :return: the template or None, if it did not change since it was cached, and
+            its ETag
+        :rtype: tuple[Optional[dict], Optional[str]]
+        """
+        schema = self._client.get(
+                "/capabilities/templates",
+                params={'quantity': quantity, 'method': method},
+                headers={"If-None-Match": etag} if etag else None,
+            )
+        if schema.status_code == 304:
+            return None, etag
+        schema.raise_for_status()
+        return schema.json(), schema.headers.get("ETag")
     
     def remove_optional_and_empty_keys(self,dictionary):
             keys_to_remove = []
@@ -728,21 +839,28 @@ class Overlort(BaseModel):
                 del dictionary[key]
             return dictionary, removed_keys
     
-    @_login  
-    def request_quantity(self,quantity, method, resultobject, addInfo: str):
-        logger.info('Starting to request quantity ' + str(quantity) +' with method '+ str(method))    
-        schemas = self._get_schema(quant=quantity, met = method)
+    def _collect_parameters(self, resultobject, addInfo: str) -> dict:
+        """This function merges the parameters of the initial request with the
+        requests and results of all steps of a workflow done so far.
+
+        :param resultobject: the requests and results of the workflow
+        :type resultobject: dict
+        :param addInfo: the request ID of the cell, for which the parameters are
+            collected, or an empty string
+        :type addInfo: str
+        :return: the merged parameters
+        :rtype: dict
+        """
         inital_method = resultobject['request_0']['request']["request"]['methods'][0]
         initial_request_parameter = copy.deepcopy(resultobject['request_0']['request']["request"]['parameters'][inital_method])
-        input_request = copy.deepcopy(schemas[str(quantity)+ '-'+ str(method)]['input_template'])    
         for capa in resultobject:
             if capa == "request_0": # checks if capa is empty or request_0
                 continue
             elif capa == "capacity":
                 if not resultobject[capa]["result"][addInfo]["result"] and resultobject[capa]["request"][addInfo]["request"]:
-                    initial_request_parameter.update(resultobject[capa]["request"][addInfo]['parameters'][resultobject[capa]["request"][addInfo]['methods'][0]])
+                    initial_request_parameter.update(self._blobs.load(resultobject[capa]["request"][addInfo]['parameters'])[resultobject[capa]["request"][addInfo]['methods'][0]])
                 elif resultobject[capa]["result"][addInfo]["result"]:
-                    initial_request_parameter.update(resultobject[capa]["result"][addInfo]["result"]['data'])
+                    initial_request_parameter.update(self._blobs.load(resultobject[capa]["result"][addInfo]["result"]['data']))
                     continue
                 else:
                     logger.error("resultobject has more keys than request and result or other error") 
@@ -751,57 +869,128 @@ class Overlort(BaseModel):
             else:
                 if not resultobject[capa]["result"] and resultobject[capa]["request"]:
                     try:
-                        initial_request_parameter.update(resultobject[capa]["request"]['parameters'][resultobject[capa]["request"]['methods'][0]])
+                        initial_request_parameter.update(self._blobs.load(resultobject[capa]["request"]['parameters'])[resultobject[capa]["request"]['methods'][0]])
                     except:
                         pass
                 elif resultobject[capa]["result"]:
-                    initial_request_parameter.update(resultobject[capa]["result"]["result"]['data'])
+                    initial_request_parameter.update(self._blobs.load(resultobject[capa]["result"]["result"]['data']))
                     continue
                 else:
                     logger.error("resultobject has more keys than request and result or other error")   
-        miss, input_request, initial_request_parameter = self.copy_matching_keys(input_request, initial_request_parameter)
+        return initial_request_parameter
+
+    @metrics.timed("overlort_phase_seconds", phase="fill_template")
+    def _fill_template(self, schemas, quantity, method, resultobject, addInfo: str, deferred: tuple = ()):
+        """This function fills the input template of a quantity and method with the
+        parameters collected for the workflow.
+
+        :param deferred: the calculated fields left to the caller, defaults to ()
+        :type deferred: tuple, optional
+        :return: the keys, which could not be filled, the filled input and the
+            parameters used to fill it
+        :rtype: tuple[list, dict, dict]
+        """
+        initial_request_parameter = self._collect_parameters(resultobject, addInfo)
+        # the template is compiled once per quantity and method and filled in one pass
+        plan = self._templates.plan(quantity, method, schemas[str(quantity)+ '-'+ str(method)]['input_template'])
+        workflowID = resultobject['request_0']['request']['uuid']
+        miss, input_request = plan.fill(initial_request_parameter, scope=(workflowID, addInfo or None), deferred=deferred)
         try:
             input_request['cell']['battery_chemistry']['electrolyte'] = input_request['cell']['battery_chemistry']['electrolyte']['formulation']
             input_request['cell_info']['electrolyte_info'] = initial_request_parameter['run_info']['formulation_info']
         except:
             pass
+        return miss, input_request, initial_request_parameter
+
+    def _post_requests(self, quantity, resultobject, bodies: list[dict]) -> list:
+        """This function posts the cell-wise requests of a step at once and records
+        all of them in the resultobject and the request queue in one go.
+
+        :param quantity: the quantity requested
+        :type quantity: str
+        :param resultobject: the requests and results of the workflow
+        :type resultobject: dict
+        :param bodies: the requests to post
+        :type bodies: list[dict]
+        :raises PostError: if any request failed, after all requests posted
+            successfully have been recorded
+        :return: the request IDs returned by the server
+        :rtype: list
+        """
+        outcomes = self._request_poster.post_many(bodies)
+        workflowID = resultobject['request_0']["request"]['uuid']
+        with self._queue_lock:
+            for body, requestID in zip(bodies, outcomes):
+                if not isinstance(requestID, Exception):
+                    self._blobs.spill(workflowID, body, "parameters")
+                    resultobject[quantity]["request"][str(requestID)] = body
+                    self.request_queue.append([requestID, workflowID])
+                    self._journal.record("set", [workflowID, quantity, "request", str(requestID)], body)
+                    self._journal.record("enqueue", value=[requestID, workflowID])
+        for requestID in outcomes:
+            if isinstance(requestID, Exception):
+                logger.error(
+                    "Request for %s failed: %s", quantity, requestID,
+                    extra={"workflow": workflowID, "quantity": quantity},
+                )
+            else:
+                logger.info(
+                    "Request for %s with requestID: %s successful", quantity, requestID,
+                    extra={"workflow": workflowID, "request": requestID, "quantity": quantity},
+                )
+        errors = [requestID for requestID in outcomes if isinstance(requestID, Exception)]
+        if errors:
+            from .connection.poster import PostError
+
+            raise PostError(outcomes) from errors[0]
+        return outcomes
+
+    @_login  
+    def request_quantity(self,quantity, method, resultobject, addInfo: Union[str, list[str]]):
+        logger.info("Starting to request quantity %s with method %s", quantity, method)    
+        schemas = self._get_schema(quant=quantity, met = method)
         if quantity == "capacity":
-            logger.info("For request "+str(resultobject['request_0']['request']['uuid']))
+            from .calculations.batch import BATCH_QUANTITIES, calculate_batch
+
+            # the calculated fields are filled per cell below, from the cathode of each cell
+            miss, input_request, initial_request_parameter = self._fill_template(
+                schemas, quantity, method, resultobject, addInfo, deferred=BATCH_QUANTITIES
+            )
+            logger.info("For request %s", resultobject['request_0']['request']['uuid'])
             resultobject[quantity] = {
                 "request": {},
                 "result": {}
             }
+            self._record_step(resultobject, quantity)
             input_request['reservation_number']= initial_request_parameter["reservation_id"]  # change name in schemas at some point
-            for cell in initial_request_parameter['batch_output']:
-                input_request["cell_info"]= cell["cell_info"]
-                try:
-                    request_uuid = resultobject[quantity]["request"]['uuid']
-                except:
-                    request_uuid = resultobject['request_0']["request"]['uuid']
-                
-                request_next_quantity = {
+            cells = initial_request_parameter['batch_output']
+            # the calculated fields of all cells in one pass
+            plan = self._templates.plan(quantity, method, schemas[str(quantity)+ '-'+ str(method)]['input_template'])
+            calculated = [(path, name) for path, name in plan.calculated if name in BATCH_QUANTITIES]
+            batch = calculate_batch(initial_request_parameter, cells, names=[name for _, name in calculated]) if calculated else {}
+            bodies = []
+            for i, cell in enumerate(cells):
+                cell_request = copy.deepcopy(input_request)
+                cell_request["cell_info"]= cell["cell_info"]
+                for path, name in calculated:
+                    parent = cell_request
+                    for key in path[:-1]:
+                        parent = parent[key]
+                    parent[path[-1]] = batch[name][i].item()
+                bodies.append({
                     "quantity": quantity,
                     "methods": [
                     method
                     ],
                     "parameters": {
-                        method: input_request
+                        method: cell_request
                         }  ,
                     "tenant_uuid": self.tenant_uuid
-                }
-                requestID = requests.post(
-                    "http://{}:{}/requests/".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-                    json=request_next_quantity,
-                    params={},
-                    headers=self.authorization_header
-                ).json()
-                # change requestID to cell uuuid
-                resultobject[quantity]["request"][requestID] = request_next_quantity
-                self.request_queue.append([requestID, resultobject['request_0']["request"]['uuid'] ])
-                logger.info("Request for "+ str(quantity)+ " with requestID: "+ str(requestID)+ " successful")
-                time.sleep(5)
+                })
+            # change requestID to cell uuuid
+            self._post_requests(quantity, resultobject, bodies)
         elif quantity == "degradationEOL" and method == "degradation_model":  
-            logger.info("For request "+str(resultobject['request_0']['request']['uuid']))
+            logger.info("For request %s", resultobject['request_0']['request']['uuid'])
             try:
                 try:
                     if resultobject[quantity]: 
@@ -811,36 +1000,34 @@ class Overlort(BaseModel):
                         "request": {},
                         "result": {}
                     }
+                    self._record_step(resultobject, quantity)
             except:
-                logger.error("Could not create request & result for requested quantitiy: "+ str(quantity))
+                logger.error(
+                    "Could not create request & result for requested quantitiy: %s", quantity
+                )
                 pass                
-            try:
-                request_uuid = addInfo
-                input_request['battery_chemistry']['electrolyte'] = input_request['battery_chemistry']['electrolyte']['formulation']
-                input_request["input_cycles"]=initial_request_parameter["capacity_list"]
-            except:
-                request_uuid = resultobject['request_0']["request"]['uuid']
-            request_next_quantity = {
-                "quantity": quantity,
-                "methods": [
-                method
-                ],
-                "parameters": {
-                    method: input_request
-                    }  ,
-                "tenant_uuid": self.tenant_uuid
-            }
-            requestID = requests.post(
-                "http://{}:{}/requests/".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-                json=request_next_quantity,
-                params={},
-                headers=self.authorization_header
-            ).json()
-            resultobject[quantity]["request"][str(requestID)] = {} 
-            resultobject[quantity]["request"][str(requestID)] = request_next_quantity
-            self.request_queue.append([requestID, resultobject['request_0']["request"]['uuid'] ])
-            logger.info("Reqest for "+ str(quantity)+ " with requestID: "+ str(requestID)+ " successful")
+            # one request per cell, whose capacity result arrived
+            bodies = []
+            for cellID in (addInfo if isinstance(addInfo, list) else [addInfo]):
+                miss, input_request, initial_request_parameter = self._fill_template(schemas, quantity, method, resultobject, cellID)
+                try:
+                    input_request['battery_chemistry']['electrolyte'] = input_request['battery_chemistry']['electrolyte']['formulation']
+                    input_request["input_cycles"]=initial_request_parameter["capacity_list"]
+                except:
+                    pass
+                bodies.append({
+                    "quantity": quantity,
+                    "methods": [
+                    method
+                    ],
+                    "parameters": {
+                        method: input_request
+                        }  ,
+                    "tenant_uuid": self.tenant_uuid
+                })
+            self._post_requests(quantity, resultobject, bodies)
         else:
+            miss, input_request, initial_request_parameter = self._fill_template(schemas, quantity, method, resultobject, addInfo)
             try:   
                 if quantity == "transport" and resultobject["transport"]["result"]:
                     input_request['origin'] = initial_request_parameter['actual_new_location']
@@ -848,6 +1035,7 @@ class Overlort(BaseModel):
                     temp = resultobject.pop(quantity)
                     new_quant_name = quantity + "-1"
                     resultobject[new_quant_name] = temp
+                    self._journal.record("rename", [resultobject['request_0']["request"]['uuid'], quantity], new_quant_name)
                     resultobject[quantity] = {
                     "request": {},
                     "result": {}
@@ -888,25 +1076,32 @@ class Overlort(BaseModel):
                         }  ,
                     "tenant_uuid": self.tenant_uuid
                 }
-                requestID = requests.post(
-                    "http://{}:{}/requests/".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-                    json=request_next_quantity,
-                    params={},
-                    headers=self.authorization_header
-                ).json()
+                requestID = self._request_poster.post(request_next_quantity)
                 resultobject[quantity]["request"] = request_next_quantity
-                self.request_queue.append([requestID, resultobject['request_0']["request"]['uuid']])
-                logger.info("For request "+str(resultobject['request_0']['request']['uuid'])+": Request for "+ str(quantity)+ " with requestID: "+ str(requestID) + " successful")
-                time.sleep(5)
+                self._record_step(resultobject, quantity)
+                self._enqueue([requestID, resultobject['request_0']["request"]['uuid']])
+                logger.info(
+                    "For request %s: Request for %s with requestID: %s successful",
+                    resultobject['request_0']['request']['uuid'],
+                    quantity,
+                    requestID,
+                    extra={
+                        "workflow": resultobject['request_0']['request']['uuid'],
+                        "request": requestID,
+                        "quantity": quantity,
+                    },
+                )
             except:
                 now = datetime()
                 current_time = now.strftime("%Y-%m-%d %H:%M:%S")
                 filename = current_time + str(requestID)
-                filepath = "/root/data/Overlort_26_07/src/Overlort/results_Overlort/failed_requests/" + filename
+                os.makedirs(os.path.join(conf["archive"]["directory"], "failed_requests"), exist_ok=True)
+                filepath = os.path.join(conf["archive"]["directory"], "failed_requests", filename)
                 with open(filepath, 'w') as fileobj:
                     json.dump(input_request, fileobj, indent=2)
                 logger.error("Failed to post next request")
 
+    @metrics.timed("overlort_phase_seconds", phase="post_final_result")
     @_login
     def _post_final_result(self,resultobject, requestid):
         logger.info("Post finale result")
@@ -929,54 +1124,542 @@ class Overlort(BaseModel):
         }
         result_workflow["parameters"]["degradation_workflow"] = resultobject["request_0"]["request"]["request"]["parameters"][result_workflow["method"][0]]
         # copy run_info from electrolyte
-        result_workflow['data']["run_info"] = resultobject["electrolyte"]["result"]["result"]["data"]["run_info"]
-        for cell in list(resultobject["request_0"]["result"].keys()):
-            celldata = {
-            }
-            celldata.update(resultobject["request_0"]["result"][cell]["result"]['data']["degradationEOL"])
-            celldata["cell_info"]= {}
-            celldata["cell_info"]= resultobject["request_0"]["result"][cell]["result"]["parameters"]["degradation_model"]["cell_info"]
-            result_workflow['data']["degradationEOL"].append(celldata)
-        print(len(result_workflow['data']["degradationEOL"]))
-        filepath = "/root/data/Overlort/src/Overlort/results_Overlort/" + str("test") + ".json"
-        with open(filepath, 'w') as fileobj:
-            json.dump(result_workflow, fileobj, indent=2)
-        print(filepath)
-
-        resultID = requests.post(
-            "http://{}:{}/results/".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"]),
-            json=result_workflow,
+        result_workflow['data']["run_info"] = self._blobs.load(resultobject["electrolyte"]["result"]["result"]["data"])["run_info"]
+        # the entries of the cells were kept as their results arrived and are
+        # streamed into the archive, which is then sent as the body
+        cells = resultobject["request_0"]["result"]
+        filepath = self._archive_path(resultobject, requestid, ".result.json")
+        self._final_results.write(
+            requestid,
+            filepath,
+            result_workflow,
+            requestIDs=list(cells.keys()),
+            build=lambda cell: self._final_cell(cells[cell]),
+        )
+
+        resultID = self._client.post_file(
+            "/results/",
+            filepath,
             params={},
-            headers=self.authorization_header
         ).json()
         if resultID:
-            logger.info("Posting final result successfull under ID " + str(resultID))
+            logger.info(
+                "Posting final result successfull under ID %s", resultID, extra={"workflow": requestid}
+            )
             return(resultID)
         else:
             logger.error("Failed to post final result")
             return("123123")
 
+    def _final_cell(self, result_step: dict) -> dict:
+        """This function builds the entry of a cell in the final result from its
+        degradation result.
+
+        :param result_step: the degradation result of the cell
+        :type result_step: dict
+        :return: the predicted end of life and the info of the cell
+        :rtype: dict
+        """
+        celldata = {}
+        celldata.update(self._blobs.load(result_step["result"]['data'])["degradationEOL"])
+        celldata["cell_info"] = self._blobs.load(result_step["result"]["parameters"])["degradation_model"]["cell_info"]
+        return celldata
+
+    def _archive_path(self, resultobject: dict, workflowID: str, suffix: str) -> str:
+        """This function returns the path of a file of a workflow in the archive.
+
+        :param resultobject: the resultobject of the workflow
+        :type resultobject: dict
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param suffix: the end of the name of the file, e.g. ".json"
+        :type suffix: str
+        :return: the path in the archive directory
+        :rtype: str
+        """
+        day = str(resultobject["request_0"]["request"]["ctime"]).split("T")[0]
+        return os.path.join(conf["archive"]["directory"], day + "_" + str(workflowID) + suffix)
+
+    def _archive_workflow(self, resultobject: dict, workflowID: str, resultID: Any) -> None:
+        """This function writes a finished workflow together with the ID of its final
+        result to the archive. The payloads are copied from the blob store into the
+        file one by one, so the full degradation results of the cells are kept in the
+        archive before the blob store of the workflow is dropped. The final result is
+        archived in "<day>_<workflow>.result.json", which is referenced by
+        "final_result".
+
+        :param resultobject: the resultobject of the workflow
+        :type resultobject: dict
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param resultID: the ID of the final result
+        :type resultID: Any
+        """
+        workflow = dict(resultobject)
+        # request_0 points to the degradationEOL results, which are archived once
+        workflow["request_0"] = dict(resultobject["request_0"], result=list(resultobject["request_0"]["result"]))
+        final_result = os.path.basename(self._archive_path(resultobject, workflowID, ".result.json"))
+        with open(self._archive_path(resultobject, workflowID, ".json"), "wb") as fileobj:
+            self._blobs.dump(
+                {"request": workflowID, "result": resultID, "final_result": final_result, "workflow": workflow},
+                fileobj,
+            )
+
+    def _expected_step(self, req: list) -> Optional[tuple[str, str]]:
+        """This function looks up the quantity and method an open request of the
+        request queue waits for.
+
+        :param req: an entry of the request queue with [requestID, workflowID]
+        :type req: list
+        :return: the quantity and method of the request or None, if the request is
+            not found in the resultobjects
+        :rtype: Optional[tuple[str, str]]
+        """
+        resultobject = self.resultobjects.get(req[1], {})
+        # cell-wise steps keep their requests under the request IDs
+        for step in resultobject:
+            if step != "request_0" and req[0] in resultobject[step]["request"]:
+                request = resultobject[step]["request"][req[0]]
+                return request["quantity"], request["methods"][0]
+        # all other steps keep a single request, the open one has no result yet
+        for step in reversed(list(resultobject)):
+            request = resultobject[step]["request"]
+            if step != "request_0" and "quantity" in request and not resultobject[step]["result"]:
+                return request["quantity"], request["methods"][0]
+        return None
+
+    @metrics.timed("overlort_phase_seconds", phase="poll_results")
+    @_login
+    def _poll_results(self) -> list[tuple[list, dict]]:
+        """This function collects the results for the open requests in the request
+        queue with one query per quantity and method the requests wait for.
+
+        :return: pairs of the entry in the request queue and its result, in the order
+            of the request queue
+        :rtype: list[tuple[list, dict]]
+        """
+        with self._queue_lock:
+            pending = {req[0]: req for req in self.request_queue}
+        steps = {requestID: self._expected_step(req) for requestID, req in pending.items()}
+        # only requests due by the poll scheduler are polled
+        self._poll_scheduler.sync(steps)
+        # results pushed in the subscription mode need no poll
+        results = self._listener.take(pending) if self._listener is not None else {}
+        for requestID in results:
+            self._poll_scheduler.polled(requestID, found=True)
+        due = self._poll_scheduler.due()
+        # the query for a quantity and method answers all requests waiting for it
+        due_steps = {steps[requestID] for requestID in due if steps[requestID] is not None}
+        polled = {
+            requestID: step for requestID, step in steps.items()
+            if requestID not in results and (requestID in due or (step is not None and step in due_steps))
+        }
+        if polled:
+            found = self._result_poller.poll(polled)
+            for requestID in polled:
+                if requestID in due or requestID in found:
+                    self._poll_scheduler.polled(requestID, found=requestID in found)
+            results.update(found)
+        return [(req, results[requestID]) for requestID, req in pending.items() if requestID in results]
+
+    def _wait(self) -> float:
+        """This function tells, how long the loop waits until the next request is
+        due to be polled or the pending requests are collected again.
+
+        :return: the time to wait in seconds
+        :rtype: float
+        """
+        until_discovery = max(self._next_discovery - time.monotonic(), 0)
+        return self._poll_scheduler.wait_s(max_s=min(until_discovery, self.sleep_time_s))
+
+    def _start_metrics(self) -> None:
+        """This function enables the metrics and starts publishing them, if
+        conf["metrics"]["enabled"] is set."""
+        settings = conf["metrics"]
+        metrics.enabled = settings["enabled"]
+        if not metrics.enabled:
+            return
+        calculations.hook = self._count_calculation
+        from .Logger.metrics import MetricsExporter
+
+        self._exporter = MetricsExporter(
+            metrics,
+            host=settings["host"],
+            port=settings["port"],
+            filepath=settings["filepath"],
+            interval_s=settings["dump_every_s"],
+        )
+        self._exporter.start()
+
+    def _stop_metrics(self) -> None:
+        """This function stops publishing the metrics and logs the calls, cache hits
+        and time spent per calculator."""
+        logger.info("Calculators: %s", calculations.stats())
+        if self._exporter is not None:
+            self._update_metrics()
+            self._exporter.close()
+            self._exporter = None
+
+    def _count_calculation(self, name: str, elapsed_s: float, memoized: bool) -> None:
+        """This function is the profiling hook of the calculators, which adds each
+        evaluation to the metrics.
+
+        :param name: the name of the calculator
+        :type name: str
+        :param elapsed_s: the time spent in seconds
+        :type elapsed_s: float
+        :param memoized: True, if the memoized result was used
+        :type memoized: bool
+        """
+        metrics.inc("overlort_calculations_total", calculator=name, memoized=str(memoized).lower())
+        metrics.observe("overlort_calculation_seconds", elapsed_s, calculator=name)
+
+    def _update_metrics(self) -> None:
+        """This function updates the gauges of the open workflows, the open requests
+        per quantity and the size of the state on disk."""
+        if not metrics.enabled:
+            return
+        metrics.set("overlort_open_workflows", len(self.resultobjects))
+        with self._queue_lock:
+            queue = list(self.request_queue)
+        lengths = Counter(step[0] for step in map(self._expected_step, queue) if step is not None)
+        for quantity in {step[0] for step in conf["workflow"]} | set(lengths):
+            metrics.set("overlort_queue_length", lengths.get(quantity, 0), quantity=quantity)
+        metrics.set("overlort_state_bytes", self._journal.disk_bytes())
+
+    def _sleep(self, seconds: float) -> None:
+        """This function waits like `time.sleep`, but returns early, when a result
+        is pushed in the subscription mode.
+
+        :param seconds: the longest wait
+        :type seconds: float
+        """
+        if self._listener is None:
+            time.sleep(seconds)
+        else:
+            self._listener.wait(seconds)
+
+    def _discovery_due(self) -> bool:
+        """This function tells, whether the pending requests are collected in this
+        tick, which happens every conf["sleep_time_s"].
+
+        :return: True, if the pending requests should be collected
+        :rtype: bool
+        """
+        now = time.monotonic()
+        if now < self._next_discovery:
+            return False
+        self._next_discovery = now + self.sleep_time_s
+        return True
+
     @_login
     def _get_result(self,ID):
-        result = requests.get(
-                    "http://{}:{}/results_requested/{}".format(conf["FINALES_server_conf"]["host"],conf["FINALES_server_conf"]["port"], ID),
+        result = self._client.get(
+                    f"/results_requested/{ID}",
                     params={},
-                    headers=self.authorization_header,
                 ).json()
         return result
     
+    @metrics.timed("overlort_phase_seconds", phase="save_state")
     def _save_overlort_params(self):
-        filepath =  "overlort_info.json"
-        now = datetime.now()
-        current_time = now.strftime("%Y-%m-%d %H:%M:%S CET")
-        overlort_params_dict = {
-            "creation_time": current_time,
-            "request_queue": self.request_queue,            
-            "resultobjects": self.resultobjects
-        }
-        with open(filepath, 'w') as fileobj:
-            json.dump(overlort_params_dict, fileobj, indent=2) 
+        if self._defer_saves:
+            # the async engine saves once all workflows of the tick are handled
+            self._save_pending = True
+            return
+        # only the changes since the last save are appended to the journal, the full
+        # state is written from time to time to keep the journal short
+        self._journal.commit()
+        if self._journal.needs_compaction():
+            # the snapshot is written in the background from a copy of the state
+            with self._queue_lock:
+                self._journal.compact(self.request_queue, self.resultobjects)
+
+    def _enqueue(self, entry: list) -> None:
+        """This function adds an open request to the request queue.
+
+        :param entry: the entry with [requestID, workflowID]
+        :type entry: list
+        """
+        with self._queue_lock:
+            self.request_queue.append(entry)
+            self._journal.record("enqueue", value=entry)
+
+    def _dequeue(self, req: list) -> None:
+        """This function removes an open request from the request queue.
+
+        :param req: the entry with [requestID, workflowID]
+        :type req: list
+        """
+        with self._queue_lock:
+            self.request_queue.remove(req)
+            self._journal.record("dequeue", value=req)
+
+    def _record_step(self, resultobject: dict, *path) -> None:
+        """This function writes the current value of an entry of a workflow to the
+        journal.
+
+        :param resultobject: the requests and results of the workflow
+        :type resultobject: dict
+        :param path: the keys leading to the entry in the resultobject
+        :type path: str
+        """
+        value = resultobject
+        for key in path:
+            value = value[key]
+        self._journal.record("set", [resultobject['request_0']["request"]['uuid'], *path], value)
+
+    def _spill_result(self, workflowID: str, result_step: dict) -> dict:
+        """This function moves the large data and parameters of a result to the
+        blob store, so they are loaded only when they are used.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param result_step: the result posted for a request
+        :type result_step: dict
+        :return: the result with references to the stored payloads
+        :rtype: dict
+        """
+        for key in ("data", "parameters"):
+            self._blobs.spill(workflowID, result_step["result"], key)
+        return result_step
+
+    def _open_requests(self, workflowID: str) -> int:
+        """This function counts the open requests of a workflow.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :return: the number of entries of the workflow in the request queue
+        :rtype: int
+        """
+        with self._queue_lock:
+            return self.request_queue.count(workflowID)
+
+    def _load_overlort_params(self):
+        """This function restores the request queue and the resultobjects saved by
+        a previous run or creates a new file to save them."""
+        try:
+            # the last snapshot with all changes journaled after it
+            overlort_params = self._journal.load()
+            if overlort_params is not None:
+                self.request_queue = RequestQueue(overlort_params["request_queue"])
+                self.resultobjects = overlort_params["resultobjects"]
+        except Exception as error:
+            # starting empty would overwrite the saved snapshots with an empty state
+            logger.error("Could not restore the saved state: %s", error)
+            raise
+        # start with a snapshot of the restored state and an empty journal
+        self._journal.compact(self.request_queue, self.resultobjects, wait=True)
+        logger.info("Still pending requests: %s", self.request_queue)
+
+    def _handle_result(self, req: list, result_step: dict):
+        """This function saves the result of an open request and requests the next
+        quantity of its workflow or posts the final result, if the workflow is done.
+
+        :param req: the entry of the request queue with [requestID, workflowID]
+        :type req: list
+        :param result_step: the result posted for the request
+        :type result_step: dict
+        """
+        addInfo = ''
+        if result_step["result"]["request_uuid"] == req[0] :
+            try:
+                result_quantity = result_step["result"]["quantity"]
+                result_method = result_step["result"]["method"][0]
+                if result_quantity == "capacity": # if capacity save the cell result at it´s uuid key
+                    self._handle_capacity_results([(req, result_step)])
+                elif result_quantity == "degradationEOL" and result_method == "degradation_model":
+                    logger.info("Quantity is degradationEOL")
+                    counter = self._open_requests(req[1])
+                    logger.debug("Open requests of workflow %s: %s", req[1], counter, extra={"workflow": req[1]})
+                    if counter > 1:
+                        # change req[0] at some point to some ID that is the same for capacity and degradation for better traceability
+                        try:
+                            self._final_results.add(req[1], req[0], self._final_cell(result_step))
+                            self.resultobjects[req[1]][result_quantity]["result"][req[0]] = self._spill_result(req[1], result_step)
+                            self._record_step(self.resultobjects[req[1]], result_quantity, "result", req[0])
+                            self._dequeue(req)
+                            logger.info(
+                                "Saved single degradtion_model request with ID: %s", req[0],
+                                extra={"workflow": req[1], "request": req[0]},
+                            )
+                        except:
+                            logger.error(
+                                "Could not save single degradation result of request: %s", req[0]
+                            )
+                        self._save_overlort_params()
+                    else: # last result of the request is done, so final result must be posted
+                        try:
+                            self._final_results.add(req[1], req[0], self._final_cell(result_step))
+                            self.resultobjects[req[1]][result_quantity]["result"][req[0]] = self._spill_result(req[1], result_step)
+                            self.resultobjects[req[1]]['request_0']['result'] = self.resultobjects[req[1]][result_quantity]["result"] # point on degradtionEOL results, no deepcopy for discspace reasons
+                            self._record_step(self.resultobjects[req[1]], result_quantity, "result", req[0])
+                            self._record_step(self.resultobjects[req[1]], 'request_0', 'result')
+                        except:
+                            logger.error("Could not save last degradation single result")
+                        self._save_overlort_params()
+                        try:
+                            result_ID = self._post_final_result(self.resultobjects[req[1]], req[1])
+                            self._archive_workflow(self.resultobjects[req[1]], req[1], result_ID)
+                            self._save_overlort_params()
+                            self._dequeue(req)
+                            del self.resultobjects[req[1]]
+                            calculations.forget(req[1])
+                            self._journal.record("del", [req[1]])
+                            self._save_overlort_params()
+                            # the saved state no longer refers to the payloads
+                            self._blobs.drop(req[1])
+                            self._final_results.discard(req[1])
+                        except:
+                            logger.error(
+                                "Could not dump workflow data in file for request %s", req[1]
+                            )
+                else:
+                    self.resultobjects[req[1]][result_quantity]["result"] = self._spill_result(req[1], result_step)
+                    self._record_step(self.resultobjects[req[1]], result_quantity, "result")
+                    self._save_overlort_params()
+                    if result_quantity == "capacity" or result_quantity == "degradation":
+                        last_req = self.resultobjects[req[1]][result_quantity]["request"][req[0]]
+                        addInfo = req[0]
+                    else:
+                        last_req = self.resultobjects[req[1]][result_quantity]["request"]
+                    next_quantity, next_method= self.check_next_quantity(last_req= last_req, resultobjects_req= self.resultobjects[req[1]])
+                    logger.info("Next Quantity is %s and method %s", next_quantity, next_method)
+                    try:   
+                        self.request_quantity(quantity=next_quantity,method=next_method, resultobject=self.resultobjects[req[1]], addInfo = addInfo)
+                        addInfo = ""
+                        self._dequeue(req)
+                    except (Exception, KeyboardInterrupt) as error:
+                        logger.error(
+                            "Request for %s failed for request: %s", next_quantity, req[1],
+                            extra={"workflow": req[1], "request": req[0], "quantity": next_quantity},
+                        )
+                        if getattr(error, "posted", None) and any(error.posted):
+                            # the step goes on with the cells posted, posting it again would
+                            # duplicate them, so the failed cells are left out
+                            self._dequeue(req)
+                            self._save_overlort_params()
+                            logger.error(
+                                "Left %s of %s cells out of %s", error.posted.count(False), len(error.posted), next_quantity,
+                                extra={"workflow": req[1], "quantity": next_quantity},
+                            )
+                            raise
+                        try:
+                            del self.resultobjects[req[1]][next_quantity]
+                            self._journal.record("del", [req[1], next_quantity])
+                        except:
+                            logger.warning(
+                                "Could not delete empty quantity %s", next_quantity, extra={"workflow": req[1]}
+                            )
+                        #self.change_status(r['uuid'], new_status = "pending" )
+                        raise
+                    self._save_overlort_params()
+            except:
+                logger.error("Something went wrong when trying to post next quantity request")
+        else:
+            logger.error("ResultID and ID in request_queue are not the same")  
+
+    def _handle_capacity_results(self, items: list[tuple[list, dict]]):
+        """This function saves the capacity results of cells of one workflow and
+        requests the next quantity for all of these cells at once.
+
+        :param items: pairs of the entry of the request queue with [requestID,
+            workflowID] and the capacity result posted for it
+        :type items: list[tuple[list, dict]]
+        """
+        logger.info('Quantity is capacity')
+        workflowID = items[0][0][1]
+        resultobject = self.resultobjects[workflowID]
+        for req, result_step in items:
+            resultobject["capacity"]["result"][req[0]] = self._spill_result(workflowID, result_step)
+            self._record_step(resultobject, "capacity", "result", req[0])
+        last_req = resultobject["capacity"]["request"][items[0][0][0]]
+        next_quantity, next_method= self.check_next_quantity(last_req= last_req, resultobjects_req= resultobject)
+        logger.info("Next Quantity after capacity is %s and method %s", next_quantity, next_method)
+        try:   
+            self.request_quantity(quantity=next_quantity,method=next_method, resultobject=resultobject, addInfo = [req[0] for req, _ in items])
+            for req, _ in items:
+                self._dequeue(req)
+                logger.info(
+                    "Saved single capacity result with ID: %s", req[0],
+                    extra={"workflow": workflowID, "request": req[0]},
+                )
+        except (Exception, KeyboardInterrupt) as error:
+            logger.error(
+                "Request for %s failed for request: %s", next_quantity, workflowID,
+                extra={"workflow": workflowID, "quantity": next_quantity},
+            )
+            # the cells, whose request was posted, are done, only the failed ones are
+            # handled again with their result in the next tick
+            for (req, _), posted in zip(items, getattr(error, "posted", ())):
+                if posted:
+                    self._dequeue(req)
+            # requests posted for other cells before must be kept
+            if next_quantity in resultobject and not resultobject[next_quantity]["request"]:
+                del resultobject[next_quantity]
+                self._journal.record("del", [workflowID, next_quantity])
+            #self.change_status(r['uuid'], new_status = "pending" ) 
+            raise
+        finally:
+            self._save_overlort_params()
+
+    def _handle_results(self, polled: list[tuple[list, dict]]):
+        """This function handles the results collected in one tick. Capacity results
+        of the same workflow are handled together, so the requests for their cells
+        are posted at once.
+
+        :param polled: pairs of the entry of the request queue with [requestID,
+            workflowID] and the result posted for it
+        :type polled: list[tuple[list, dict]]
+        """
+        capacity_results = {}
+        for req, result_step in polled:
+            if result_step["result"]["request_uuid"] == req[0] and result_step["result"]["quantity"] == "capacity":
+                capacity_results.setdefault(req[1], []).append((req, result_step))
+            else:
+                self._handle_result(req, result_step)
+        for items in capacity_results.values():
+            try:
+                self._handle_capacity_results(items)
+            except:
+                logger.error("Something went wrong when trying to post next quantity request")
 
+    def _start_workflow(self, r: dict):
+        """This function creates a new workflow for a request of the optimizer,
+        requests its first quantity and reserves the request.
+
+        :param r: the pending request as received from the FINALES server
+        :type r: dict
+        """
+        logger.info("Creating new workflow for request %s", r['uuid'], extra={"workflow": r['uuid']})
+        self.resultobjects[r['uuid']]= {}
+        self.resultobjects[r['uuid']]['request_0'] = {
+            "request": {},
+            "result": {}
+        }
+        self.resultobjects[r['uuid']]['request_0']["request"] = r
+        next_quantity, next_method= self.check_next_quantity(last_req =r['request'],resultobjects_req= self.resultobjects[r['uuid']])
+        logger.info("Next Quantity is %s and method %s", next_quantity, next_method)
+        self.resultobjects[r['uuid']][next_quantity]= {
+            "request": {},
+            "result": {}
+        }
+        self._journal.record("set", [r['uuid']], self.resultobjects[r['uuid']])
+        try:   
+            self.request_quantity(quantity=next_quantity,method=next_method, resultobject=self.resultobjects[r['uuid']], addInfo = "")
+            self._save_overlort_params()
+            self.change_status(requestID = r['uuid'], new_status="reserved")
+        except (Exception, KeyboardInterrupt):
+            #self.change_status(r['uuid'], new_status = "pending" )
+            logger.error("Failed to change status to reserved")
+            try:
+                del self.resultobjects[r['uuid']]
+                calculations.forget(r['uuid'])
+                self._journal.record("del", [r['uuid']])
+                self._save_overlort_params()
+                self._blobs.drop(r['uuid'])
+            except:
+                logger.error("Request %s could not be startet.", r['uuid'], extra={"workflow": r['uuid']})
+            raise
 
     def run(self):
         """This function runs the tenant in a loop - getting all the requests from
@@ -984,182 +1667,117 @@ class Overlort(BaseModel):
         them to the server.
         """        
         logger.info('Overlort started')
-        try:
-            filepath = "overlort_info.json"
-            with open(filepath, 'r') as fileobj:
-                overlort_params = json.load(fileobj)
-            self.request_queue = overlort_params["request_queue"]
-            self.resultobjects = overlort_params["resultobjects"]
-        except:
-            filepath ="overlort_info.json"
-            now = datetime.now()
-            current_time = now.strftime("%Y-%m-%d %H:%M:%S")
-            overlort_params_dict = {
-                "request_queue": self.request_queue,
-                "resultobjects": self.resultobjects,
-                "creation_time": current_time
-            }
-            with open(filepath, 'w') as fileobj:
-                json.dump(overlort_params_dict, fileobj, indent=2)     
-        logger.info("Still pending requests: "+ str(self.request_queue))
-        addInfo = ''
+        self._load_overlort_params()
+        self._schema_cache.warm(conf["workflow"])
+        if self._listener is not None:
+            self._listener.start()
+        self._start_metrics()
+        self._next_discovery = time.monotonic() + self.sleep_time_s
         while datetime.now() < self.end_run_time:
-            # wait in between two requests to the server
-            time.sleep(self.sleep_time_s)
-            for req in self.request_queue:
-                result_step = self._get_result(ID=req[0])
-                if result_step:
-                    if result_step["result"]["request_uuid"] == req[0] :
-                        try:
-                            result_quantity = result_step["result"]["quantity"]
-                            result_method = result_step["result"]["method"][0]
-                            if result_quantity == "capacity": # if capacity save the cell result at it´s uuid key
-                                logger.info('Quantity is capacity')
-                                self.resultobjects[req[1]][result_quantity]["result"][req[0]] = result_step
-                                last_req = self.resultobjects[req[1]][result_quantity]["request"][req[0]]
-                                addInfo = req[0]
-                                next_quantity, next_method= self.check_next_quantity(last_req= last_req, resultobjects_req= self.resultobjects[req[1]])
-                                logger.info("Next Quantity after "+str(result_quantity)+" is " +str(next_quantity)+ " and method "+ str(next_method))
-                                try:   
-                                    self.request_quantity(quantity=next_quantity,method=next_method, resultobject=self.resultobjects[req[1]], addInfo = addInfo)
-                                    addInfo = ""
-                                    index = self.request_queue.index(req)
-                                    del self.request_queue[index]
-                                    logger.info("Saved single capacity result with ID: " +str(req[0]))
-                                except (Exception, KeyboardInterrupt):
-                                    logger.error("Request for "+ str(next_quantity)+ " failed for request: "+ str(req[1]))
-                                    try:
-                                        del self.resultobjects[req[1]][next_quantity]
-                                    except:
-                                        print("Could not delete empty quantity")
-                                        pass
-                                    #self.change_status(r['uuid'], new_status = "pending" ) 
-                                    raise
-                                self._save_overlort_params()
-                                
-                            elif result_quantity == "degradationEOL" and result_method == "degradation_model":
-                                logger.info("Quantity is degradationEOL")
-                                counter = 0
-                                for resultid in self.request_queue:
-                                    if resultid[1] == req[1]:
-                                        counter = counter +1
-                                print(counter)
-                                if counter > 1:
-                                    # change req[0] at some point to some ID that is the same for capacity and degradation for better traceability
-                                    try:
-                                        self.resultobjects[req[1]][result_quantity]["result"][req[0]] = result_step
-                                        for i in range(len(self.request_queue)):
-                                            if self.request_queue[i][0] == req[0]:
-                                                self.request_queue.pop(i)
-                                                break
-                                        logger.info("Saved single degradtion_model request with ID: "+ str(req[0]))
-                                    except:
-                                        logger.error("Could not save single degradation result of request: "+ str(req[0]))
-                                    self._save_overlort_params()
-                                else: # last result of the request is done, so final result must be posted
-                                    try:
-                                        self.resultobjects[req[1]][result_quantity]["result"][req[0]] = result_step
-                                        self.resultobjects[req[1]]['request_0']['result'] = self.resultobjects[req[1]][result_quantity]["result"] # point on degradtionEOL results, no deepcopy for discspace reasons
-                                    except:
-                                        logger.error("Could not save last degradation single result")
-                                    self._save_overlort_params()
-                                    try:
-                                        result_ID = self._post_final_result(self.resultobjects[req[1]], req[1])
-                                        resultdict = {
-                                            "request" : req[1],
-                                            "result": result_ID,
-                                            "workflow": self.resultobjects[req[1]]
-                                        }
-                                        originpath = os.getcwd()
-                                        filepath = "/root/data/Overlort/src/Overlort/results_Overlort/" + str(self.resultobjects[req[1]]["request_0"]["request"]["ctime"].split("T")[0] +"_" + str(req[1]) + ".json")
-                                        with open(filepath, 'w') as fileobj:
-                                            json.dump(resultdict, fileobj, indent=2)
-                                        os.chdir(originpath)
-                                        self._save_overlort_params()
-                                        index = self.request_queue.index(req)
-                                        del self.request_queue[index]
-                                        del self.resultobjects[req[1]]
-                                        self._save_overlort_params()
-                                    except:
-                                        logger.error("Could not dump workflow data in file for request "+ str(req[1]))
-                            else:
-                                self.resultobjects[req[1]][result_quantity]["result"] = result_step
-                                self._save_overlort_params()
-                                if result_quantity == "capacity" or result_quantity == "degradation":
-                                    last_req = self.resultobjects[req[1]][result_quantity]["request"][req[0]]
-                                    addInfo = req[0]
-                                else:
-                                    last_req = self.resultobjects[req[1]][result_quantity]["request"]
-                                next_quantity, next_method= self.check_next_quantity(last_req= last_req, resultobjects_req= self.resultobjects[req[1]])
-                                logger.info('Next Quantity is ' +str(next_quantity)+ " and method "+ str(next_method))
-                                try:   
-                                    self.request_quantity(quantity=next_quantity,method=next_method, resultobject=self.resultobjects[req[1]], addInfo = addInfo)
-                                    addInfo = ""
-                                    index = self.request_queue.index(req)
-                                    del self.request_queue[index]
-                                except (Exception, KeyboardInterrupt):
-                                    logger.error("Request for "+ str(next_quantity)+ " failed for request: "+ str(req[1]))
-                                    try:
-                                        del self.resultobjects[req[1]][next_quantity]
-                                    except:
-                                        print("Could not delete empty quantity")
-                                        pass
-                                    #self.change_status(r['uuid'], new_status = "pending" )
-                                    raise
-                                self._save_overlort_params()
-                        except:
-                            logger.error("Something went wrong when trying to post next quantity request")
-                    else:
-                        logger.error("ResultID and ID in request_queue are not the same")  
-                else:
-                    #print("no new results")
-                    continue
-            new_requests = self._update_new_request()
-            for r in new_requests:
-                logger.info("Creating new workflow for request " + str(r['uuid']))
-                self.resultobjects[r['uuid']]= {}
-                self.resultobjects[r['uuid']]['request_0'] = {
-                    "request": {},
-                    "result": {}
-                }
-                self.resultobjects[r['uuid']]['request_0']["request"] = r
-                next_quantity, next_method= self.check_next_quantity(last_req =r['request'],resultobjects_req= self.resultobjects[r['uuid']])
-                logger.info('Next Quantity is ' +str(next_quantity)+ " and method "+ str(next_method))
-                self.resultobjects[r['uuid']][next_quantity]= {
-                    "request": {},
-                    "result": {}
-                }
-                self.resultobjects[r['uuid']][next_quantity]["request"]   
-                try:   
-                    self.request_quantity(quantity=next_quantity,method=next_method, resultobject=self.resultobjects[r['uuid']], addInfo = "")
-                    self._save_overlort_params()
-                    self.change_status(requestID = r['uuid'], new_status="reserved")
-                    new_requests.remove(r)
-                except (Exception, KeyboardInterrupt):
-                    #self.change_status(r['uuid'], new_status = "pending" )
-                    logger.error("Failed to change status to reserved")
-                    try:
-                        del self.resultobjects[r['uuid']]
-                    except:
-                        logger.error("Request "+str(r['uuid'])+ " could not be startet.")
-                    raise
+            # wait until a request is due to be polled, a result is pushed or the
+            # pending requests are collected again
+            self._sleep(self._wait())
+            self._ticks += 1
+            metrics.inc("overlort_ticks_total")
+            with metrics.timer("overlort_phase_seconds", phase="tick"):
+                self._handle_results(self._poll_results())
+                if self._discovery_due():
+                    new_requests = self._update_new_request()
+                    for r in new_requests:
+                        self._start_workflow(r)
+            self._update_metrics()
+        if self._listener is not None:
+            self._listener.close()
+        self._stop_metrics()
+        self._journal.close()
+
+    def run_async(self):
+        """This function runs the tenant like `run`, but handles the workflows
+        concurrently. Results of different workflows are processed at the same time,
+        while the results of one workflow are processed in order. The number of
+        workflows handled and of calls to FINALES in flight at the same time are each
+        limited by conf["async_engine"]["max_concurrency"].
+        """
+        import asyncio
+
+        from .workflow.async_engine import AsyncWorkflowEngine
+
+        engine = AsyncWorkflowEngine(
+            overlort=self, max_concurrency=conf["async_engine"]["max_concurrency"]
+        )
+        asyncio.run(engine.run())
+
+def run_shard(shard: int, shards: int, settings: dict) -> None:
+    """This function runs one worker of a sharded Overlort. The worker keeps its
+    state in files of its own, from which it continues after a restart.
+
+    :param shard: the shard of the worker
+    :type shard: int
+    :param shards: the number of workers
+    :type shards: int
+    :param settings: the configuration of the supervisor, which replaces the
+        configuration imported by the spawned worker
+    :type settings: dict
+    """
+    from .Logger.logger import setup_logging
+    from .workflow.sharding import shard_path
+
+    conf.update(settings)
+    for section, key in (("state", "filepath"), ("state", "database"), ("schema_cache", "filepath")):
+        conf[section][key] = shard_path(conf[section][key], shard)
+    # each worker listens on ports of its own
+    if conf["subscription"]["port"]:
+        conf["subscription"]["port"] += shard
+    if conf["metrics"]["port"]:
+        conf["metrics"]["port"] += shard
+    if conf["metrics"]["filepath"]:
+        conf["metrics"]["filepath"] = shard_path(conf["metrics"]["filepath"], shard)
+    # a rotated file must not be shared by processes
+    if conf["logging"]["filepath"]:
+        conf["logging"]["filepath"] = shard_path(conf["logging"]["filepath"], shard)
+    listener = setup_logging(conf["logging"])
+    logger.info("Worker %s of %s started", shard, shards)
+    try:
+        overlort = Overlort(shard=shard, shards=shards)
+        if conf["async_engine"]["enabled"]:
+            overlort.run_async()
+        else:
+            overlort.run()
+    finally:
+        listener.stop()
 
-dictConfig(LogConfig().model_dump())
 logger = logging.getLogger("Overlogger")
 #logger.info("Dummy Info")
 #logger.error("Dummy Error")
 #logger.debug("Dummy Debug") 
 #logger.warning("Dummy Warning")
-logging.Formatter.converter = lambda *args: datetime.now(tz=pytz.timezone('CET')).timetuple()
-logFileFormatter = logging.Formatter(
-        fmt=f"%(levelname)s %(asctime)s (%(relativeCreated)d) \t %(pathname)s request: %(funcName)s - Info: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S CET",
-    )
 
-fileHandler = logging.FileHandler(filename='Overlort.log')
-fileHandler.setFormatter(logFileFormatter)
-fileHandler.setLevel(level=logging.INFO)
+def main() -> None:
+    """This function runs the Overlort as configured, with a worker process per
+    shard, if it is sharded, until the end of the run.
+    """
+    from .Logger.logger import setup_logging
+    from .workflow.sharding import Supervisor
+
+    listener = setup_logging(conf["logging"])
+    try:
+        if conf["sharding"]["shards"] > 1:
+            Supervisor(
+                target=run_shard,
+                shards=conf["sharding"]["shards"],
+                end_run_time=conf["end_run_time"],
+                restart_delay_s=conf["sharding"]["restart_delay_s"],
+                args=(conf,),
+            ).run()
+        else:
+            overlort = Overlort()
+            if conf["async_engine"]["enabled"]:
+                overlort.run_async()
+            else:
+                overlort.run()
+    finally:
+        listener.stop()
+
 
-logger.addHandler(fileHandler)
-overlort = Overlort()
-overlort.run()
+if __name__ == "__main__":
+    main()
@@ -1 +0,0 @@
-from calcualtions import calcualtions
\ No newline at end of file
@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# the module is imported again by the spawned workers of a sharded Overlort
+if __name__ == "__main__":
+    sys.exit(main())
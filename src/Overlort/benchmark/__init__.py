@@ -0,0 +1 @@
+from .mock_server import MockFINALES, SimulatedTenant, simulated_tenants
@@ -0,0 +1,444 @@
+import gzip
+import heapq
+import json
+import logging
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger("Overlogger")
+
+
+class SimulatedTenant(NamedTuple):
+    """A tenant answering the requests for a quantity and method on the stand-in
+    server.
+
+    :param quantity: the quantity served
+    :type quantity: str
+    :param method: the method served
+    :type method: str
+    :param latency_s: the time from posting a request to its result
+    :type latency_s: float
+    :param answer: the function returning the data of the result, called with the
+        parameters of the request for the method
+    :type answer: Callable[[dict], dict]
+    """
+
+    quantity: str
+    method: str
+    latency_s: float
+    answer: Callable[[dict], dict]
+
+
+def _cell_info(index: int) -> dict:
+    return {"cell_id": "cell_" + str(index), "cathode": {"mass_loading": 1.0}}
+
+
+def simulated_tenants(cells: int = 8, latencies_s: Optional[dict] = None) -> list[SimulatedTenant]:
+    """This function creates tenants for the steps of conf["workflow"], whose
+    results carry the fields the following steps are filled from.
+
+    :param cells: the number of cells assembled per workflow, defaults to 8
+    :type cells: int, optional
+    :param latencies_s: the latency per quantity, defaults to None for 0.1 s each
+    :type latencies_s: Optional[dict], optional
+    :return: the tenants
+    :rtype: list[SimulatedTenant]
+    """
+    latencies_s = latencies_s or {}
+    answers = {
+        ("cycling_channel", "service"): lambda p: {
+            "reservation_id": str(uuid.uuid4()),
+        },
+        ("electrolyte", "flow"): lambda p: {
+            "electrolyte": {"formulation": [], "location": {"address": "Flow"}},
+            "run_info": {"formulation_info": {"batch": 1}},
+        },
+        ("transport", "transport_service"): lambda p: {
+            "actual_new_location": {"address": p.get("destination", {}).get("address", "")},
+        },
+        ("cell_assembly", "autobass_assembly"): lambda p: {
+            "batch_output": [{"cell_info": _cell_info(i)} for i in range(cells)],
+        },
+        ("capacity", "cycling"): lambda p: {
+            "capacity_list": [[3.0, 2.9, 2.8]],
+            "cell_info": p.get("cell_info", {}),
+        },
+        ("degradationEOL", "degradation_model"): lambda p: {
+            "degradationEOL": {"end_of_life": 400},
+        },
+    }
+    return [
+        SimulatedTenant(quantity, method, latencies_s.get(quantity, 0.1), answer)
+        for (quantity, method), answer in answers.items()
+    ]
+
+
+# the input templates served for the steps of conf["workflow"]; the fields are filled
+# from the default values or the results of earlier steps
+TEMPLATES = {
+    ("cycling_channel", "service"): {"number_required_channels": 0},
+    ("electrolyte", "flow"): {"batch_volume": 0},
+    ("transport", "transport_service"): {"origin": {}, "destination": {"address": ""}},
+    ("cell_assembly", "autobass_assembly"): {"electrolyte_volume": 0},
+    ("capacity", "cycling"): {"cycling_protocol": "", "number_cycles": 0},
+    ("degradationEOL", "degradation_model"): {"input_cycles": [], "cell_info": {}},
+}
+
+
+class MockFINALES:
+    """A class serving the endpoints of the FINALES server used by the Overlort
+    in-process, so the Overlort can be run and measured without a FINALES
+    deployment and its tenants.
+
+    The requests posted are answered by the simulated tenants after their latency.
+    The initial requests of the workflows are added with `add_workflow`, a workflow
+    is complete, once a result for its initial request is posted. All calls are
+    counted by endpoint and status.
+
+    :param tenants: the tenants answering the requests, defaults to None for
+        `simulated_tenants()`
+    :type tenants: Optional[list[SimulatedTenant]], optional
+    :param templates: the input templates by (quantity, method), defaults to None
+        for TEMPLATES
+    :type templates: Optional[dict], optional
+    :param host: the address to listen on, defaults to "127.0.0.1"
+    :type host: str, optional
+    :param port: the port to listen on, defaults to 0 for any free port
+    :type port: int, optional
+    :param max_new_results: the most results of a quantity listed for the first
+        time by one query of `/results_requested/`, which staggers e.g. the capacity
+        results of the cells of a batch over several ticks of the Overlort, defaults
+        to None for all results at once
+    :type max_new_results: Optional[dict], optional
+    :param failed_posts: the number of posts of requests of a quantity refused with
+        status 500 before the server accepts them, to test the recovery of the
+        Overlort, defaults to None for no failures
+    :type failed_posts: Optional[dict], optional
+    :param push_url: the callback of a result listener, to which the results of
+        the simulated tenants are pushed, defaults to None for no pushes
+    :type push_url: Optional[str], optional
+    :param push_token: the token sent with the pushes, defaults to None
+    :type push_token: Optional[str], optional
+    :param missed_pushes: the number of results of a quantity not pushed, so they
+        are only found by polling, defaults to None for none
+    :type missed_pushes: Optional[dict], optional
+    """
+
+    def __init__(
+        self,
+        tenants: Optional[list[SimulatedTenant]] = None,
+        templates: Optional[dict] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_new_results: Optional[dict] = None,
+        failed_posts: Optional[dict] = None,
+        push_url: Optional[str] = None,
+        push_token: Optional[str] = None,
+        missed_pushes: Optional[dict] = None,
+    ):
+        self.tenants = {
+            (tenant.quantity, tenant.method): tenant
+            for tenant in (tenants if tenants is not None else simulated_tenants())
+        }
+        self.templates = TEMPLATES if templates is None else templates
+        self.host = host
+        self.port = port
+        self.max_new_results = max_new_results or {}
+        self.failed_posts = dict(failed_posts or {})
+        self.push_url = push_url
+        self.push_token = push_token
+        self.missed_pushes = dict(missed_pushes or {})
+        # pushes by outcome: delivered, missed or failed
+        self.pushes: Counter = Counter()
+        self.calls: Counter = Counter()
+        # request UUID -> the request as listed by the server
+        self.requests: dict[str, dict] = {}
+        # request UUID -> the result as listed by the server
+        self.results: dict[str, dict] = {}
+        # workflow UUID -> (time added, time completed or None)
+        self.workflows: dict[str, list] = {}
+        # request UUIDs, whose results were listed by a limited query
+        self._listed: set[str] = set()
+        self._due: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._done = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        """This function starts serving and answering requests in background
+        threads."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._done.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="MockFINALES", daemon=True),
+            threading.Thread(target=self._answer, name="MockTenants", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        """This function stops serving."""
+        if self._server is None:
+            return
+        self._done.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._server = None
+
+    def add_workflow(self, parameters: dict, quantity: str = "degradationEOL", method: str = "degradation_workflow") -> str:
+        """This function adds a pending initial request of a workflow.
+
+        :param parameters: the parameters of the request for the method
+        :type parameters: dict
+        :param quantity: the quantity requested, defaults to "degradationEOL"
+        :type quantity: str, optional
+        :param method: the method requested, defaults to "degradation_workflow"
+        :type method: str, optional
+        :return: the UUID of the request
+        :rtype: str
+        """
+        requestID = self._add_request(
+            {"quantity": quantity, "methods": [method], "parameters": {method: parameters}, "tenant_uuid": "optimizer"}
+        )
+        with self._lock:
+            self.workflows[requestID] = [time.monotonic(), None]
+        return requestID
+
+    def completed(self) -> int:
+        """This function counts the complete workflows.
+
+        :return: the number of workflows, whose result was posted
+        :rtype: int
+        """
+        with self._lock:
+            return sum(1 for _, done in self.workflows.values() if done is not None)
+
+    def latencies_s(self) -> list[float]:
+        """This function lists the time from adding to completing each complete
+        workflow.
+
+        :return: the latencies in seconds
+        :rtype: list[float]
+        """
+        with self._lock:
+            return [done - added for added, done in self.workflows.values() if done is not None]
+
+    def _refuse(self, request: dict) -> bool:
+        with self._lock:
+            if self.failed_posts.get(request.get("quantity"), 0) <= 0:
+                return False
+            self.failed_posts[request["quantity"]] -= 1
+            return True
+
+    def _add_request(self, request: dict) -> str:
+        requestID = str(uuid.uuid4())
+        item = {
+            "uuid": requestID,
+            "ctime": datetime.now().isoformat(),
+            "status": "pending",
+            "request": request,
+        }
+        tenant = self.tenants.get((request.get("quantity"), (request.get("methods") or [None])[0]))
+        with self._condition:
+            self.requests[requestID] = item
+            if tenant is not None:
+                # the simulated tenants reserve their requests right away
+                item["status"] = "reserved"
+                heapq.heappush(self._due, (time.monotonic() + tenant.latency_s, requestID))
+                self._condition.notify()
+        return requestID
+
+    def _add_result(self, result: dict) -> str:
+        resultID = str(uuid.uuid4())
+        requestID = result.get("request_uuid")
+        with self._lock:
+            self.results[requestID] = {
+                "uuid": resultID,
+                "ctime": datetime.now().isoformat(),
+                "status": "original",
+                "result": result,
+            }
+            if requestID in self.requests:
+                self.requests[requestID]["status"] = "resolved"
+            if requestID in self.workflows and self.workflows[requestID][1] is None:
+                self.workflows[requestID][1] = time.monotonic()
+        return resultID
+
+    def _answer(self) -> None:
+        while not self._done.is_set():
+            with self._condition:
+                while not self._done.is_set() and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._condition.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if self._done.is_set():
+                    return
+                _, requestID = heapq.heappop(self._due)
+                request = self.requests[requestID]["request"]
+            method = request["methods"][0]
+            tenant = self.tenants[(request["quantity"], method)]
+            parameters = request["parameters"].get(method, {})
+            self._add_result({
+                "data": tenant.answer(parameters),
+                "quantity": request["quantity"],
+                "method": [method],
+                "parameters": {method: parameters},
+                "tenant_uuid": "simulated_" + tenant.quantity,
+                "request_uuid": requestID,
+            })
+            if self.push_url is not None:
+                self._push(requestID)
+
+    def _push(self, requestID: str) -> None:
+        with self._lock:
+            result = self.results[requestID]
+            quantity = result["result"]["quantity"]
+            if self.missed_pushes.get(quantity, 0) > 0:
+                self.missed_pushes[quantity] -= 1
+                self.pushes["missed"] += 1
+                return
+        headers = {"Content-Type": "application/json"}
+        if self.push_token:
+            headers["Authorization"] = "Bearer " + self.push_token
+        request = urllib.request.Request(
+            self.push_url, data=json.dumps(result).encode("utf-8"), headers=headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                outcome = "delivered"
+        except OSError as error:
+            logger.warning("Push of the result of %s failed: %s", requestID, error)
+            outcome = "failed"
+        with self._lock:
+            self.pushes[outcome] += 1
+
+    def _results_for(self, quantity: Optional[str], method: Optional[str]) -> list[dict]:
+        with self._lock:
+            results = [
+                (requestID, result) for requestID, result in self.results.items()
+                if result["result"]["quantity"] == quantity and method in result["result"]["method"]
+            ]
+            limit = self.max_new_results.get(quantity)
+            if limit is None:
+                return [result for _, result in results]
+            listed = []
+            for requestID, result in results:
+                if requestID not in self._listed:
+                    if limit <= 0:
+                        continue
+                    limit -= 1
+                    self._listed.add(requestID)
+                listed.append(result)
+            return listed
+
+    def _pending(self, quantity: Optional[str]) -> list[dict]:
+        with self._lock:
+            return [
+                item for item in self.requests.values()
+                if item["status"] == "pending"
+                and (quantity is None or item["request"]["quantity"] == quantity)
+            ]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                parts = url.path.strip("/").split("/")
+                if url.path == "/pending_requests/":
+                    self._reply("/pending_requests/", 200, server._pending(query.get("quantity")))
+                elif url.path == "/results_requested/":
+                    self._reply(
+                        "/results_requested/", 200,
+                        server._results_for(query.get("quantity"), query.get("method")),
+                    )
+                elif parts[0] == "results_requested" and len(parts) == 2:
+                    with server._lock:
+                        result = server.results.get(parts[1], {})
+                    self._reply("/results_requested/{id}", 200, result)
+                elif url.path == "/capabilities/templates":
+                    self._template(query.get("quantity"), query.get("method"))
+                else:
+                    self._reply(url.path, 404, {"detail": "Not Found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                parts = url.path.strip("/").split("/")
+                body = self._body()
+                if url.path == "/user_management/authenticate":
+                    self._reply(url.path, 200, {
+                        "access_token": "mock-token", "token_type": "bearer", "expires_in": 3600,
+                    })
+                elif url.path == "/requests/":
+                    request = json.loads(body)
+                    if server._refuse(request):
+                        self._reply(url.path, 500, {"detail": "Internal Server Error"})
+                    else:
+                        self._reply(url.path, 200, server._add_request(request))
+                elif url.path == "/results/":
+                    self._reply(url.path, 200, server._add_result(json.loads(body)))
+                elif parts[0] == "requests" and len(parts) == 3 and parts[2] == "update_status":
+                    with server._lock:
+                        item = server.requests.get(parts[1])
+                        if item is not None:
+                            item["status"] = query.get("new_status", item["status"])
+                    status = 200 if item is not None else 404
+                    self._reply("/requests/{id}/update_status/", status, parts[1] if item is not None else {"detail": "Not Found"})
+                else:
+                    self._reply(url.path, 404, {"detail": "Not Found"})
+
+            def _body(self) -> bytes:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                return body
+
+            def _template(self, quantity: Optional[str], method: Optional[str]) -> None:
+                template = server.templates.get((quantity, method))
+                if template is None:
+                    self._reply("/capabilities/templates", 404, {"detail": "Not Found"})
+                    return
+                etag = '"' + str(quantity) + "-" + str(method) + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._reply("/capabilities/templates", 304, None, {"ETag": etag})
+                    return
+                self._reply(
+                    "/capabilities/templates", 200,
+                    {str(quantity) + "-" + str(method): {"input_template": template}},
+                    {"ETag": etag},
+                )
+
+            def _reply(self, endpoint: str, status: int, payload: Any, headers: Optional[dict] = None) -> None:
+                with server._lock:
+                    server.calls[(self.command, endpoint, status)] += 1
+                data = b"" if status == 304 else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,293 @@
+"""Benchmark of the Overlort against the stand-in FINALES server.
+
+Run from src, e.g.
+
+    python -m Overlort.benchmark.run --workflows 1 10 100 1000 --cells 8 --output report.json
+
+Each size runs in a process of its own, so the peak RSS and the state of one run do
+not carry over to the next.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue as queues
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from FINALES2.schemas import ServerConfig
+
+from ..configuration.config import conf
+from ..Logger.logger import setup_logging
+from ..Overlort_reference import Overlort
+from .mock_server import MockFINALES, simulated_tenants
+
+# valid for the limitations of the method "degradation_workflow"
+INITIAL_PARAMETERS = {
+    "battery_chemistry": {
+        "electrolyte": [
+            {"chemical": {"SMILES": "C1COC(=O)O1", "InChIKey": "KMTRUDSVKNLOMY-UHFFFAOYSA-N"},
+             "fraction": 0.3, "fraction_type": "molPerMol"},
+            {"chemical": {"SMILES": "[Li+].F[P-](F)(F)(F)(F)F", "InChIKey": "AXPLOJNSKRXQPA-UHFFFAOYSA-N"},
+             "fraction": 0.1, "fraction_type": "molPerMol"},
+            {"chemical": {"SMILES": "CCOC(=O)OC", "InChIKey": "JBTWLSYIZRCDFO-UHFFFAOYSA-N"},
+             "fraction": 0.6, "fraction_type": "molPerMol"},
+        ],
+    },
+    "average_charging_rate": 0.5,
+}
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """This function returns the q-th percentile of some values.
+
+    :param values: the values
+    :type values: list[float]
+    :param q: the percentile between 0 and 100
+    :type q: float
+    :return: the percentile or None, if there are no values
+    :rtype: Optional[float]
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_benchmark(
+    workflows: int,
+    cells: int = 8,
+    latencies_s: Optional[dict] = None,
+    tick_s: float = 0.1,
+    timeout_s: float = 600,
+    directory: Optional[str] = None,
+    async_mode: bool = False,
+    max_new_results: Optional[dict] = None,
+    failed_posts: Optional[dict] = None,
+    push: bool = False,
+    reconcile_interval_s: float = 300,
+    missed_pushes: Optional[dict] = None,
+) -> dict:
+    """This function runs the Overlort on a number of workflows until all are
+    complete or the timeout is reached and measures it.
+
+    :param workflows: the number of workflows started at once
+    :type workflows: int
+    :param cells: the number of cells per workflow, defaults to 8
+    :type cells: int, optional
+    :param latencies_s: the latency of the simulated tenants per quantity, defaults
+        to None for 0.1 s each
+    :type latencies_s: Optional[dict], optional
+    :param tick_s: the sleep time of the Overlort, defaults to 0.1
+    :type tick_s: float, optional
+    :param timeout_s: the longest run, defaults to 600
+    :type timeout_s: float, optional
+    :param directory: the directory of the state, created if missing, defaults to
+        None for a temporary directory
+    :type directory: Optional[str], optional
+    :param async_mode: run the Overlort with `run_async`, defaults to False
+    :type async_mode: bool, optional
+    :param max_new_results: the most new results per query and quantity listed by
+        the server, defaults to None for all
+    :type max_new_results: Optional[dict], optional
+    :param failed_posts: the number of posts of requests per quantity refused by
+        the server, defaults to None for none
+    :type failed_posts: Optional[dict], optional
+    :param push: push the results to the Overlort in the subscription mode,
+        defaults to False
+    :type push: bool, optional
+    :param reconcile_interval_s: the interval of the polls catching missed pushes,
+        defaults to 300
+    :type reconcile_interval_s: float, optional
+    :param missed_pushes: the number of results per quantity not pushed, defaults
+        to None for none
+    :type missed_pushes: Optional[dict], optional
+    :return: the measurements
+    :rtype: dict
+    """
+    latencies_s = latencies_s or {}
+    directory = directory or tempfile.mkdtemp(prefix="overlort_benchmark_")
+    os.makedirs(directory, exist_ok=True)
+    conf["state"]["filepath"] = os.path.join(directory, "overlort_info.json")
+    conf["state"]["database"] = os.path.join(directory, "overlort.db")
+    conf["schema_cache"]["filepath"] = os.path.join(directory, "schema_cache.json")
+    conf["blob_store"]["directory"] = os.path.join(directory, "blobs")
+    conf["archive"]["directory"] = os.path.join(directory, "results_Overlort")
+    conf["logging"]["filepath"] = os.path.join(directory, "Overlort.log")
+    conf["sharding"]["shards"] = 1
+    conf["subscription"]["enabled"] = push
+    if push:
+        conf["subscription"]["port"] = _free_port()
+        conf["subscription"]["reconcile_interval_s"] = reconcile_interval_s
+    conf["async_engine"]["enabled"] = async_mode
+    # the simulated steps take seconds instead of days
+    conf["polling"]["min_interval_s"] = tick_s
+    conf["polling"]["max_interval_s"] = max([tick_s, *latencies_s.values()])
+    conf["polling"]["expected_duration_s"] = dict(latencies_s)
+
+    listener = setup_logging(conf["logging"])
+    server = MockFINALES(
+        tenants=simulated_tenants(cells=cells, latencies_s=latencies_s),
+        max_new_results=max_new_results,
+        failed_posts=failed_posts,
+        push_url=(
+            "http://" + conf["subscription"]["host"] + ":" + str(conf["subscription"]["port"])
+            + conf["subscription"]["path"]
+        ) if push else None,
+        push_token=conf["subscription"]["token"] or None,
+        missed_pushes=missed_pushes,
+    )
+    server.start()
+    for _ in range(workflows):
+        server.add_workflow(INITIAL_PARAMETERS)
+    overlort = Overlort(
+        FINALES_server_config=ServerConfig(host=server.host, port=server.port),
+        sleep_time_s=tick_s,
+        end_run_time=datetime.max,
+    )
+
+    def stop_when_done():
+        deadline = time.monotonic() + timeout_s
+        while server.completed() < workflows and time.monotonic() < deadline:
+            time.sleep(0.05)
+        overlort.end_run_time = datetime.now()
+
+    watcher = threading.Thread(target=stop_when_done, daemon=True)
+    start = time.perf_counter()
+    watcher.start()
+    try:
+        if async_mode:
+            overlort.run_async()
+        else:
+            overlort.run()
+    finally:
+        wall_s = time.perf_counter() - start
+        server.close()
+        listener.stop()
+
+    completed = server.completed()
+    latencies = server.latencies_s()
+    calls = sum(server.calls.values())
+    journal = overlort._journal
+    state_bytes = getattr(journal, "bytes_written", 0)
+    if hasattr(journal, "snapshot_bytes_written"):
+        state_bytes += journal.snapshot_bytes_written
+    elif os.path.exists(conf["state"]["database"]):
+        state_bytes += os.path.getsize(conf["state"]["database"])
+    return {
+        "workflows": workflows,
+        "completed": completed,
+        "cells": cells,
+        "wall_s": round(wall_s, 3),
+        "ticks_per_s": round(overlort._ticks / wall_s, 2),
+        "http_calls": calls,
+        "http_calls_per_workflow": round(calls / completed, 1) if completed else None,
+        "http_calls_by_endpoint": {
+            " ".join(str(part) for part in key): count for key, count in sorted(server.calls.items())
+        },
+        "pushes": dict(server.pushes),
+        "state_bytes": state_bytes,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+        },
+    }
+
+
+def _run_in_process(queue, kwargs: dict) -> None:
+    try:
+        queue.put(run_benchmark(**kwargs))
+    except BaseException as error:
+        queue.put({"workflows": kwargs["workflows"], "error": repr(error)})
+        raise
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    """This function runs the benchmark for each number of workflows and prints
+    the measurements.
+
+    :param argv: the command line arguments, defaults to None for sys.argv
+    :type argv: Optional[list[str]], optional
+    :return: the measurements per number of workflows
+    :rtype: list[dict]
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--cells", type=int, default=8)
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="QUANTITY=SECONDS",
+        help="latency of the simulated tenant of a quantity, 0.1 s if not given",
+    )
+    parser.add_argument(
+        "--stagger", action="append", default=[], metavar="QUANTITY=RESULTS",
+        help="most new results of a quantity listed per query, all if not given",
+    )
+    parser.add_argument("--tick", type=float, default=0.1, help="sleep time of the Overlort")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--async", dest="async_mode", action="store_true")
+    parser.add_argument(
+        "--push", action="store_true",
+        help="push the results in the subscription mode instead of polling them",
+    )
+    parser.add_argument("--quiet", action="store_true", help="log warnings and errors only")
+    parser.add_argument("--output", help="write the measurements as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.quiet:
+        conf["logging"]["level"] = "WARNING"
+    latencies_s = {}
+    for item in args.latency:
+        quantity, _, seconds = item.partition("=")
+        latencies_s[quantity] = float(seconds)
+    max_new_results = {}
+    for item in args.stagger:
+        quantity, _, results = item.partition("=")
+        max_new_results[quantity] = int(results)
+
+    context = multiprocessing.get_context("fork")
+    reports = []
+    for workflows in args.workflows:
+        reply = context.Queue()
+        process = context.Process(target=_run_in_process, args=(reply, {
+            "workflows": workflows,
+            "cells": args.cells,
+            "latencies_s": latencies_s,
+            "tick_s": args.tick,
+            "timeout_s": args.timeout,
+            "async_mode": args.async_mode,
+            "max_new_results": max_new_results,
+            "push": args.push,
+        }))
+        process.start()
+        while True:
+            try:
+                report = reply.get(timeout=1)
+                break
+            except queues.Empty:
+                if not process.is_alive():
+                    report = {"workflows": workflows, "error": "exit code " + str(process.exitcode)}
+                    break
+        process.join()
+        reports.append(report)
+        print(json.dumps(report), flush=True)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            json.dump(reports, fileobj, indent=2)
+    return reports
+
+
+if __name__ == "__main__":
+    sys.exit(0 if all("error" not in report for report in main()) else 1)
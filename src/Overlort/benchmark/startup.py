@@ -0,0 +1,111 @@
+"""Startup time of the Overlort.
+
+Run from src, e.g.
+
+    python -m Overlort.benchmark.startup --repeat 5 --output startup.json
+
+Each command is started in a fresh interpreter, so nothing is imported before.
+The slowest imports are taken from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+# the directory holding the package Overlort
+_HERE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# the commands timed, run in src
+COMMANDS = {
+    "cli_help": ["-m", "Overlort", "--help"],
+    "import_overlort": ["-c", "import Overlort.Overlort_reference"],
+}
+
+
+def slowest_imports(statement: str, top: int = 10) -> list[dict]:
+    """This function lists the modules, whose import takes the longest, including
+    the modules they import.
+
+    :param statement: the Python statement importing the modules
+    :type statement: str
+    :param top: the number of modules listed, defaults to 10
+    :type top: int, optional
+    :return: the modules with their cumulative import time in seconds
+    :rtype: list[dict]
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=_HERE, capture_output=True, text=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imports.append({"module": module.strip(), "cumulative_s": int(cumulative) / 1e6})
+    return sorted(imports, key=lambda item: -item["cumulative_s"])[:top]
+
+
+def time_command(arguments: list[str], repeat: int = 5) -> dict:
+    """This function starts a command a number of times and measures its wall time.
+
+    :param arguments: the arguments of the Python interpreter
+    :type arguments: list[str]
+    :param repeat: the number of runs, defaults to 5
+    :type repeat: int, optional
+    :return: the median, shortest and longest wall time and, if a run failed, its
+        error output
+    :rtype: dict
+    """
+    wall_s = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, *arguments], cwd=_HERE, capture_output=True, text=True
+        )
+        wall_s.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return {"ok": False, "error": lines[-1] if lines else "exit code " + str(completed.returncode)}
+    return {
+        "ok": True,
+        "median_s": round(statistics.median(wall_s), 4),
+        "min_s": round(min(wall_s), 4),
+        "max_s": round(max(wall_s), 4),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    """This function measures the startup time of each command and prints it.
+
+    :param argv: the command line arguments, defaults to None for sys.argv
+    :type argv: Optional[list[str]], optional
+    :return: the measurements per command
+    :rtype: list[dict]
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of the slowest imports listed")
+    parser.add_argument("--output", help="write the measurements as JSON to this file")
+    args = parser.parse_args(argv)
+    reports = []
+    for name, arguments in COMMANDS.items():
+        report = {"command": name, **time_command(arguments, repeat=args.repeat)}
+        if name == "import_overlort":
+            report["slowest_imports"] = slowest_imports("import Overlort.Overlort_reference", top=args.top)
+        reports.append(report)
+        print(json.dumps(report), flush=True)
+    if args.output:
+        with open(args.output, "w") as fileobj:
+            json.dump(reports, fileobj, indent=2)
+    return reports
+
+
+if __name__ == "__main__":
+    sys.exit(0 if all(report["ok"] for report in main()) else 1)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Dict
-from .default_values import default_values
+from .batch import cutoff_current
 from .capacity import capacity
 
 class CV_I_cutoff_formation(BaseModel):
@@ -11,6 +11,5 @@ class CV_I_cutoff_formation(BaseModel):
         try:
             cutoff = parameter['CV_I_cutoff']
         except:
-            capa = capacity.calculate(self, parameter)
-            cutoff = round(capa/20,default_values["roundnumber"])
+            cutoff = cutoff_current(capacity.calculate(self, parameter))
         return(cutoff)
@@ -1,7 +1,11 @@
-from .example import Example123
 from .volume import volume
 from .CV_I_cutoff import CV_I_cutoff
 from .CV_I_cutoff_formation import CV_I_cutoff_formation
 from .default_values import default_values
 from .capacity import capacity
 from .I_max import I_max
+from .registry import CalculationRegistry, registry
+from .batch import (
+    BATCH_QUANTITIES, calculate_batch, cathode_arrays,
+    capacity_from_cathode, I_max_from_cathode, cutoff_current, electrolyte_volume,
+)
@@ -0,0 +1,143 @@
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .default_values import default_values
+
+# NumPy is imported where it is used, so importing the Overlort stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# the quantities calculated per cell by calculate_batch
+BATCH_QUANTITIES = ("capacity", "I_max", "CV_I_cutoff", "CV_I_cutoff_formation", "volume")
+
+
+def _cathode(source: dict) -> Optional[dict]:
+    # the cathode is given in the battery chemistry of the parameters or a cell
+    try:
+        cathode = source['battery_chemistry']['cathode']
+        cathode['mass_loading'], cathode['size']
+        return cathode
+    except (KeyError, TypeError):
+        return None
+
+
+# The formulas of the calculated fields, the one implementation used by the batch,
+# the registry and the calculator classes. They take NumPy arrays with a value per
+# cell as well as single values.
+
+def capacity_from_cathode(mass_loading, size):
+    """This function calculates the capacity of a cathode.
+
+    :param mass_loading: the mass loading of the cathode [mA / cm^-2]
+    :param size: the size of the cathode [cm^2]
+    :return: the capacity
+    """
+    import numpy as np
+
+    return np.round(mass_loading * size * 10**(-4), default_values["roundnumber"])  # [mA / cm^-2] * [cm^2]
+
+
+def I_max_from_cathode(mass_loading, size):
+    """This function calculates the maximal current of a cathode.
+
+    :param mass_loading: the mass loading of the cathode [mA / cm^-2]
+    :param size: the size of the cathode [cm^2]
+    :return: the maximal current [A]
+    """
+    import numpy as np
+
+    return np.round(mass_loading * size * 10**(-3) * default_values["c_rate_charge"] * 1.2, default_values["roundnumber"])  # [mA / cm^-2] * [cm^2] * 10^-3 == A
+
+
+def cutoff_current(capacity):
+    """This function calculates the cut-off current of the constant voltage phase,
+    if the parameters do not give it.
+
+    :param capacity: the capacity
+    :return: the cut-off current
+    """
+    import numpy as np
+
+    return np.round(capacity / 20, default_values["roundnumber"])
+
+
+def electrolyte_volume(parameter: dict) -> float:
+    """This function calculates the electrolyte volume per cell of a batch.
+
+    :param parameter: the parameters of the request
+    :type parameter: dict
+    :return: the volume
+    :rtype: float
+    """
+    batchsize = parameter.get('batch_volume', default_values['batch_volume'])
+    return round((2*(batchsize / 8))*(1+ default_values['additional_electrolyte_volume_percentage']),default_values["roundnumber"])+2
+
+
+def cathode_arrays(parameter: dict, cells: Optional[list[dict]] = None) -> tuple["np.ndarray", "np.ndarray"]:
+    """This function collects the mass loading and size of the cathode of each cell.
+    Cells without a cathode of their own use the cathode of the parameters.
+
+    :param parameter: the parameters of the request
+    :type parameter: dict
+    :param cells: the cells of the batch as in "batch_output", defaults to None,
+        which gives a single cell with the cathode of the parameters
+    :type cells: Optional[list[dict]], optional
+    :raises KeyError: if neither a cell nor the parameters give the cathode
+    :return: the mass loadings and the sizes
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    import numpy as np
+
+    default = _cathode(parameter)
+    cathodes = []
+    for cell in cells if cells is not None else [{}]:
+        cathode = _cathode(cell.get("cell_info", cell)) or default
+        if cathode is None:
+            raise KeyError("No cathode with mass_loading and size for the cell")
+        cathodes.append((cathode['mass_loading'], cathode['size']))
+    values = np.asarray(cathodes, dtype=float).reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+
+def calculate_batch(
+    parameter: dict,
+    cells: Optional[list[dict]] = None,
+    names: Optional[Iterable[str]] = None,
+) -> dict[str, "np.ndarray"]:
+    """This function calculates the derived quantities of all cells of a batch at
+    once. The capacity is calculated once and shared by the quantities based on it.
+
+    :param parameter: the parameters of the request
+    :type parameter: dict
+    :param cells: the cells of the batch as in "batch_output", defaults to None,
+        which gives a single cell with the cathode of the parameters
+    :type cells: Optional[list[dict]], optional
+    :param names: the quantities to calculate, defaults to None, which calculates
+        all of BATCH_QUANTITIES
+    :type names: Optional[Iterable[str]], optional
+    :raises KeyError: if a quantity needs the cathode, but it is not given
+    :return: an array with a value per cell for each quantity
+    :rtype: dict[str, np.ndarray]
+    """
+    import numpy as np
+
+    names = set(BATCH_QUANTITIES if names is None else names) & set(BATCH_QUANTITIES)
+    n_cells = len(cells) if cells is not None else 1
+    results = {}
+    cutoffs = names & {"CV_I_cutoff", "CV_I_cutoff_formation"}
+    if 'CV_I_cutoff' in parameter:
+        # a given cut-off current needs no cathode, like in the registry
+        for name in cutoffs:
+            results[name] = np.full(n_cells, parameter['CV_I_cutoff'])
+        cutoffs = set()
+    if names & {"capacity", "I_max"} or cutoffs:
+        mass_loading, size = cathode_arrays(parameter, cells)
+        capacity = capacity_from_cathode(mass_loading, size)
+        if "capacity" in names:
+            results["capacity"] = capacity
+        if "I_max" in names:
+            results["I_max"] = I_max_from_cathode(mass_loading, size)
+        for name in cutoffs:
+            results[name] = cutoff_current(capacity)
+    if "volume" in names:
+        results["volume"] = np.full(n_cells, electrolyte_volume(parameter))
+    return results
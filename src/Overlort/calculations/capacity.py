@@ -1,12 +1,11 @@
 from pydantic import BaseModel, Field
 from typing import Dict
-from .default_values import default_values
-import numpy as np
+from .batch import capacity_from_cathode
 
 class capacity(BaseModel):
     parameter: Dict = Field(
         description="Dict with all Parameters.")
     
     def calculate(self, parameter):
-        capa = np.round(parameter['battery_chemistry']['cathode']['mass_loading'] * parameter['battery_chemistry']['cathode']['size'] * 10**(-4), default_values["roundnumber"])  # [mA / cm^-2] * [cm^2]
-        return(capa)
+        cathode = parameter['battery_chemistry']['cathode']
+        return(capacity_from_cathode(cathode['mass_loading'], cathode['size']))
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from .batch import capacity_from_cathode, cutoff_current, electrolyte_volume, I_max_from_cathode
+
+_MISSING = "<missing>"
+
+
+class _Results(dict):
+    # the results of the dependencies, a failed one raises its error when used
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+class Calculation(NamedTuple):
+    """A calculator registered in a CalculationRegistry.
+
+    :param name: the name of the field calculated
+    :type name: str
+    :param function: the function called with the parameters and the results of
+        the calculators it depends on
+    :type function: Callable[[dict, dict], Any]
+    :param inputs: the paths of the parameters read by the function
+    :type inputs: tuple
+    :param depends: the names of the calculators, whose results the function uses
+    :type depends: tuple
+    """
+
+    name: str
+    function: Callable[[dict, dict], Any]
+    inputs: tuple
+    depends: tuple
+
+
+class CalculationRegistry:
+    """A class holding calculators with the parameters they read and the other
+    calculators they depend on.
+
+    A result is memoized per workflow and cell under a hash of the inputs of the
+    calculator and the results of its dependencies, so a result is calculated again
+    exactly when one of them changed. Dependencies are evaluated first. Calls, cache
+    hits and the time spent are counted per calculator and can be passed to a
+    profiling hook. All methods are thread-safe.
+
+    :param hook: a function called after each evaluation with the name, the time
+        spent in seconds and whether the result was memoized, defaults to None
+    :type hook: Optional[Callable[[str, float, bool], None]], optional
+    """
+
+    def __init__(self, hook: Optional[Callable[[str, float, bool], None]] = None):
+        self.hook = hook
+        self._calculations: dict[str, Calculation] = {}
+        self._memo: dict[Optional[str], dict[Optional[str], dict[str, tuple[str, Any]]]] = {}
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, inputs: tuple = (), depends: tuple = ()) -> Callable:
+        """This function returns a decorator registering a calculator.
+
+        :param name: the name of the field calculated
+        :type name: str
+        :param inputs: the paths of the parameters read, each a tuple of keys,
+            defaults to ()
+        :type inputs: tuple, optional
+        :param depends: the names of the calculators used, defaults to ()
+        :type depends: tuple, optional
+        :raises ValueError: if a dependency is not registered yet, which also rules
+            out cycles
+        :return: the decorator
+        :rtype: Callable
+        """
+        def decorator(function: Callable[[dict, dict], Any]) -> Callable[[dict, dict], Any]:
+            for dependency in depends:
+                if dependency not in self._calculations:
+                    raise ValueError(name + " depends on the unknown calculator " + dependency)
+            with self._lock:
+                self._calculations[name] = Calculation(
+                    name, function, tuple(tuple(path) for path in inputs), tuple(depends)
+                )
+                self._stats[name] = {"calls": 0, "hits": 0, "time_s": 0.0}
+            return function
+        return decorator
+
+    def names(self) -> list[str]:
+        """This function lists the registered calculators.
+
+        :return: the names of the calculators
+        :rtype: list[str]
+        """
+        return list(self._calculations)
+
+    def calculate(
+        self,
+        name: str,
+        parameter: dict,
+        workflow: Optional[str] = None,
+        cell: Optional[str] = None,
+    ) -> Any:
+        """This function returns the result of a calculator, using the memoized
+        result if its inputs did not change.
+
+        :param name: the name of the calculator
+        :type name: str
+        :param parameter: the parameters
+        :type parameter: dict
+        :param workflow: the workflow the result is memoized for, defaults to None
+        :type workflow: Optional[str], optional
+        :param cell: the cell the result is memoized for, defaults to None
+        :type cell: Optional[str], optional
+        :return: the result
+        :rtype: Any
+        """
+        with self._lock:
+            memo = self._memo.setdefault(workflow, {}).setdefault(cell, {})
+            return self._evaluate(self._calculations[name], parameter, memo)[1]
+
+    def forget(self, workflow: Optional[str]) -> None:
+        """This function drops the memoized results of a workflow.
+
+        :param workflow: the workflow
+        :type workflow: Optional[str]
+        """
+        with self._lock:
+            self._memo.pop(workflow, None)
+
+    def stats(self) -> dict[str, dict]:
+        """This function returns the calls, cache hits and time spent per
+        calculator.
+
+        :return: the statistics by the name of the calculator
+        :rtype: dict[str, dict]
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def _evaluate(self, calculation: Calculation, parameter: dict, memo: dict) -> tuple[str, Any]:
+        # the dependencies first, their keys are part of the key of this result; a
+        # failed dependency only fails this calculator, if it uses the result
+        dependencies = {}
+        for name in calculation.depends:
+            try:
+                dependencies[name] = self._evaluate(self._calculations[name], parameter, memo)
+            except Exception as error:
+                dependencies[name] = ("failed: " + repr(error), error)
+        key = hashlib.sha1(
+            json.dumps(
+                [[_lookup(parameter, path) for path in calculation.inputs],
+                 [dependencies[name][0] for name in calculation.depends]],
+                sort_keys=True, default=str,
+            ).encode("utf-8")
+        ).hexdigest()
+        stats = self._stats[calculation.name]
+        stats["calls"] += 1
+        start = time.perf_counter()
+        cached = memo.get(calculation.name)
+        hit = cached is not None and cached[0] == key
+        if hit:
+            stats["hits"] += 1
+        else:
+            value = calculation.function(
+                parameter, _Results((name, result[1]) for name, result in dependencies.items())
+            )
+            cached = memo[calculation.name] = (key, value)
+        elapsed = time.perf_counter() - start
+        stats["time_s"] += elapsed
+        if self.hook is not None:
+            self.hook(calculation.name, elapsed, hit)
+        return cached
+
+
+def _lookup(parameter: dict, path: tuple) -> Any:
+    value = parameter
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+registry = CalculationRegistry()
+
+_MASS_LOADING = ('battery_chemistry', 'cathode', 'mass_loading')
+_SIZE = ('battery_chemistry', 'cathode', 'size')
+
+
+# the formulas are those of the batch, applied to the cathode of the parameters
+
+@registry.register("capacity", inputs=(_MASS_LOADING, _SIZE))
+def _capacity(parameter: dict, results: dict) -> float:
+    cathode = parameter['battery_chemistry']['cathode']
+    return capacity_from_cathode(cathode['mass_loading'], cathode['size'])
+
+
+@registry.register("I_max", inputs=(_MASS_LOADING, _SIZE))
+def _I_max(parameter: dict, results: dict) -> float:
+    cathode = parameter['battery_chemistry']['cathode']
+    return I_max_from_cathode(cathode['mass_loading'], cathode['size'])
+
+
+@registry.register("CV_I_cutoff", inputs=(('CV_I_cutoff',),), depends=("capacity",))
+def _CV_I_cutoff(parameter: dict, results: dict) -> float:
+    if 'CV_I_cutoff' in parameter:
+        return parameter['CV_I_cutoff']
+    return cutoff_current(results["capacity"])
+
+
+@registry.register("CV_I_cutoff_formation", inputs=(('CV_I_cutoff',),), depends=("capacity",))
+def _CV_I_cutoff_formation(parameter: dict, results: dict) -> float:
+    if 'CV_I_cutoff' in parameter:
+        return parameter['CV_I_cutoff']
+    return cutoff_current(results["capacity"])
+
+
+@registry.register("volume", inputs=(('batch_volume',),))
+def _volume(parameter: dict, results: dict) -> float:
+    return electrolyte_volume(parameter)
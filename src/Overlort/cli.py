@@ -0,0 +1,84 @@
+"""Command line of the Overlort.
+
+    overlort run [--shards N] [--async]    run the tenant as configured
+    overlort register                      write the tenant description for the admin
+    overlort benchmark [...]               run the end-to-end benchmark
+    overlort startup [...]                 measure the startup time
+
+Without a command, the tenant is run. The modules are only imported by the command
+needing them, so the command line starts fast.
+"""
+import argparse
+import sys
+from typing import Optional
+
+
+def _run(args: argparse.Namespace, rest: list[str]) -> int:
+    from .configuration.config import conf
+
+    if args.shards is not None:
+        conf["sharding"]["shards"] = args.shards
+    if args.async_mode:
+        conf["async_engine"]["enabled"] = True
+    from .Overlort_reference import main as run_overlort
+
+    run_overlort()
+    return 0
+
+
+def _register(args: argparse.Namespace, rest: list[str]) -> int:
+    from .Overlort_reference import Overlort
+
+    Overlort().tenant_object_to_json()
+    return 0
+
+
+def _benchmark(args: argparse.Namespace, rest: list[str]) -> int:
+    from .benchmark.run import main as run_benchmark
+
+    return 0 if all("error" not in report for report in run_benchmark(rest)) else 1
+
+
+def _startup(args: argparse.Namespace, rest: list[str]) -> int:
+    from .benchmark.startup import main as measure_startup
+
+    return 0 if all(report["ok"] for report in measure_startup(rest)) else 1
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """This function runs a command of the Overlort.
+
+    :param argv: the command line arguments, defaults to None for sys.argv
+    :type argv: Optional[list[str]], optional
+    :return: the exit code
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        prog="overlort", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="run the tenant as configured")
+    run.add_argument("--shards", type=int, help="worker processes, overrides the configuration")
+    run.add_argument("--async", dest="async_mode", action="store_true", help="run the asynchronous engine")
+    run.set_defaults(handler=_run)
+    commands.add_parser(
+        "register", help="write the tenant description to <name>_tenant.json"
+    ).set_defaults(handler=_register)
+    # the arguments of the benchmarks are passed on to them
+    commands.add_parser(
+        "benchmark", help="run the end-to-end benchmark, see python -m Overlort.benchmark.run --help", add_help=False
+    ).set_defaults(handler=_benchmark)
+    commands.add_parser(
+        "startup", help="measure the startup time, see python -m Overlort.benchmark.startup --help", add_help=False
+    ).set_defaults(handler=_startup)
+    args, rest = parser.parse_known_args(argv)
+    if args.command is None:
+        args = parser.parse_args(["run", *rest])
+        rest = []
+    elif rest and args.command not in ("benchmark", "startup"):
+        parser.error("unrecognized arguments: " + " ".join(rest))
+    return args.handler(args, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
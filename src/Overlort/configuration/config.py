@@ -25,6 +25,107 @@ conf["FINALES_server_conf"] = {
     "port": "",     
     }
 
+conf["authentication"] = {
+    "token_lifetime_s": 1800,   # assumed if the server does not state the expiry
+    "refresh_margin_s": 60,     # renew the token this long before it expires
+    }
+
+conf["http_client"] = {
+    "timeout_s": 30,        # timeout for connecting to and reading from FINALES
+    "retries": 3,           # repetitions of failed GET requests
+    "backoff_s": 0.5,       # base of the jittered exponential backoff
+    "pool_size": 10,        # connections kept alive, >= async max_concurrency
+    "gzip_body": False,     # compress large POST bodies, needs server support; the
+                            # final result is streamed from its file uncompressed
+    }
+
+conf["async_engine"] = {
+    "enabled": False,       # handle the workflows concurrently with asyncio
+    "max_concurrency": 8,   # calls to FINALES in flight at the same time
+    }
+
+conf["polling"] = {
+    "min_interval_s": 5,    # shortest time between two polls of a request
+    "max_interval_s": 3600, # longest time between two polls of a request
+    "backoff": 2,           # growth of the interval while a step is running
+    "history": 50,          # durations of finished steps kept per quantity and method
+    "expected_duration_s": {    # until durations were observed, caps the interval
+        "transport": 600,       # at a tenth of the expected duration
+        "electrolyte": 3600,
+        "cell_assembly": 3600,
+        "capacity": 14 * 24 * 3600,
+        },
+    }
+
+conf["subscription"] = {
+    "enabled": False,       # receive results pushed to a local HTTP callback
+    "host": "127.0.0.1",    # address and port of the callback, which the server
+    "port": 8765,           # or a relay POSTs the results to, + shard per worker
+    "path": "/results",
+    "token": "",            # expected as "Authorization: Bearer <token>", if set
+    "reconcile_interval_s": 300,    # polls still catch missed results, less often
+    "keep_s": 600,          # results for requests not in the queue are kept so long
+    }
+
+conf["request_posting"] = {
+    "rate_per_s": 2,        # pace of posted requests, <= 0 disables the limit
+    "burst": 8,             # requests posted at once, e.g. all cells of a batch
+    "max_workers": 8,       # cell-wise requests posted at the same time
+    }
+
+conf["schema_cache"] = {
+    "filepath": "schema_cache.json",    # saved next to the state file
+    "ttl_s": 3600,          # revalidate cached templates after this time
+    "max_entries": 64,      # least recently used templates are dropped
+    }
+
+conf["discovery"] = {
+    "max_seen": 10000,      # pending requests remembered as already checked
+    "server_filter": False, # ask the server only for the quantities of the tenant
+    "check_limitations": True,  # reject requests out of the method limitations
+    }
+
+conf["state"] = {
+    "backend": "journal",   # "journal" or "sqlite"
+    "filepath": "overlort_info.json",   # snapshot, changes go to <filepath>.journal
+    "compact_every": 1000,  # journaled changes, after which a snapshot is written
+    "keep_snapshots": 3,    # previous snapshots kept as <filepath>.1 to .3
+    "database": "overlort.db",  # used by the "sqlite" backend, see storage.migrate
+    }
+
+conf["blob_store"] = {
+    "directory": "blobs",   # large payloads of the workflows, one directory each
+    "min_bytes": 4096,      # payloads from this size on are kept on disk
+    }
+
+conf["metrics"] = {
+    "enabled": False,       # time the phases of the loop and count the calls
+    "host": "127.0.0.1",    # GET /metrics in the text format of Prometheus,
+    "port": None,           # None for no endpoint, + shard per worker
+    "filepath": "overlort_metrics.prom",    # written regularly, None for no file
+    "dump_every_s": 60,
+    }
+
+conf["archive"] = {
+    "directory": "results_Overlort",    # finished workflows and their final results,
+                                        # failed requests and the cells of final results
+                                        # still open in subfolders
+    }
+
+conf["sharding"] = {
+    "shards": 1,            # worker processes, each owning the workflows hashed to it
+    "restart_delay_s": 5,   # time before a crashed worker is restarted
+    }
+
+conf["logging"] = {
+    "level": "DEBUG",       # records below are dropped before they are formatted
+    "filepath": "Overlort.log",     # None for stderr only, + shard per worker
+    "file_level": "INFO",
+    "max_bytes": 10 * 1024 * 1024,  # the file is rotated at this size
+    "backup_count": 5,      # rotated files kept
+    "json": False,          # JSON lines with the UUIDs of workflow and request
+    }
+
 conf["end_run_time"] = datetime(
     year="",
     month="",
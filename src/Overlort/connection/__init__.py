@@ -0,0 +1,6 @@
+from .token_manager import TokenManager
+from .client import FINALESClient
+from .poller import ResultPoller
+from .poster import RequestPoster, TokenBucket
+from .scheduler import PollScheduler
+from .subscription import ResultListener
@@ -0,0 +1,203 @@
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..Logger.metrics import endpoint, metrics
+
+from .token_manager import TokenManager
+
+logger = logging.getLogger("Overlogger")
+
+# answers, after which an idempotent request is worth repeating
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class FINALESClient:
+    """A class sending all requests of the tenant to the FINALES server through one
+    session, which keeps the connections to the server alive and reuses them.
+
+    :param host: the host of the FINALES server
+    :type host: str
+    :param port: the port of the FINALES server
+    :type port: int
+    :param token_manager: the token manager providing the authorization header,
+        defaults to None
+    :type token_manager: Optional[TokenManager], optional
+    :param timeout_s: the timeout for connecting to and reading from the server,
+        defaults to 30
+    :type timeout_s: float, optional
+    :param retries: how often a failed GET request is repeated, defaults to 3
+    :type retries: int, optional
+    :param backoff_s: the base of the exponential backoff between two attempts,
+        defaults to 0.5
+    :type backoff_s: float, optional
+    :param pool_size: the number of connections kept open to the server,
+        defaults to 10
+    :type pool_size: int, optional
+    :param gzip_body: compress the JSON bodies of POST requests except those sent
+        from a file, defaults to False
+    :type gzip_body: bool, optional
+    :param gzip_min_bytes: the size, from which a body gets compressed,
+        defaults to 1024
+    :type gzip_min_bytes: int, optional
+    :param max_in_flight: the most requests sent to the server at the same time by
+        all threads together, defaults to 0 for no limit
+    :type max_in_flight: int, optional
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        token_manager: Optional[TokenManager] = None,
+        timeout_s: float = 30,
+        retries: int = 3,
+        backoff_s: float = 0.5,
+        pool_size: int = 10,
+        gzip_body: bool = False,
+        gzip_min_bytes: int = 1024,
+        max_in_flight: int = 0,
+    ):
+        self.base_url = f"http://{host}:{port}"
+        self.token_manager = token_manager
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.gzip_body = gzip_body
+        self.gzip_min_bytes = gzip_min_bytes
+        self.max_in_flight = max_in_flight
+        self._in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        """This function returns the full url of an endpoint of the server.
+
+        :param path: the path of the endpoint, e.g. "/requests/"
+        :type path: str
+        :return: the url of the endpoint
+        :rtype: str
+        """
+        return self.base_url + path
+
+    def get(
+        self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None
+    ) -> requests.Response:
+        """This function sends a GET request to the server. Failed connections and
+        answers indicating an overloaded server are retried with a jittered
+        exponential backoff.
+
+        :param path: the path of the endpoint
+        :type path: str
+        :param params: the query parameters, defaults to None
+        :type params: Optional[dict], optional
+        :param headers: additional headers, defaults to None
+        :type headers: Optional[dict], optional
+        :return: the response of the server
+        :rtype: requests.Response
+        """
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self._send("GET", path, params=params, headers=headers)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_attempt:
+                    raise
+                logger.info("GET %s failed (%s), retrying", path, error)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return response
+                logger.info("GET %s answered %s, retrying", path, response.status_code)
+            time.sleep(random.uniform(0, self.backoff_s * 2**attempt))
+
+    def post(
+        self, path: str, json: Any = None, params: Optional[dict] = None
+    ) -> requests.Response:
+        """This function sends a POST request to the server. POST requests are not
+        retried, because they are not idempotent.
+
+        :param path: the path of the endpoint
+        :type path: str
+        :param json: the body of the request, defaults to None
+        :type json: Any, optional
+        :param params: the query parameters, defaults to None
+        :type params: Optional[dict], optional
+        :return: the response of the server
+        :rtype: requests.Response
+        """
+        if json is None:
+            return self._send("POST", path, params=params)
+        data, headers = self._encode(json)
+        return self._send("POST", path, params=params, data=data, headers=headers)
+
+    def post_file(
+        self, path: str, filepath: str, params: Optional[dict] = None
+    ) -> requests.Response:
+        """This function sends a POST request with the content of a JSON file as its
+        body. The file is read while it is sent, so a large body is not held in
+        memory. The body is not compressed, also if gzip_body is set. Like `post`,
+        it is not retried.
+
+        :param path: the path of the endpoint
+        :type path: str
+        :param filepath: the path of the file
+        :type filepath: str
+        :param params: the query parameters, defaults to None
+        :type params: Optional[dict], optional
+        :return: the response of the server
+        :rtype: requests.Response
+        """
+        with open(filepath, "rb") as fileobj:
+            return self._send(
+                "POST", path, params=params, data=fileobj, headers={"Content-Type": "application/json"}
+            )
+
+    def close(self) -> None:
+        """This function closes all connections of the session."""
+        self.session.close()
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        if self._in_flight is None:
+            return self._count(method, path, **kwargs)
+        with self._in_flight:
+            return self._count(method, path, **kwargs)
+
+    def _count(self, method: str, path: str, **kwargs) -> requests.Response:
+        if not metrics.enabled:
+            return self._request(method, path, **kwargs)
+        try:
+            response = self._request(method, path, **kwargs)
+        except requests.RequestException:
+            metrics.inc("overlort_http_requests_total", method=method, endpoint=endpoint(path), status="error")
+            raise
+        metrics.inc(
+            "overlort_http_requests_total", method=method, endpoint=endpoint(path),
+            status=response.status_code,
+        )
+        return response
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        if self.token_manager is None:
+            return self.session.request(
+                method, self.url(path), timeout=self.timeout_s, **kwargs
+            )
+        return self.token_manager.send(
+            self.session.request, method, self.url(path), timeout=self.timeout_s, **kwargs
+        )
+
+    def _encode(self, body: Any) -> tuple[bytes, dict]:
+        data = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.gzip_body and len(data) >= self.gzip_min_bytes:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return data, headers
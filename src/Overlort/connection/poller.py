@@ -0,0 +1,83 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .client import FINALESClient
+
+logger = logging.getLogger("Overlogger")
+
+
+class ResultPoller:
+    """A class collecting the results for many open requests at once.
+
+    Instead of asking the server for the result of each request separately, the
+    open requests are grouped by the quantity and method they expect and each group
+    is served by one query of the `/results_requested/` endpoint. The answers are
+    matched to the open requests by their request UUID.
+
+    :param client: the client used to query the FINALES server
+    :type client: FINALESClient
+    :param max_workers: the number of queries sent at the same time, defaults to 1
+    :type max_workers: int, optional
+    """
+
+    def __init__(self, client: FINALESClient, max_workers: int = 1):
+        self.client = client
+        self.max_workers = max_workers
+
+    def poll(self, pending: dict[str, Optional[tuple[str, str]]]) -> dict[str, dict]:
+        """This function collects the results available for the open requests.
+
+        :param pending: the UUIDs of the open requests mapped to the (quantity,
+            method) they expect; requests mapped to None are polled one by one
+        :type pending: dict[str, Optional[tuple[str, str]]]
+        :return: the results found, keyed by the UUID of the request they answer
+        :rtype: dict[str, dict]
+        """
+        groups = defaultdict(set)
+        single = []
+        for request_id, step in pending.items():
+            if step is None:
+                single.append(request_id)
+            else:
+                groups[step].add(request_id)
+
+        results = {}
+        responses = self._map(
+            lambda step: self.client.get(
+                "/results_requested/", params={"quantity": step[0], "method": step[1]}
+            ),
+            list(groups),
+        )
+        for ((quantity, method), request_ids), response in zip(groups.items(), responses):
+            if not response.ok:
+                logger.info(
+                    "Batched query for %s with method %s failed with %s, polling one by one",
+                    quantity,
+                    method,
+                    response.status_code,
+                )
+                single.extend(request_ids)
+                continue
+            for item in response.json():
+                result_step = item if "result" in item else {"result": item}
+                request_id = result_step["result"].get("request_uuid")
+                if request_id in request_ids:
+                    results[request_id] = result_step
+
+        responses = self._map(
+            lambda request_id: self.client.get(f"/results_requested/{request_id}"),
+            single,
+        )
+        for request_id, response in zip(single, responses):
+            result_step = response.json() if response.ok else None
+            if result_step:
+                results[request_id] = result_step
+        return results
+
+    def _map(self, func, items: list) -> list:
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(func, items))
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+from ..Logger.metrics import metrics
+
+from .client import FINALESClient
+
+logger = logging.getLogger("Overlogger")
+
+
+class TokenBucket:
+    """A class limiting the rate of calls to the FINALES server with a token bucket.
+
+    Up to `burst` calls pass at once, after that calls are paced to `rate_per_s`.
+    All methods are thread-safe.
+
+    :param rate_per_s: the number of calls per second, a value <= 0 disables the
+        limit, defaults to 2
+    :type rate_per_s: float, optional
+    :param burst: the number of calls, which may pass at once, defaults to 8
+    :type burst: int, optional
+    """
+
+    def __init__(self, rate_per_s: float = 2, burst: int = 8):
+        self.rate_per_s = rate_per_s
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """This function blocks until the next call may pass."""
+        if self.rate_per_s <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate_per_s
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate_per_s
+            time.sleep(wait_s)
+
+
+class PostError(Exception):
+    """An error raised, when requests posted together failed. The requests posted
+    successfully are told by the outcomes.
+
+    :param outcomes: for each request in the order posted the ID of the posted
+        request or the exception raised while posting it
+    :type outcomes: list[Union[str, Exception]]
+    """
+
+    def __init__(self, outcomes: list[Union[str, Exception]]):
+        self.outcomes = outcomes
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        super().__init__(
+            str(len(errors)) + " of " + str(len(outcomes)) + " requests failed, the first with: " + repr(errors[0])
+        )
+
+    @property
+    def posted(self) -> list[bool]:
+        """For each request, if it was posted successfully."""
+        return [not isinstance(outcome, Exception) for outcome in self.outcomes]
+
+
+class RequestPoster:
+    """A class posting requests to the FINALES server, several of them at the same
+    time if they are posted together. The pace is only set by the rate limiter.
+
+    :param client: the client used to post the requests
+    :type client: FINALESClient
+    :param rate_limiter: the rate limiter pacing the posts, defaults to None
+    :type rate_limiter: Optional[TokenBucket], optional
+    :param max_workers: the number of requests posted at the same time,
+        defaults to 8
+    :type max_workers: int, optional
+    """
+
+    def __init__(
+        self,
+        client: FINALESClient,
+        rate_limiter: Optional[TokenBucket] = None,
+        max_workers: int = 8,
+    ):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+
+    @metrics.timed("overlort_phase_seconds", phase="post_request")
+    def post(self, body: dict) -> str:
+        """This function posts a single request.
+
+        :param body: the request to post
+        :type body: dict
+        :raises requests.HTTPError: if the server refuses the request
+        :return: the ID of the posted request
+        :rtype: str
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.client.post("/requests/", json=body, params={})
+        response.raise_for_status()
+        return response.json()
+
+    def post_many(self, bodies: list[dict]) -> list[Union[str, Exception]]:
+        """This function posts several requests at the same time. A failure of one
+        request does not stop the others.
+
+        :param bodies: the requests to post
+        :type bodies: list[dict]
+        :return: for each request in the same order the ID of the posted request or
+            the exception raised while posting it
+        :rtype: list[Union[str, Exception]]
+        """
+        if len(bodies) <= 1 or self.max_workers <= 1:
+            return [self._try_post(body) for body in bodies]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(bodies))) as executor:
+            return list(executor.map(self._try_post, bodies))
+
+    def _try_post(self, body: dict) -> Union[str, Exception]:
+        try:
+            return self.post(body)
+        except Exception as error:
+            return error
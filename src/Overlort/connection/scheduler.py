@@ -0,0 +1,188 @@
+import heapq
+import statistics
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+
+class PollScheduler:
+    """A class deciding, when the result of each open request is polled next.
+
+    A request is polled first after `min_interval_s` or, once results of its step
+    were received, after the shortest time the step took recently. If there is no
+    result yet, the interval grows by `backoff` with every poll up to a cap. The cap
+    is a tenth of the expected duration of the step, so quick steps like a transport
+    keep being polled often, while a cycling run of days is polled about hourly. The
+    expected duration is the median of the recent durations of the step or the
+    duration configured for its quantity.
+
+    Requests known at the first call of `sync` were started before a restart and are
+    polled right away. A request, whose result was found, stays scheduled until
+    `sync` no longer lists it, so it is polled again after `min_interval_s`, if
+    handling its result failed, instead of being delayed like a new request.
+
+    :param min_interval_s: the shortest time between two polls of a request,
+        defaults to 5
+    :type min_interval_s: float, optional
+    :param max_interval_s: the longest time between two polls of a request,
+        defaults to 3600
+    :type max_interval_s: float, optional
+    :param backoff: the factor, by which the interval grows, defaults to 2
+    :type backoff: float, optional
+    :param expected_duration_s: the expected duration per quantity until enough
+        durations were observed, defaults to None
+    :type expected_duration_s: Optional[dict[str, float]], optional
+    :param history: the number of durations kept per step, defaults to 50
+    :type history: int, optional
+    """
+
+    def __init__(
+        self,
+        min_interval_s: float = 5,
+        max_interval_s: float = 3600,
+        backoff: float = 2,
+        expected_duration_s: Optional[dict[str, float]] = None,
+        history: int = 50,
+    ):
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.backoff = backoff
+        self.expected_duration_s = expected_duration_s or {}
+        self.polls = 0
+        # (due, requestID); entries, which were rescheduled or dropped, are skipped
+        self._heap: list[tuple[float, str]] = []
+        # requestID -> [step, time of the first sight or None once the result was
+        # found, polls without result, due]
+        self._entries: dict[str, list] = {}
+        self._durations = defaultdict(lambda: deque(maxlen=history))
+        self._restored = True
+
+    def sync(self, pending: dict[str, Optional[tuple[str, str]]], now: Optional[float] = None) -> None:
+        """This function schedules new open requests and forgets those, which are no
+        longer open.
+
+        :param pending: the UUIDs of the open requests mapped to the (quantity,
+            method) they expect or None, if it is not known
+        :type pending: dict[str, Optional[tuple[str, str]]]
+        :param now: the monotonic time, defaults to None for the current time
+        :type now: Optional[float], optional
+        """
+        now = time.monotonic() if now is None else now
+        for requestID in [requestID for requestID in self._entries if requestID not in pending]:
+            del self._entries[requestID]
+        for requestID, step in pending.items():
+            if requestID in self._entries:
+                continue
+            delay = 0 if self._restored else self._first_delay(step)
+            self._entries[requestID] = [step, now, 0, None]
+            self._schedule(requestID, now + delay)
+        self._restored = False
+
+    def due(self, now: Optional[float] = None) -> set[str]:
+        """This function collects the requests, which should be polled now. They stay
+        due until `polled` is called for them.
+
+        :param now: the monotonic time, defaults to None for the current time
+        :type now: Optional[float], optional
+        :return: the UUIDs of the requests due
+        :rtype: set[str]
+        """
+        now = time.monotonic() if now is None else now
+        due = set()
+        while self._heap and self._heap[0][0] <= now:
+            when, requestID = heapq.heappop(self._heap)
+            entry = self._entries.get(requestID)
+            if entry is not None and entry[3] == when:
+                entry[3] = None
+                due.add(requestID)
+        # due requests, which were not polled yet
+        due.update(requestID for requestID, entry in self._entries.items() if entry[3] is None)
+        return due
+
+    def polled(self, requestID: str, found: bool, now: Optional[float] = None) -> None:
+        """This function schedules the next poll of a request and, if its result was
+        found, records the duration of its step.
+
+        :param requestID: the UUID of the request
+        :type requestID: str
+        :param found: True, if the result of the request was found
+        :type found: bool
+        :param now: the monotonic time, defaults to None for the current time
+        :type now: Optional[float], optional
+        """
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(requestID)
+        if entry is None:
+            return
+        self.polls += 1
+        step, since, attempts, _ = entry
+        if found:
+            if step is not None and since is not None:
+                self._durations[step].append(now - since)
+            # forgotten by `sync`, unless the request stays open
+            entry[1] = None
+            self._schedule(requestID, now + self.min_interval_s)
+            return
+        entry[2] = attempts + 1
+        self._schedule(requestID, now + self.interval(step, entry[2]))
+
+    def wait_s(self, max_s: float, now: Optional[float] = None) -> float:
+        """This function tells, how long to wait until the next request is due.
+
+        :param max_s: the longest wait
+        :type max_s: float
+        :param now: the monotonic time, defaults to None for the current time
+        :type now: Optional[float], optional
+        :return: the time until the next request is due, at most `max_s`
+        :rtype: float
+        """
+        now = time.monotonic() if now is None else now
+        if any(entry[3] is None for entry in self._entries.values()):
+            return 0
+        while self._heap and self._entries.get(self._heap[0][1], [None] * 4)[3] != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return max_s
+        return min(max(self._heap[0][0] - now, 0), max_s)
+
+    def expected_s(self, step: Optional[tuple[str, str]]) -> Optional[float]:
+        """This function estimates the duration of a step.
+
+        :param step: the quantity and method of the step
+        :type step: Optional[tuple[str, str]]
+        :return: the median of the recent durations, the configured duration of the
+            quantity or None, if neither is known
+        :rtype: Optional[float]
+        """
+        if step is None:
+            return None
+        durations = self._durations.get(step)
+        if durations:
+            return statistics.median(durations)
+        return self.expected_duration_s.get(step[0])
+
+    def interval(self, step: Optional[tuple[str, str]], attempts: int) -> float:
+        """This function calculates the time until the next poll of a request.
+
+        :param step: the quantity and method of the step
+        :type step: Optional[tuple[str, str]]
+        :param attempts: the number of polls without a result
+        :type attempts: int
+        :return: the interval
+        :rtype: float
+        """
+        expected = self.expected_s(step)
+        cap = self.max_interval_s if expected is None else expected / 10
+        cap = min(max(cap, self.min_interval_s), self.max_interval_s)
+        return min(self.min_interval_s * self.backoff ** min(attempts, 64), cap)
+
+    def _first_delay(self, step: Optional[tuple[str, str]]) -> float:
+        durations = self._durations.get(step) if step is not None else None
+        if not durations:
+            return self.min_interval_s
+        # no step finished faster recently
+        return max(min(durations), self.min_interval_s)
+
+    def _schedule(self, requestID: str, when: float) -> None:
+        self._entries[requestID][3] = when
+        heapq.heappush(self._heap, (when, requestID))
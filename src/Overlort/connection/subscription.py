@@ -0,0 +1,169 @@
+import hmac
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional, Union
+
+logger = logging.getLogger("Overlogger")
+
+
+class ResultListener:
+    """A class receiving result notifications pushed by the FINALES server or a
+    relay to a local HTTP callback.
+
+    A notification is a POST to `path` with a result or a list of results as JSON,
+    as returned by the `/results_requested/` endpoint. If a token is configured, the
+    notification needs the header "Authorization: Bearer <token>". The results are
+    kept by the UUID of the request they answer, until they are taken or older than
+    `keep_s`, as a result may arrive before its request is in the request queue.
+
+    :param host: the address to listen on, defaults to "127.0.0.1"
+    :type host: str, optional
+    :param port: the port to listen on, 0 for any free port, defaults to 8765
+    :type port: int, optional
+    :param path: the path of the callback, defaults to "/results"
+    :type path: str, optional
+    :param token: the token expected from the sender, defaults to None
+    :type token: Optional[str], optional
+    :param keep_s: the time a result not taken is kept, defaults to 600
+    :type keep_s: float, optional
+    :param max_body_bytes: the largest notification accepted, defaults to 16 MiB
+    :type max_body_bytes: int, optional
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        path: str = "/results",
+        token: Optional[str] = None,
+        keep_s: float = 600,
+        max_body_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.token = token or None
+        self.keep_s = keep_s
+        self.max_body_bytes = max_body_bytes
+        self.received = 0
+        # request UUID -> (time received, result)
+        self._results: dict[str, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """This function starts listening in a background thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="ResultListener", daemon=True
+        )
+        self._thread.start()
+        logger.info("Listening for results on %s:%s%s", self.host, self.port, self.path)
+
+    def close(self) -> None:
+        """This function stops listening."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+
+    def take(self, requestIDs: Iterable[str]) -> dict[str, dict]:
+        """This function removes the results received for some requests.
+
+        :param requestIDs: the UUIDs of the requests
+        :type requestIDs: Iterable[str]
+        :return: the results received, keyed by the UUID of the request they answer
+        :rtype: dict[str, dict]
+        """
+        now = time.monotonic()
+        with self._lock:
+            taken = {
+                requestID: self._results.pop(requestID)[1]
+                for requestID in requestIDs if requestID in self._results
+            }
+            for requestID in [
+                requestID for requestID, (received, _) in self._results.items()
+                if now - received > self.keep_s
+            ]:
+                del self._results[requestID]
+        return taken
+
+    def wait(self, timeout: float) -> bool:
+        """This function waits until a result is received.
+
+        :param timeout: the longest wait in seconds
+        :type timeout: float
+        :return: True, if a result was received
+        :rtype: bool
+        """
+        received = self._event.wait(timeout)
+        self._event.clear()
+        return received
+
+    def add(self, payload: Union[dict, list]) -> int:
+        """This function keeps the results of a notification.
+
+        :param payload: a result or a list of results
+        :type payload: Union[dict, list]
+        :raises ValueError: if a result has no request UUID
+        :return: the number of results kept
+        :rtype: int
+        """
+        items = payload if isinstance(payload, list) else [payload]
+        results = {}
+        for item in items:
+            result_step = item if isinstance(item, dict) and "result" in item else {"result": item}
+            result = result_step["result"]
+            requestID = result.get("request_uuid") if isinstance(result, dict) else None
+            if requestID is None:
+                raise ValueError("Result without request_uuid")
+            results[requestID] = result_step
+        now = time.monotonic()
+        with self._lock:
+            for requestID, result_step in results.items():
+                self._results[requestID] = (now, result_step)
+            self.received += len(results)
+        if results:
+            self._event.set()
+        return len(results)
+
+    def _handler(self):
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0] != listener.path:
+                    self.send_error(404)
+                    return
+                if listener.token is not None and not hmac.compare_digest(
+                    self.headers.get("Authorization", "").encode(),
+                    ("Bearer " + listener.token).encode(),
+                ):
+                    self.send_error(401)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > listener.max_body_bytes:
+                    self.send_error(413)
+                    return
+                try:
+                    listener.add(json.loads(self.rfile.read(length)))
+                except (ValueError, AttributeError) as error:
+                    self.send_error(400, str(error))
+                    return
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug("Result listener: %s", format % args)
+
+        return Handler
@@ -0,0 +1,166 @@
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+from ..Logger.metrics import metrics
+
+logger = logging.getLogger("Overlogger")
+
+
+class TokenManager:
+    """A class caching the bearer token of the tenant user for all requests to the
+    FINALES server.
+
+    The token is only renewed shortly before it expires or after the server rejected
+    it, so the number of calls to the authentication endpoint does not depend on the
+    number of requests sent with the token. All methods are thread-safe.
+
+    :param url: the url of the authentication endpoint of the FINALES server
+    :type url: str
+    :param username: the name of the tenant user
+    :type username: str
+    :param password: the password of the tenant user
+    :type password: str
+    :param lifetime_s: the lifetime assumed for tokens, which do not state their
+        expiry, defaults to 1800
+    :type lifetime_s: float, optional
+    :param refresh_margin_s: the time before the expiry at which the token is
+        renewed, defaults to 60
+    :type refresh_margin_s: float, optional
+    :param session: the session used for authenticating, defaults to None, which
+        opens a new connection for each authentication
+    :type session: Optional[requests.Session], optional
+    """
+
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        lifetime_s: float = 1800,
+        refresh_margin_s: float = 60,
+        session: Optional[requests.Session] = None,
+    ):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.lifetime_s = lifetime_s
+        self.refresh_margin_s = refresh_margin_s
+        self.session = session if session is not None else requests
+        self.cache_hits = 0
+        self.refreshes = 0
+        self._header: Optional[dict] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def header(self) -> dict:
+        """This function returns the authorization header, requesting a new token
+        from the server if there is none or the cached one is about to expire.
+
+        :return: the authorization header to send with a request
+        :rtype: dict
+        """
+        with self._lock:
+            if self._header is not None and time.monotonic() < self._expires_at:
+                self.cache_hits += 1
+                return self._header
+            self._refresh()
+            return self._header
+
+    def invalidate(self, header: Optional[dict] = None) -> None:
+        """This function drops the cached token, so the next call of `header`
+        authenticates again.
+
+        :param header: the header, which was rejected by the server; if another
+            thread already replaced it, the cached token is kept, defaults to None
+        :type header: Optional[dict], optional
+        """
+        with self._lock:
+            if header is None or header is self._header:
+                self._header = None
+
+    def send(self, send: Callable, *args, headers: Optional[dict] = None, **kwargs):
+        """This function sends a request with the cached authorization header and
+        repeats it once with a new token, if the server answers with 401.
+
+        :param send: the function sending the request, e.g. `requests.get`
+        :type send: Callable
+        :param headers: additional headers to send with the request, defaults to None
+        :type headers: Optional[dict], optional
+        :return: the response of the server
+        :rtype: requests.Response
+        """
+        authorization_header = self.header()
+        response = send(*args, headers={**authorization_header, **(headers or {})}, **kwargs)
+        if response.status_code == 401:
+            logger.info("Token was rejected by the server, authenticating again")
+            self.invalidate(authorization_header)
+            # a body read from a file is sent again from its start
+            if hasattr(kwargs.get("data"), "seek"):
+                kwargs["data"].seek(0)
+            response = send(*args, headers={**self.header(), **(headers or {})}, **kwargs)
+        return response
+
+    def _refresh(self) -> None:
+        # must be called while holding the lock
+        with metrics.timer("overlort_phase_seconds", phase="auth"):
+            access_information = self.session.post(
+                self.url,
+                data={
+                    "grant_type": "",
+                    "username": f"{self.username}",
+                    "password": f"{self.password}",
+                    "scope": "",
+                    "client_id": "",
+                    "client_secret": "",
+                },
+                headers={
+                    "accept": "application/json",
+                    "Content-Type": "application/x-www-form-urlencoded",
+                },
+            )
+        metrics.inc(
+            "overlort_http_requests_total", method="POST", endpoint="/user_management/authenticate",
+            status=access_information.status_code,
+        )
+        access_information.raise_for_status()
+        access_information = access_information.json()
+        self._header = {
+            "accept": "application/json",
+            "Authorization": (
+                f"{access_information['token_type'].capitalize()} "
+                f"{access_information['access_token']}"
+            ),
+        }
+        lifetime_s = self._lifetime(access_information)
+        # renew ahead of the expiry, but never more often than twice per lifetime
+        margin_s = min(self.refresh_margin_s, lifetime_s / 2)
+        self._expires_at = time.monotonic() + lifetime_s - margin_s
+        self.refreshes += 1
+        logger.info("Obtained new token valid for %s s", round(lifetime_s))
+
+    def _lifetime(self, access_information: dict) -> float:
+        """This function determines the remaining lifetime of a token from the
+        `expires_in` field of the answer or the `exp` claim of the JWT.
+
+        :param access_information: the answer of the authentication endpoint
+        :type access_information: dict
+        :return: the remaining lifetime of the token in seconds
+        :rtype: float
+        """
+        if "expires_in" in access_information:
+            return float(access_information["expires_in"])
+        try:
+            payload = access_information["access_token"].split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            lifetime_s = float(claims["exp"]) - time.time()
+        except (IndexError, KeyError, TypeError, ValueError):
+            return float(self.lifetime_s)
+        # a token, which appears expired, points to a clock offset to the server
+        return lifetime_s if lifetime_s > 0 else float(self.lifetime_s)
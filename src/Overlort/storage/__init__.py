@@ -0,0 +1,6 @@
+from .schema_cache import SchemaCache
+from .journal import StateJournal
+from .sqlite_store import SQLiteStore
+from .snapshots import SnapshotWriter
+from .blobs import BlobStore
+from .final_result import FinalResultWriter
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import IO, Any
+
+from .snapshots import write_atomic
+
+logger = logging.getLogger("Overlogger")
+
+# the key marking a reference to a payload in the blob store
+BLOB_KEY = "$blob"
+# compact and without the check for circular references, which the state never has
+_ENCODER = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+
+def is_blob_ref(value: Any) -> bool:
+    """This function tells, whether a value is a reference to a stored payload.
+
+    :param value: the value
+    :type value: Any
+    :return: True, if the value is a reference
+    :rtype: bool
+    """
+    return isinstance(value, dict) and BLOB_KEY in value and len(value) <= 2
+
+
+class BlobStore:
+    """A class keeping large payloads of the resultobjects on disk, so only the
+    small routing state of each workflow stays in memory and in the snapshots.
+
+    A payload is stored under the SHA-256 of its JSON in a directory per workflow
+    and replaced by a reference {"$blob": "<workflow>/<hash>", "bytes": <size>}.
+    Identical payloads of a workflow are stored once. Payloads are loaded again only
+    when they are used, and the directory of a workflow is deleted, once the
+    workflow is done.
+
+    :param directory: the directory of the blobs, defaults to "blobs"
+    :type directory: str, optional
+    :param min_bytes: the size of the JSON of a payload, from which on it is
+        stored on disk, defaults to 4096
+    :type min_bytes: int, optional
+    """
+
+    def __init__(self, directory: str = "blobs", min_bytes: int = 4096):
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.bytes_spilled = 0
+        self._lock = threading.Lock()
+
+    def spill(self, workflowID: str, container: dict, key: str) -> None:
+        """This function replaces a payload in a dict by a reference, if it is large.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param container: the dict holding the payload
+        :type container: dict
+        :param key: the key of the payload
+        :type key: str
+        """
+        if key not in container or is_blob_ref(container[key]):
+            return
+        data = json.dumps(container[key], sort_keys=True).encode("utf-8")
+        if len(data) < self.min_bytes:
+            return
+        container[key] = self._put(workflowID, data)
+
+    def load(self, value: Any) -> Any:
+        """This function loads the payload of a reference. Any other value is
+        returned as it is.
+
+        :param value: a reference or a payload
+        :type value: Any
+        :raises FileNotFoundError: if the payload of the reference is missing
+        :return: the payload
+        :rtype: Any
+        """
+        if not is_blob_ref(value):
+            return value
+        with open(os.path.join(self.directory, value[BLOB_KEY] + ".json"), "rb") as fileobj:
+            return json.loads(fileobj.read())
+
+    def load_all(self, value: Any) -> Any:
+        """This function returns a copy of a value with the payloads of all references
+        in it loaded.
+
+        :param value: the value, like the resultobject of a workflow
+        :type value: Any
+        :return: the value without references
+        :rtype: Any
+        """
+        value = self.load(value)
+        if isinstance(value, dict):
+            return {key: self.load_all(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.load_all(item) for item in value]
+        return value
+
+    def dump(self, value: Any, fileobj: IO[bytes]) -> None:
+        """This function writes a value as JSON with the payloads of all references
+        in it. The stored payloads are copied into the file as they are, so they are
+        neither held in memory nor encoded again.
+
+        :param value: the value, like the resultobject of a workflow
+        :type value: Any
+        :param fileobj: the binary file to write to
+        :type fileobj: IO[bytes]
+        :raises FileNotFoundError: if the payload of a reference is missing
+        """
+        if is_blob_ref(value):
+            with open(os.path.join(self.directory, value[BLOB_KEY] + ".json"), "rb") as blob:
+                shutil.copyfileobj(blob, fileobj)
+        elif isinstance(value, dict):
+            fileobj.write(b"{")
+            for i, (key, item) in enumerate(value.items()):
+                fileobj.write((("," if i else "") + _ENCODER.encode(str(key)) + ":").encode("utf-8"))
+                self.dump(item, fileobj)
+            fileobj.write(b"}")
+        elif isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+            fileobj.write(b"[")
+            for i, item in enumerate(value):
+                if i:
+                    fileobj.write(b",")
+                self.dump(item, fileobj)
+            fileobj.write(b"]")
+        else:
+            # plain values and lists of numbers in one go
+            fileobj.write(_ENCODER.encode(value).encode("utf-8"))
+
+    def drop(self, workflowID: str) -> None:
+        """This function deletes the payloads of a workflow.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        """
+        shutil.rmtree(os.path.join(self.directory, str(workflowID)), ignore_errors=True)
+
+    def _put(self, workflowID: str, data: bytes) -> dict:
+        name = str(workflowID) + "/" + hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.directory, name + ".json")
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # on disk before the reference is journaled
+                write_atomic(path, data)
+                self.bytes_spilled += len(data)
+        return {BLOB_KEY: name, "bytes": len(data)}
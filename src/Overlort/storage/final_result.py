@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+from contextlib import nullcontext
+from typing import Callable, Iterable
+
+from .snapshots import fsync_directory
+
+logger = logging.getLogger("Overlogger")
+
+# compact and without the check for circular references, which results never have
+_ENCODER = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+# stands in for the cells, while the rest of the final result is encoded
+_CELLS = "\x00cells\x00"
+
+
+class FinalResultWriter:
+    """A class assembling the final result of a workflow, which holds one entry per
+    cell in data["degradationEOL"].
+
+    The entry of a cell is encoded once, when its degradation result arrives, and
+    appended to a file of the workflow in the subfolder "partial". Once the last
+    cell is done, the final result is streamed into the archive from these entries,
+    so the cells of a large batch are never held in memory at once. The archived
+    file is then sent as the body of the final result.
+
+    :param directory: the archive directory, defaults to "results_Overlort"
+    :type directory: str, optional
+    """
+
+    def __init__(self, directory: str = "results_Overlort"):
+        self.directory = directory
+
+    def add(self, workflowID: str, requestID: str, cell: dict) -> None:
+        """This function keeps the entry of a cell for the final result. If the
+        entry of the same request is added again, the last one is used.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param requestID: the UUID of the degradation request of the cell
+        :type requestID: str
+        :param cell: the entry of the cell
+        :type cell: dict
+        """
+        path = self._partial_path(workflowID)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as fileobj:
+            fileobj.write((str(requestID) + "\t" + _ENCODER.encode(cell) + "\n").encode("utf-8"))
+
+    def write(
+        self,
+        workflowID: str,
+        filepath: str,
+        result: dict,
+        requestIDs: Iterable[str],
+        build: Callable[[str], dict],
+    ) -> int:
+        """This function streams the final result of a workflow into a file. The file
+        is replaced atomically, so it is either complete or missing.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :param filepath: the path of the file
+        :type filepath: str
+        :param result: the final result without the entries of the cells
+        :type result: dict
+        :param requestIDs: the degradation requests of the cells in their order
+        :type requestIDs: Iterable[str]
+        :param build: builds the entry of a cell, which was not added, e.g. as its
+            result arrived before a restart
+        :type build: Callable[[str], dict]
+        :return: the size of the file in bytes
+        :rtype: int
+        """
+        data = dict(result["data"], degradationEOL=_CELLS)
+        head, _, tail = _ENCODER.encode(dict(result, data=data)).partition(_ENCODER.encode(_CELLS))
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        offsets = self._offsets(workflowID)
+        temppath = filepath + ".tmp"
+        with open(temppath, "wb") as fileobj:
+            fileobj.write(head.encode("utf-8") + b"[")
+            with open(self._partial_path(workflowID), "rb") if offsets else nullcontext() as partial:
+                for i, requestID in enumerate(requestIDs):
+                    if i:
+                        fileobj.write(b",")
+                    if requestID in offsets:
+                        partial.seek(offsets[requestID])
+                        fileobj.write(partial.readline().partition(b"\t")[2].rstrip(b"\n"))
+                    else:
+                        fileobj.write(_ENCODER.encode(build(requestID)).encode("utf-8"))
+            fileobj.write(b"]" + tail.encode("utf-8"))
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+            size = fileobj.tell()
+        os.replace(temppath, filepath)
+        fsync_directory(filepath)
+        return size
+
+    def discard(self, workflowID: str) -> None:
+        """This function deletes the entries kept for a workflow.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        """
+        try:
+            os.remove(self._partial_path(workflowID))
+        except FileNotFoundError:
+            pass
+
+    def _partial_path(self, workflowID: str) -> str:
+        return os.path.join(self.directory, "partial", str(workflowID) + ".jsonl")
+
+    def _offsets(self, workflowID: str) -> dict[str, int]:
+        # the position of the last complete entry of each request
+        offsets = {}
+        try:
+            with open(self._partial_path(workflowID), "rb") as fileobj:
+                position = 0
+                for line in fileobj:
+                    if line.endswith(b"\n"):
+                        offsets[line.partition(b"\t")[0].decode("utf-8")] = position
+                    else:
+                        logger.error("Ignoring incomplete cell entry of workflow %s", workflowID)
+                    position += len(line)
+        except FileNotFoundError:
+            pass
+        return offsets
+
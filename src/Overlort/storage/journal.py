@@ -0,0 +1,239 @@
+import copy
+import glob
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from .snapshots import SnapshotWriter, load_newest_valid
+
+logger = logging.getLogger("Overlogger")
+
+
+def apply_record(state: dict, record: dict) -> None:
+    """This function applies a change recorded in the journal to the state.
+
+    :param state: the state with the keys "request_queue" and "resultobjects"
+    :type state: dict
+    :param record: the change with the operation "op", the "path" of keys in the
+        resultobjects and the "value"
+    :type record: dict
+    """
+    op = record["op"]
+    if op == "enqueue":
+        state["request_queue"].append(record["value"])
+        return
+    if op == "dequeue":
+        if record["value"] in state["request_queue"]:
+            state["request_queue"].remove(record["value"])
+        return
+    parent = state["resultobjects"]
+    *keys, last = record["path"]
+    for key in keys:
+        if key not in parent:
+            if op != "set":
+                return
+            parent[key] = {}
+        parent = parent[key]
+    if op == "set":
+        parent[last] = record["value"]
+    elif op == "del":
+        parent.pop(last, None)
+    elif op == "rename":
+        if last in parent:
+            parent[record["value"]] = parent.pop(last)
+    else:
+        raise ValueError("Unknown journal operation " + str(op))
+
+
+class StateJournal:
+    """A class persisting the state of the Overlort as a snapshot and an append-only
+    journal of the changes made since the snapshot.
+
+    Changes are recorded as operations on the request queue ("enqueue", "dequeue")
+    or on a path of keys in the resultobjects ("set", "del", "rename"). Recorded
+    changes are appended to the journal and synced to disk on `commit`. Once the
+    journal holds `compact_every` records, a new snapshot is written and the
+    journal is emptied. The snapshot keeps the format of overlort_info.json.
+
+    Snapshots are written from a copy of the state by a background thread. On
+    compaction the journal is closed as a segment <journal>.<seq>, which is only
+    deleted once the snapshot covering it is on disk.
+
+    :param filepath: the path of the snapshot, defaults to "overlort_info.json"
+    :type filepath: str, optional
+    :param compact_every: the number of records, after which a new snapshot is
+        written, defaults to 1000
+    :type compact_every: int, optional
+    :param keep_snapshots: the number of previous snapshots kept, defaults to 3
+    :type keep_snapshots: int, optional
+    """
+
+    def __init__(
+        self,
+        filepath: str = "overlort_info.json",
+        compact_every: int = 1000,
+        keep_snapshots: int = 3,
+    ):
+        self.filepath = filepath
+        self.journalpath = filepath + ".journal"
+        self.compact_every = compact_every
+        self.keep_snapshots = keep_snapshots
+        self.records_since_snapshot = 0
+        self.bytes_written = 0
+        self._seq = 0
+        self._buffer: list[str] = []
+        self._lock = threading.Lock()
+        self._writer = SnapshotWriter(filepath, keep=keep_snapshots)
+
+    def record(self, op: str, path: Optional[list] = None, value: Any = None) -> None:
+        """This function records a change of the state. The value is serialized
+        right away, so later changes of it need to be recorded again.
+
+        :param op: the operation, one of "set", "del", "rename", "enqueue" and
+            "dequeue"
+        :type op: str
+        :param path: the keys leading to the changed entry in the resultobjects,
+            defaults to None
+        :type path: Optional[list], optional
+        :param value: the new value, the new key for "rename" or the entry of the
+            request queue, defaults to None
+        :type value: Any, optional
+        """
+        with self._lock:
+            self._seq += 1
+            self._buffer.append(
+                json.dumps({"seq": self._seq, "op": op, "path": path, "value": value}) + "\n"
+            )
+
+    def commit(self) -> None:
+        """This function appends the recorded changes to the journal and syncs it to
+        disk."""
+        with self._lock:
+            if not self._buffer:
+                return
+            data = "".join(self._buffer).encode("utf-8")
+            with open(self.journalpath, "ab") as fileobj:
+                fileobj.write(data)
+                fileobj.flush()
+                os.fsync(fileobj.fileno())
+            self.records_since_snapshot += len(self._buffer)
+            self.bytes_written += len(data)
+            self._buffer = []
+
+    def needs_compaction(self) -> bool:
+        """This function tells, whether enough changes were journaled to write a new
+        snapshot.
+
+        :return: True, if a new snapshot should be written
+        :rtype: bool
+        """
+        return self.records_since_snapshot >= self.compact_every
+
+    def compact(self, request_queue: Iterable, resultobjects: dict, wait: bool = False) -> None:
+        """This function starts writing a snapshot of the full state and begins a
+        new journal. Only the copy of the state is made while waiting.
+
+        :param request_queue: the entries of the request queue
+        :type request_queue: Iterable
+        :param resultobjects: the resultobjects
+        :type resultobjects: dict
+        :param wait: wait until the snapshot is on disk, defaults to False
+        :type wait: bool, optional
+        """
+        with self._lock:
+            # changes recorded, but not committed yet, are part of the snapshot
+            self._buffer = []
+            seq = self._seq
+            snapshot = {
+                "creation_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S CET"),
+                "journal_seq": seq,
+                "request_queue": [list(entry) for entry in request_queue],
+                "resultobjects": copy.deepcopy(resultobjects),
+            }
+            if os.path.exists(self.journalpath):
+                os.replace(self.journalpath, f"{self.journalpath}.{seq}")
+            self.records_since_snapshot = 0
+        self._writer.submit(snapshot, on_written=lambda: self._drop_segments(seq))
+        if wait:
+            self._writer.wait()
+
+    def disk_bytes(self) -> int:
+        """This function tells the size of the snapshot and the journal on disk.
+
+        :return: the size in bytes
+        :rtype: int
+        """
+        paths = [self.filepath] + self._segments()
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def close(self) -> None:
+        """This function commits the recorded changes and waits for the snapshot
+        being written."""
+        self.commit()
+        self._writer.wait()
+
+    def load(self) -> Optional[dict]:
+        """This function restores the state from the newest valid snapshot and the
+        journal segments written after it.
+
+        :raises RuntimeError: if there are snapshots, but none of them can be read
+        :return: the state with the keys "request_queue" and "resultobjects" or
+            None, if there is no snapshot
+        :rtype: Optional[dict]
+        """
+        loaded = load_newest_valid(self.filepath, self.keep_snapshots)
+        if loaded is None:
+            return None
+        state, path = loaded
+        if path != self.filepath:
+            logger.error("Falling back to the older snapshot %s", path)
+        seq = state.get("journal_seq", 0)
+        replayed = 0
+        for journalpath in self._segments() + [self.journalpath]:
+            if not os.path.exists(journalpath):
+                continue
+            with open(journalpath, "r") as fileobj:
+                for line in fileobj:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last record was torn by a crash while appending
+                        logger.error("Ignoring incomplete record in %s", journalpath)
+                        break
+                    if record["seq"] <= seq:
+                        continue
+                    if record["seq"] != seq + 1:
+                        # the changes in between were only part of a lost snapshot
+                        logger.error("Journal misses changes after %s, stopping replay", seq)
+                        return self._restored(state, seq, replayed)
+                    apply_record(state, record)
+                    seq = record["seq"]
+                    replayed += 1
+        return self._restored(state, seq, replayed)
+
+    @property
+    def snapshot_bytes_written(self) -> int:
+        return self._writer.bytes_written
+
+    def _restored(self, state: dict, seq: int, replayed: int) -> dict:
+        with self._lock:
+            self._seq = seq
+        logger.info("Restored state with %s journaled changes", replayed)
+        return state
+
+    def _segments(self) -> list[str]:
+        segments = []
+        for segment in glob.glob(glob.escape(self.journalpath) + ".*"):
+            suffix = segment.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                segments.append((int(suffix), segment))
+        return [segment for _, segment in sorted(segments)]
+
+    def _drop_segments(self, seq: int) -> None:
+        # called by the snapshot writer, once the snapshot up to seq is on disk
+        for segment in self._segments():
+            if int(segment.rsplit(".", 1)[1]) <= seq:
+                os.remove(segment)
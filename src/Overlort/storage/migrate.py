@@ -0,0 +1,48 @@
+"""This module imports the state saved in overlort_info.json and its journal into
+an SQLite database for the "sqlite" backend of conf["state"]. Run it from
+src with
+
+    python -m Overlort.storage.migrate overlort_info.json overlort.db
+"""
+import argparse
+import logging
+
+from .journal import StateJournal
+from .sqlite_store import SQLiteStore
+
+logger = logging.getLogger("Overlogger")
+
+
+def migrate(snapshot: str, database: str) -> int:
+    """This function imports a saved state into a database, replacing the workflows
+    active in the database.
+
+    :param snapshot: the path of the snapshot, like "overlort_info.json"
+    :type snapshot: str
+    :param database: the path of the database
+    :type database: str
+    :raises FileNotFoundError: if there is no snapshot
+    :return: the number of workflows imported
+    :rtype: int
+    """
+    state = StateJournal(snapshot).load()
+    if state is None:
+        raise FileNotFoundError("No snapshot found at " + snapshot)
+    store = SQLiteStore(database)
+    store.compact(state["request_queue"], state["resultobjects"])
+    store.close()
+    return len(state["resultobjects"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("snapshot", help="the saved state, like overlort_info.json")
+    parser.add_argument("database", help="the SQLite database to import into")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    count = migrate(args.snapshot, args.database)
+    print("Imported " + str(count) + " workflows into " + args.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger("Overlogger")
+
+
+class SchemaCache:
+    """A class caching the templates of the FINALES server per (quantity, method).
+
+    Entries are kept for `ttl_s` seconds. An expired entry is revalidated with its
+    ETag, if the server sent one, so an unchanged template is not downloaded again.
+    If more than `max_entries` entries are cached, the least recently used ones are
+    dropped. The cache is saved to a file and loaded again after a restart. All
+    methods are thread-safe.
+
+    :param fetch: the function requesting a template from the server; it is called
+        with the quantity, the method and the ETag of the cached template or None
+        and returns the template or None, if it was not modified, and its ETag
+    :type fetch: Callable[[str, str, Optional[str]], tuple[Optional[dict], Optional[str]]]
+    :param filepath: the file the cache is saved to, defaults to None, which keeps
+        the cache in memory only
+    :type filepath: Optional[str], optional
+    :param ttl_s: the time after which a template is revalidated, defaults to 3600
+    :type ttl_s: float, optional
+    :param max_entries: the maximum number of cached templates, defaults to 64
+    :type max_entries: int, optional
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, str, Optional[str]], tuple[Optional[dict], Optional[str]]],
+        filepath: Optional[str] = None,
+        ttl_s: float = 3600,
+        max_entries: int = 64,
+    ):
+        self.fetch = fetch
+        self.filepath = filepath
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def get(self, quantity: str, method: str) -> dict:
+        """This function returns the template for a quantity and method, requesting
+        it from the server only if it is not cached or expired.
+
+        :param quantity: the name of the quantity
+        :type quantity: str
+        :param method: the name of the method
+        :type method: str
+        :return: the answer of the template endpoint
+        :rtype: dict
+        """
+        key = f"{quantity}-{method}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if time.time() - entry["fetched_at"] < self.ttl_s:
+                    self.hits += 1
+                    return entry["schema"]
+            self.misses += 1
+        etag = entry["etag"] if entry is not None else None
+        schema, new_etag = self.fetch(quantity, method, etag)
+        if schema is None:
+            # not modified since it was cached
+            schema = entry["schema"]
+            new_etag = new_etag or etag
+        with self._lock:
+            self._entries[key] = {
+                "quantity": quantity,
+                "method": method,
+                "schema": schema,
+                "etag": new_etag,
+                "fetched_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+        return schema
+
+    def warm(self, steps: Iterable[tuple]) -> None:
+        """This function loads the templates of all steps of a workflow into the
+        cache. Failures are logged and left to be retried on the first use.
+
+        :param steps: tuples starting with the quantity and method of each step
+        :type steps: Iterable[tuple]
+        """
+        for step in steps:
+            try:
+                self.get(step[0], step[1])
+            except Exception as error:
+                logger.error(
+                    "Could not load template for %s with method %s: %s", step[0], step[1], error
+                )
+
+    def invalidate(self, quantity: Optional[str] = None, method: Optional[str] = None) -> None:
+        """This function drops cached templates, so they are requested again.
+
+        :param quantity: the quantity of the template to drop, defaults to None,
+            which drops the templates of all quantities
+        :type quantity: Optional[str], optional
+        :param method: the method of the template to drop, defaults to None, which
+            drops the templates of all methods of the quantity
+        :type method: Optional[str], optional
+        """
+        with self._lock:
+            for key in list(self._entries):
+                entry = self._entries[key]
+                if quantity is not None and entry["quantity"] != quantity:
+                    continue
+                if method is not None and entry["method"] != method:
+                    continue
+                del self._entries[key]
+            self._save()
+
+    def load(self) -> None:
+        """This function loads the cache saved by a previous run, if there is one."""
+        if self.filepath is None or not os.path.exists(self.filepath):
+            return
+        try:
+            with open(self.filepath, "r") as fileobj:
+                entries = json.load(fileobj)
+        except (OSError, ValueError):
+            logger.error("Could not load template cache from %s", self.filepath)
+            return
+        with self._lock:
+            self._entries = OrderedDict(entries)
+
+    def _save(self) -> None:
+        # must be called while holding the lock
+        if self.filepath is None:
+            return
+        temppath = self.filepath + ".tmp"
+        with open(temppath, "w") as fileobj:
+            json.dump(self._entries, fileobj)
+        os.replace(temppath, self.filepath)
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger("Overlogger")
+
+
+def fsync_directory(path: str) -> None:
+    """This function makes a rename or creation of a file in a directory durable.
+
+    :param path: the path of the file
+    :type path: str
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """This function replaces a file by writing a temporary file and renaming it,
+    so a crash leaves either the old or the new file.
+
+    :param path: the path of the file
+    :type path: str
+    :param data: the new content of the file
+    :type data: bytes
+    """
+    temppath = path + ".tmp"
+    with open(temppath, "wb") as fileobj:
+        fileobj.write(data)
+        fileobj.flush()
+        os.fsync(fileobj.fileno())
+    os.replace(temppath, path)
+    fsync_directory(path)
+
+
+def snapshot_paths(filepath: str, keep: int) -> list[str]:
+    """This function lists the paths of a snapshot and its rotated predecessors,
+    newest first.
+
+    :param filepath: the path of the newest snapshot
+    :type filepath: str
+    :param keep: the number of previous snapshots kept
+    :type keep: int
+    :return: the paths of the snapshots
+    :rtype: list[str]
+    """
+    return [filepath] + [f"{filepath}.{i}" for i in range(1, keep + 1)]
+
+
+def load_newest_valid(filepath: str, keep: int) -> Optional[tuple[dict, str]]:
+    """This function loads the newest snapshot, which can be read completely.
+
+    :param filepath: the path of the newest snapshot
+    :type filepath: str
+    :param keep: the number of previous snapshots kept
+    :type keep: int
+    :raises RuntimeError: if there are snapshots, but none of them can be read
+    :return: the snapshot and its path or None, if there is no snapshot at all
+    :rtype: Optional[tuple[dict, str]]
+    """
+    found = False
+    for path in snapshot_paths(filepath, keep):
+        if not os.path.exists(path):
+            continue
+        found = True
+        try:
+            with open(path, "r") as fileobj:
+                snapshot = json.load(fileobj)
+            snapshot["request_queue"], snapshot["resultobjects"]
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.error("Snapshot %s is not valid: %s", path, error)
+            continue
+        return snapshot, path
+    if found:
+        raise RuntimeError("None of the snapshots of " + filepath + " can be read")
+    return None
+
+
+class SnapshotWriter:
+    """A class writing snapshots of the state in a background thread, so the loop
+    of the Overlort does not wait for the disk.
+
+    Each snapshot replaces the file atomically and the previous `keep` snapshots are
+    kept as <filepath>.1 to <filepath>.<keep>. If snapshots are submitted faster
+    than they are written, only the newest one is written.
+
+    :param filepath: the path of the snapshot
+    :type filepath: str
+    :param keep: the number of previous snapshots kept, defaults to 3
+    :type keep: int, optional
+    """
+
+    def __init__(self, filepath: str, keep: int = 3):
+        self.filepath = filepath
+        self.keep = keep
+        self.bytes_written = 0
+        self._pending: Optional[tuple[dict, Optional[Callable]]] = None
+        self._busy = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._work, name="OverlortSnapshotWriter", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, snapshot: dict, on_written: Optional[Callable] = None) -> None:
+        """This function hands a snapshot over to the background thread. The
+        snapshot must not be changed afterwards.
+
+        :param snapshot: the snapshot to write
+        :type snapshot: dict
+        :param on_written: a function called after the snapshot was written,
+            defaults to None
+        :type on_written: Optional[Callable], optional
+        """
+        with self._condition:
+            self._pending = (snapshot, on_written)
+            self._condition.notify_all()
+
+    def wait(self) -> None:
+        """This function blocks until all submitted snapshots are written."""
+        with self._condition:
+            while self._pending is not None or self._busy:
+                self._condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                snapshot, on_written = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                self._write(snapshot)
+                if on_written is not None:
+                    on_written()
+            except Exception as error:
+                logger.error("Could not write snapshot %s: %s", self.filepath, error)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _write(self, snapshot: dict) -> None:
+        data = json.dumps(snapshot).encode("utf-8")
+        paths = snapshot_paths(self.filepath, self.keep)
+        # shift the previous snapshots, the oldest one is dropped
+        for older, newer in reversed(list(zip(paths[1:], paths[:-1]))):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        write_atomic(self.filepath, data)
+        self.bytes_written += len(data)
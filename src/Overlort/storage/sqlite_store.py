@@ -0,0 +1,303 @@
+import json
+import os
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger("Overlogger")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflows (
+    uuid TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    workflow_uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (workflow_uuid, name)
+);
+CREATE TABLE IF NOT EXISTS requests (
+    request_uuid TEXT PRIMARY KEY,
+    workflow_uuid TEXT NOT NULL,
+    status TEXT NOT NULL,
+    queued INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    request_uuid TEXT PRIMARY KEY,
+    workflow_uuid TEXT NOT NULL,
+    step TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workflows_status ON workflows (status);
+CREATE INDEX IF NOT EXISTS steps_status ON steps (status, quantity);
+CREATE INDEX IF NOT EXISTS requests_workflow ON requests (workflow_uuid);
+CREATE INDEX IF NOT EXISTS requests_status ON requests (status);
+CREATE INDEX IF NOT EXISTS results_workflow ON results (workflow_uuid);
+"""
+
+
+def _json_path(keys: Iterable[str]) -> str:
+    return "$" + "".join('."' + str(key).replace('"', '\\"') + '"' for key in keys)
+
+
+class SQLiteStore:
+    """A class persisting the state of the Overlort in an SQLite database as an
+    alternative to the StateJournal with the same methods.
+
+    The database has a row per workflow, per step of a workflow, per request posted
+    and per result received, indexed by the UUIDs and the status. The changes
+    recorded are applied as point updates in one transaction on `commit`. Ended
+    workflows are kept with the status "closed", so they can still be queried, e.g.
+    the workflows waiting for a transport:
+
+        SELECT workflow_uuid FROM steps JOIN workflows ON uuid = workflow_uuid
+        WHERE workflows.status = 'active' AND quantity = 'transport'
+        AND steps.status = 'open'
+
+    The database is opened in WAL mode, so it can be read while the Overlort runs.
+
+    :param filepath: the path of the database, defaults to "overlort.db"
+    :type filepath: str, optional
+    """
+
+    def __init__(self, filepath: str = "overlort.db"):
+        self.filepath = filepath
+        self.records_since_snapshot = 0
+        self._buffer: list[tuple[str, Optional[list], str]] = []
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.executescript(SCHEMA)
+
+    def record(self, op: str, path: Optional[list] = None, value: Any = None) -> None:
+        """This function records a change of the state like `StateJournal.record`.
+
+        :param op: the operation, one of "set", "del", "rename", "enqueue" and
+            "dequeue"
+        :type op: str
+        :param path: the keys leading to the changed entry in the resultobjects,
+            defaults to None
+        :type path: Optional[list], optional
+        :param value: the new value, the new key for "rename" or the entry of the
+            request queue, defaults to None
+        :type value: Any, optional
+        """
+        with self._lock:
+            self._buffer.append((op, path, json.dumps(value)))
+
+    def commit(self) -> None:
+        """This function writes the recorded changes to the database in one
+        transaction."""
+        with self._lock:
+            if not self._buffer:
+                return
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S CET")
+            with self._connection:
+                for op, path, value in self._buffer:
+                    self._apply(op, path, value, now)
+            self.records_since_snapshot += len(self._buffer)
+            self._buffer = []
+
+    def needs_compaction(self) -> bool:
+        """This function tells, whether the state should be written in full, which
+        the database never needs.
+
+        :return: False
+        :rtype: bool
+        """
+        return False
+
+    def compact(self, request_queue: Iterable, resultobjects: dict, wait: bool = False) -> None:
+        """This function replaces the content of the database by the full state.
+
+        :param request_queue: the entries of the request queue
+        :type request_queue: Iterable
+        :param resultobjects: the resultobjects
+        :type resultobjects: dict
+        :param wait: ignored, the state is always written right away, defaults to
+            False
+        :type wait: bool, optional
+        """
+        with self._lock:
+            self._buffer = []
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S CET")
+            with self._connection:
+                self._connection.execute(
+                    "UPDATE workflows SET status = 'closed' WHERE status = 'active'"
+                )
+                self._connection.execute(
+                    "UPDATE requests SET status = 'done' WHERE status = 'open'"
+                )
+                for workflowID, resultobject in resultobjects.items():
+                    self._set_workflow(workflowID, resultobject, now)
+                for entry in request_queue:
+                    self._enqueue(entry)
+            self.records_since_snapshot = 0
+
+    def disk_bytes(self) -> int:
+        """This function tells the size of the database and its write-ahead log on
+        disk.
+
+        :return: the size in bytes
+        :rtype: int
+        """
+        paths = [self.filepath, self.filepath + "-wal"]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def close(self) -> None:
+        """This function writes the recorded changes."""
+        self.commit()
+
+    def load(self) -> Optional[dict]:
+        """This function reads the state of the active workflows.
+
+        :return: the state with the keys "request_queue" and "resultobjects" or
+            None, if the database holds no workflows yet
+        :rtype: Optional[dict]
+        """
+        with self._lock:
+            connection = self._connection
+            if connection.execute("SELECT 1 FROM workflows LIMIT 1").fetchone() is None:
+                return None
+            resultobjects = {}
+            rows = connection.execute(
+                "SELECT workflow_uuid, name, request, result FROM steps"
+                " JOIN workflows ON uuid = workflow_uuid WHERE workflows.status = 'active'"
+                " ORDER BY workflows.rowid, position"
+            )
+            for workflowID, name, request, result in rows:
+                resultobjects.setdefault(workflowID, {})[name] = {
+                    "request": json.loads(request),
+                    "result": json.loads(result),
+                }
+            request_queue = [
+                [requestID, workflowID]
+                for requestID, workflowID in connection.execute(
+                    "SELECT request_uuid, workflow_uuid FROM requests"
+                    " WHERE status = 'open' ORDER BY queued"
+                )
+            ]
+        logger.info("Restored state of %s workflows from %s", len(resultobjects), self.filepath)
+        return {"request_queue": request_queue, "resultobjects": resultobjects}
+
+    def _apply(self, op: str, path: Optional[list], value: str, now: str) -> None:
+        execute = self._connection.execute
+        if op == "enqueue":
+            self._enqueue(json.loads(value))
+            return
+        if op == "dequeue":
+            execute(
+                "UPDATE requests SET status = 'done' WHERE request_uuid = ?",
+                (json.loads(value)[0],),
+            )
+            return
+        workflowID = path[0]
+        execute("UPDATE workflows SET updated = ? WHERE uuid = ?", (now, workflowID))
+        if len(path) == 1:
+            if op == "set":
+                self._set_workflow(workflowID, json.loads(value), now)
+            elif op == "del":
+                execute("UPDATE workflows SET status = 'closed' WHERE uuid = ?", (workflowID,))
+            return
+        name = path[1]
+        if len(path) == 2:
+            if op == "set":
+                self._set_step(workflowID, name, json.loads(value))
+            elif op == "del":
+                execute("DELETE FROM steps WHERE workflow_uuid = ? AND name = ?", (workflowID, name))
+            elif op == "rename":
+                # the renamed step moves to the end like in the resultobject
+                execute(
+                    "UPDATE steps SET name = ?, position = (SELECT MAX(position) + 1 FROM"
+                    " steps WHERE workflow_uuid = ?) WHERE workflow_uuid = ? AND name = ?",
+                    (json.loads(value), workflowID, workflowID, name),
+                )
+                execute(
+                    "UPDATE results SET step = ? WHERE workflow_uuid = ? AND step = ?",
+                    (json.loads(value), workflowID, name),
+                )
+            return
+        column = path[2]
+        if column not in ("request", "result"):
+            raise ValueError("Unknown part " + str(column) + " of step " + str(name))
+        if len(path) == 3:
+            expression, arguments = ("json(?)", (value,)) if op == "set" else ("'{}'", ())
+        elif op == "set":
+            expression, arguments = "json_set(" + column + ", ?, json(?))", (_json_path(path[3:]), value)
+        else:
+            expression, arguments = "json_remove(" + column + ", ?)", (_json_path(path[3:]),)
+        execute(
+            "UPDATE steps SET " + column + " = " + expression + " WHERE workflow_uuid = ? AND name = ?",
+            (*arguments, workflowID, name),
+        )
+        if column == "result":
+            self._update_status(workflowID, name)
+            if op == "set":
+                self._add_results(workflowID, name, json.loads(value))
+
+    def _set_workflow(self, workflowID: str, resultobject: dict, now: str) -> None:
+        execute = self._connection.execute
+        execute(
+            "INSERT INTO workflows (uuid, status, updated) VALUES (?, 'active', ?)"
+            " ON CONFLICT (uuid) DO UPDATE SET status = 'active', updated = excluded.updated",
+            (workflowID, now),
+        )
+        execute("DELETE FROM steps WHERE workflow_uuid = ?", (workflowID,))
+        for name, step in resultobject.items():
+            self._set_step(workflowID, name, step)
+
+    def _set_step(self, workflowID: str, name: str, step: dict) -> None:
+        # a step set again keeps its position like a key of the resultobject
+        self._connection.execute(
+            "INSERT INTO steps (workflow_uuid, name, quantity, position, status, request,"
+            " result) VALUES (?, ?, ?, (SELECT COALESCE(MAX(position) + 1, 0) FROM steps"
+            " WHERE workflow_uuid = ?), 'open', ?, ?) ON CONFLICT (workflow_uuid, name)"
+            " DO UPDATE SET request = excluded.request, result = excluded.result",
+            (
+                workflowID, name, name.split("-")[0], workflowID,
+                json.dumps(step.get("request", {})), json.dumps(step.get("result", {})),
+            ),
+        )
+        self._update_status(workflowID, name)
+        self._add_results(workflowID, name, step.get("result", {}))
+
+    def _update_status(self, workflowID: str, name: str) -> None:
+        self._connection.execute(
+            "UPDATE steps SET status = CASE WHEN result IN ('{}', 'null') THEN 'open'"
+            " ELSE 'done' END WHERE workflow_uuid = ? AND name = ?",
+            (workflowID, name),
+        )
+
+    def _add_results(self, workflowID: str, name: str, value: Any) -> None:
+        # a result or the results of a cell-wise step by request ID; request_0 only
+        # points to the results of the last step
+        if name == "request_0" or not isinstance(value, dict) or not value:
+            return
+        results = [value] if "result" in value else value.values()
+        for result_step in results:
+            try:
+                requestID = result_step["result"]["request_uuid"]
+            except (KeyError, TypeError):
+                continue
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (request_uuid, workflow_uuid, step, result)"
+                " VALUES (?, ?, ?, ?)",
+                (requestID, workflowID, name, json.dumps(result_step)),
+            )
+
+    def _enqueue(self, entry: list) -> None:
+        self._connection.execute(
+            "INSERT INTO requests (request_uuid, workflow_uuid, status, queued) VALUES"
+            " (?, ?, 'open', (SELECT COALESCE(MAX(queued) + 1, 0) FROM requests))"
+            " ON CONFLICT (request_uuid) DO UPDATE SET status = 'open', queued = excluded.queued",
+            (entry[0], entry[1]),
+        )
@@ -0,0 +1,7 @@
+from .request_queue import RequestQueue
+from .state_machine import Step, WorkflowStateMachine
+from .templates import TemplateCompiler, TemplatePlan
+from .discovery import RequestDiscovery
+from .limitations import LimitationValidator
+# the asynchronous engine and the sharding pull in asyncio, multiprocessing and the
+# configuration, so they are imported from their modules
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable
+
+from ..configuration.config import conf
+from ..Logger.metrics import metrics
+
+logger = logging.getLogger("Overlogger")
+
+
+class AsyncWorkflowEngine:
+    """A class running the loop of an Overlort with asyncio, so a slow tenant
+    endpoint only delays the workflow waiting for it.
+
+    Each tick, the results are polled while the new requests are collected. Then the
+    results are handled per workflow and new workflows are started, all workflows
+    at the same time. The blocking calls of the Overlort run in a thread pool and a
+    semaphore limits how many of them run at once. The calls to the FINALES server
+    in flight are limited by its client, as a handler may send several at once.
+    The state is saved once per tick after all workflows were handled.
+
+    :param overlort: the Overlort, whose workflows are handled
+    :type overlort: Overlort
+    :param max_concurrency: the maximum number of blocking calls running at once,
+        defaults to 8
+    :type max_concurrency: int, optional
+    """
+
+    def __init__(self, overlort, max_concurrency: int = 8):
+        self.overlort = overlort
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    async def run(self) -> None:
+        """This function runs the loop until the end run time of the Overlort."""
+        overlort = self.overlort
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="Overlort")
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.info("Overlort started in async mode")
+        overlort._load_overlort_params()
+        await self._call(overlort._schema_cache.warm, conf["workflow"])
+        overlort._result_poller.max_workers = self.max_concurrency
+        overlort._defer_saves = True
+        if overlort._listener is not None:
+            overlort._listener.start()
+        overlort._start_metrics()
+        overlort._next_discovery = time.monotonic() + overlort.sleep_time_s
+        try:
+            while datetime.now() < overlort.end_run_time:
+                # wait until a request is due to be polled, a result is pushed or
+                # the pending requests are collected again
+                if overlort._listener is None:
+                    await asyncio.sleep(overlort._wait())
+                else:
+                    await asyncio.to_thread(overlort._listener.wait, overlort._wait())
+                overlort._ticks += 1
+                metrics.inc("overlort_ticks_total")
+                with metrics.timer("overlort_phase_seconds", phase="tick"):
+                    await self.tick()
+                overlort._update_metrics()
+        finally:
+            if overlort._listener is not None:
+                overlort._listener.close()
+            self._save()
+            overlort._stop_metrics()
+            overlort._journal.close()
+            overlort._defer_saves = False
+            overlort._result_poller.max_workers = 1
+
+    async def tick(self) -> None:
+        """This function polls the results due and, every conf["sleep_time_s"], the
+        new requests once and handles them."""
+        overlort = self.overlort
+        polled, new_requests = await asyncio.gather(
+            self._call(overlort._poll_results),
+            self._call(overlort._update_new_request) if overlort._discovery_due() else self._none(),
+        )
+        # results of the same workflow depend on each other and are handled in order
+        by_workflow = defaultdict(list)
+        for req, result_step in polled:
+            by_workflow[req[1]].append((req, result_step))
+        outcomes = await asyncio.gather(
+            *(self._handle_workflow(items) for items in by_workflow.values()),
+            *(self._call(overlort._start_workflow, r) for r in new_requests),
+            return_exceptions=True,
+        )
+        # persist what was done before a failure stops the loop like in `run`
+        self._save()
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+
+    async def _none(self) -> list:
+        return []
+
+    async def _handle_workflow(self, items: list[tuple[list, dict]]) -> None:
+        await self._call(self.overlort._handle_results, items)
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    def _save(self) -> None:
+        overlort = self.overlort
+        if not overlort._save_pending:
+            return
+        overlort._save_pending = False
+        overlort._defer_saves = False
+        try:
+            overlort._save_overlort_params()
+        finally:
+            overlort._defer_saves = True
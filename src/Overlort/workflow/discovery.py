@@ -0,0 +1,88 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger("Overlogger")
+
+
+class RequestDiscovery:
+    """A class finding the pending requests for the tenant without validating the
+    same request again in every tick.
+
+    A request is first checked on its raw quantity and methods against the pairs of
+    (quantity, method) supported by the tenant, so requests for other tenants are
+    never validated. The outcome for each request is remembered by its UUID, until
+    the request is no longer pending or more than `max_seen` requests are
+    remembered.
+
+    :param supported: the pairs of (quantity, method) supported by the tenant
+    :type supported: Iterable[tuple[str, str]]
+    :param max_seen: the maximum number of requests remembered, defaults to 10000
+    :type max_seen: int, optional
+    """
+
+    def __init__(self, supported: Iterable[tuple[str, str]], max_seen: int = 10000):
+        self.supported = set(supported)
+        self.quantities = {quantity for quantity, _ in self.supported}
+        self.max_seen = max_seen
+        self.validated = 0
+        self.skipped = 0
+        # request UUID -> the validated request or None, if it is not for the tenant
+        self._seen: OrderedDict = OrderedDict()
+
+    def filter(self, pending: list[dict], validate: Callable[[dict], Optional[dict]]) -> list[dict]:
+        """This function selects the pending requests the tenant can work on.
+
+        :param pending: the pending requests as received from the FINALES server
+        :type pending: list[dict]
+        :param validate: the function validating a pending request, which returns
+            the validated request or None, if it does not fit the tenant
+        :type validate: Callable[[dict], Optional[dict]]
+        :return: the pending requests for the tenant with the validated requests
+        :rtype: list[dict]
+        """
+        current = set()
+        accepted = []
+        for pendingItem in pending:
+            uuid = pendingItem.get("uuid")
+            current.add(uuid)
+            if uuid in self._seen:
+                self._seen.move_to_end(uuid)
+                request = self._seen[uuid]
+                self.skipped += 1
+            else:
+                request = self._classify(pendingItem, validate)
+                if uuid is not None:
+                    self._seen[uuid] = request
+                    while len(self._seen) > self.max_seen:
+                        self._seen.popitem(last=False)
+            if request is not None:
+                pendingItem["request"] = request
+                accepted.append(pendingItem)
+        # requests no longer pending were reserved or withdrawn
+        for uuid in [uuid for uuid in self._seen if uuid not in current]:
+            del self._seen[uuid]
+        return accepted
+
+    def supports(self, requestDict: dict) -> bool:
+        """This function checks the raw quantity and methods of a request.
+
+        :param requestDict: the request as received from the FINALES server
+        :type requestDict: dict
+        :return: True, if the tenant supports the quantity with one of the methods
+        :rtype: bool
+        """
+        quantity = requestDict.get("quantity")
+        methods = requestDict.get("methods") or []
+        return any((quantity, method) in self.supported for method in methods)
+
+    def _classify(self, pendingItem: dict, validate: Callable[[dict], Optional[dict]]) -> Optional[dict]:
+        requestDict = pendingItem.get("request")
+        if not isinstance(requestDict, dict) or not self.supports(requestDict):
+            return None
+        self.validated += 1
+        try:
+            return validate(pendingItem)
+        except Exception as error:
+            logger.error("Pending request %s is not valid: %s", pendingItem.get("uuid"), error)
+            return None
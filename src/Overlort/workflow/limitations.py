@@ -0,0 +1,231 @@
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+# NumPy is imported where it is used, so importing the Overlort stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _is_range(value: Any) -> bool:
+    return isinstance(value, dict) and "min" in value and "max" in value
+
+
+def _is_ranges(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(_is_range(item) for item in value)
+
+
+def _is_formulations(value: Any) -> bool:
+    return (
+        isinstance(value, list) and bool(value)
+        and all(isinstance(item, list) for item in value)
+        and all(isinstance(part, dict) and "chemical" in part for item in value for part in item)
+    )
+
+
+def _bounds(ranges: list[dict]) -> "np.ndarray":
+    import numpy as np
+
+    return np.array([[r["min"], r["max"]] for r in ranges], dtype=float).reshape(-1, 2)
+
+
+def _in_bounds(values: "np.ndarray", bounds: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    # True for each value within any of the ranges
+    values = values[..., np.newaxis]
+    return np.any((values >= bounds[:, 0]) & (values <= bounds[:, 1]), axis=-1)
+
+
+def _names(chemical: dict) -> set:
+    names = set()
+    for key in ("SMILES", "InChIKey"):
+        value = chemical.get(key)
+        names.update(value if isinstance(value, list) else [value])
+    names.discard(None)
+    return names
+
+
+def _path_name(path: tuple) -> str:
+    return ".".join(str(key) for key in path)
+
+
+class LimitationValidator:
+    """A class checking the parameters of a request against the limitations of a
+    method of the tenant.
+
+    The limitations are compiled once. Ranges of single numbers are stacked into one
+    array of bounds, so all of them are checked in a single vectorized comparison.
+    Lists of numbers like "input_cycles" are compared element-wise with their
+    ranges. Allowed values and formulations, which are lists of components with a
+    chemical and a range of its fraction, are checked by compiled functions.
+    Parameters missing in the request are not checked.
+
+    :param limitations: the limitations of the method
+    :type limitations: dict
+    """
+
+    def __init__(self, limitations: dict):
+        import numpy as np
+
+        # single numbers: the path per parameter and the bounds with their parameter
+        self._scalar_paths: list[tuple] = []
+        self._scalar_index: list[int] = []
+        scalar_bounds: list["np.ndarray"] = []
+        self._checks: list[tuple[tuple, Callable[[Any], Optional[str]]]] = []
+        self._compile(limitations or {}, (), scalar_bounds)
+        self._bounds = np.concatenate(scalar_bounds) if scalar_bounds else np.empty((0, 2))
+        self._index = np.asarray(self._scalar_index, dtype=int)
+
+    def validate(self, parameters: dict) -> list[str]:
+        """This function checks the parameters of a request.
+
+        :param parameters: the parameters of the request for the method
+        :type parameters: dict
+        :return: the violated limitations, an empty list if there are none
+        :rtype: list[str]
+        """
+        import numpy as np
+
+        violations = []
+        if self._scalar_paths:
+            values = np.full(len(self._scalar_paths), np.nan)
+            for i, path in enumerate(self._scalar_paths):
+                value = _lookup(parameters, path)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[i] = value
+                elif isinstance(value, list):
+                    # several values for the same parameter
+                    message = _list_check(self._bounds[self._index == i])(value)
+                    if message is not None:
+                        violations.append(_path_name(path) + " " + message)
+                elif value is not None:
+                    violations.append(_path_name(path) + " is not a number")
+            # a parameter is fine, if it is within any of its ranges or missing
+            ok = np.isnan(values)
+            # each range only against the value of its own parameter
+            expanded = values[self._index]
+            in_range = (expanded >= self._bounds[:, 0]) & (expanded <= self._bounds[:, 1])
+            np.logical_or.at(ok, self._index, in_range)
+            for i in np.flatnonzero(~ok):
+                violations.append(
+                    _path_name(self._scalar_paths[i]) + " = " + str(values[i]) + " is out of range"
+                )
+        for path, check in self._checks:
+            value = _lookup(parameters, path)
+            if value is None:
+                continue
+            message = check(value)
+            if message is not None:
+                violations.append(_path_name(path) + " " + message)
+        return violations
+
+    def _compile(self, limitation: Any, path: tuple, scalar_bounds: list) -> None:
+        import numpy as np
+
+        if isinstance(limitation, dict):
+            for key, value in limitation.items():
+                self._compile(value, path + (key,), scalar_bounds)
+        elif _is_ranges(limitation):
+            self._scalar_index.extend([len(self._scalar_paths)] * len(limitation))
+            self._scalar_paths.append(path)
+            scalar_bounds.append(_bounds(limitation))
+        elif isinstance(limitation, list) and limitation and all(_is_ranges(item) for item in limitation):
+            bounds = np.concatenate([_bounds(item) for item in limitation])
+            self._checks.append((path, _list_check(bounds)))
+        elif _is_formulations(limitation):
+            self._checks.append((path, _formulation_check(limitation)))
+        elif isinstance(limitation, list):
+            self._checks.append((path, _allowed_check(limitation)))
+        else:
+            self._checks.append((path, _allowed_check([limitation])))
+
+
+def _lookup(parameters: dict, path: tuple) -> Any:
+    value = parameters
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _flatten(value: Any) -> Iterator[Any]:
+    # the items of nested lists, which may differ in length like the cycles of cells
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _flatten(item)
+    else:
+        yield value
+
+
+def _list_check(bounds: "np.ndarray") -> Callable[[Any], Optional[str]]:
+    import numpy as np
+
+    def check(value: Any) -> Optional[str]:
+        try:
+            values = np.asarray(list(_flatten(value)), dtype=float)
+        except (TypeError, ValueError):
+            return "is not a list of numbers"
+        outside = np.flatnonzero(~_in_bounds(values, bounds))
+        if outside.size:
+            return "has " + str(outside.size) + " values out of range, e.g. " + str(values[outside[0]])
+        return None
+    return check
+
+
+def _allowed_check(allowed: list) -> Callable[[Any], Optional[str]]:
+    allowed_values = [item for item in allowed if not isinstance(item, (list, dict))]
+
+    def check(value: Any) -> Optional[str]:
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, (list, dict)):
+                continue
+            if item not in allowed_values:
+                return "= " + str(item) + " is not one of " + str(allowed_values)
+        return None
+    return check
+
+
+def _formulation_check(formulations: list[list[dict]]) -> Callable[[Any], Optional[str]]:
+    import numpy as np
+
+    # per allowed formulation: the names of each component, its bounds and types
+    compiled = []
+    for formulation in formulations:
+        components = []
+        for component in formulation:
+            chemical = component["chemical"]
+            types = component.get("fraction_type")
+            components.append((
+                _names(chemical if isinstance(chemical, dict) else {"SMILES": chemical}),
+                _bounds(component.get("fraction") or [{"min": -np.inf, "max": np.inf}]),
+                set(types if isinstance(types, list) else [types]) if types else None,
+            ))
+        compiled.append(components)
+
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, dict) and "formulation" in value:
+            value = value["formulation"]
+        if not isinstance(value, list):
+            return "is not a formulation"
+        for components in compiled:
+            fractions = np.zeros(len(components))
+            matched = True
+            for part in value:
+                chemical = part.get("chemical", {}) if isinstance(part, dict) else {}
+                names = _names(chemical if isinstance(chemical, dict) else {"SMILES": chemical})
+                position = next(
+                    (i for i, component in enumerate(components) if names & component[0]), None
+                )
+                types = components[position][2] if position is not None else None
+                if position is None or (types is not None and part.get("fraction_type") not in types):
+                    matched = False
+                    break
+                fractions[position] += part.get("fraction", 0)
+            # chemicals missing in the request have a fraction of 0
+            if matched and all(
+                _in_bounds(fractions[i:i + 1], component[1])[0]
+                for i, component in enumerate(components)
+            ):
+                return None
+        return "does not fit any of the allowed formulations"
+    return check
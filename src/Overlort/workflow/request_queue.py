@@ -0,0 +1,113 @@
+from typing import Iterable, Iterator, Optional
+
+
+class RequestQueue:
+    """A class holding the open requests of the Overlort as [requestID, workflowID]
+    entries, indexed by the request ID and by the workflow.
+
+    Adding, finding and removing an entry and counting the open requests of a
+    workflow take constant time. The entries keep the order they were added in.
+    Iterating works on a copy of the entries, so entries may be removed meanwhile.
+    The queue is saved as the list of its entries like the former plain list.
+
+    :param entries: the entries to start with, defaults to ()
+    :type entries: Iterable[list], optional
+    """
+
+    def __init__(self, entries: Iterable[list] = ()):
+        self._entries: dict[str, list] = {}
+        self._by_workflow: dict[str, dict[str, list]] = {}
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: list) -> None:
+        """This function adds an open request. An entry with the same request ID is
+        replaced.
+
+        :param entry: the entry with [requestID, workflowID]
+        :type entry: list
+        """
+        requestID, workflowID = entry[0], entry[1]
+        if requestID in self._entries:
+            self.discard(self._entries[requestID])
+        entry = [requestID, workflowID]
+        self._entries[requestID] = entry
+        self._by_workflow.setdefault(workflowID, {})[requestID] = entry
+
+    def remove(self, entry: list) -> None:
+        """This function removes an open request.
+
+        :param entry: the entry with [requestID, workflowID]
+        :type entry: list
+        :raises ValueError: if the entry is not in the queue
+        """
+        if entry not in self:
+            raise ValueError(str(entry) + " is not in the request queue")
+        self.discard(entry)
+
+    def discard(self, entry: list) -> None:
+        """This function removes an open request, if it is in the queue.
+
+        :param entry: the entry with [requestID, workflowID]
+        :type entry: list
+        """
+        if entry not in self:
+            return
+        requestID, workflowID = entry[0], entry[1]
+        del self._entries[requestID]
+        workflow = self._by_workflow[workflowID]
+        del workflow[requestID]
+        if not workflow:
+            del self._by_workflow[workflowID]
+
+    def get(self, requestID: str) -> Optional[list]:
+        """This function finds the entry of a request.
+
+        :param requestID: the ID of the request
+        :type requestID: str
+        :return: the entry with [requestID, workflowID] or None, if the request is
+            not open
+        :rtype: Optional[list]
+        """
+        return self._entries.get(requestID)
+
+    def count(self, workflowID: str) -> int:
+        """This function counts the open requests of a workflow.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :return: the number of open requests of the workflow
+        :rtype: int
+        """
+        return len(self._by_workflow.get(workflowID, ()))
+
+    def of_workflow(self, workflowID: str) -> list[list]:
+        """This function lists the open requests of a workflow.
+
+        :param workflowID: the UUID of the initial request of the workflow
+        :type workflowID: str
+        :return: the entries of the workflow in the order they were added
+        :rtype: list[list]
+        """
+        return list(self._by_workflow.get(workflowID, {}).values())
+
+    def to_list(self) -> list[list]:
+        """This function returns the entries in the format of overlort_info.json.
+
+        :return: the entries with [requestID, workflowID]
+        :rtype: list[list]
+        """
+        return [list(entry) for entry in self._entries.values()]
+
+    def __contains__(self, entry) -> bool:
+        found = self._entries.get(entry[0])
+        return found is not None and found[1] == entry[1]
+
+    def __iter__(self) -> Iterator[list]:
+        return iter(list(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return repr(self.to_list())
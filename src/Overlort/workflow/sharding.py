@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from typing import Callable
+
+logger = logging.getLogger("Overlogger")
+
+
+def shard_of(workflowID: str, shards: int) -> int:
+    """This function assigns a workflow to a shard by the hash of its UUID, which is
+    the same in every process.
+
+    :param workflowID: the UUID of the initial request of the workflow
+    :type workflowID: str
+    :param shards: the number of shards
+    :type shards: int
+    :return: the shard owning the workflow
+    :rtype: int
+    """
+    digest = hashlib.sha1(str(workflowID).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_path(path: str, shard: int) -> str:
+    """This function derives the path of a file of a shard, e.g.
+    "overlort_info.json" becomes "overlort_info.shard0.json".
+
+    :param path: the path of the file
+    :type path: str
+    :param shard: the shard
+    :type shard: int
+    :return: the path of the file of the shard
+    :rtype: str
+    """
+    root, extension = os.path.splitext(path)
+    return root + ".shard" + str(shard) + extension
+
+
+class Supervisor:
+    """A class running the workers of a sharded Overlort in processes of their own
+    and restarting a worker, which crashed. A restarted worker continues from the
+    state it saved.
+
+    The workers are spawned, so they share no threads or locks with the supervisor,
+    like the thread writing its log. The configuration is passed to them in `args`.
+
+    :param target: the function running a worker, called with the shard, the
+        number of shards and `args`
+    :type target: Callable[..., None]
+    :param shards: the number of workers
+    :type shards: int
+    :param end_run_time: the time after which no worker is restarted
+    :type end_run_time: datetime
+    :param restart_delay_s: the time waited before restarting a worker, defaults
+        to 5
+    :type restart_delay_s: float, optional
+    :param args: further arguments of the target, which must be picklable,
+        defaults to ()
+    :type args: tuple, optional
+    """
+
+    def __init__(
+        self,
+        target: Callable[..., None],
+        shards: int,
+        end_run_time: datetime,
+        restart_delay_s: float = 5,
+        args: tuple = (),
+    ):
+        self.target = target
+        self.shards = shards
+        self.end_run_time = end_run_time
+        self.restart_delay_s = restart_delay_s
+        self.args = args
+        self.restarts = [0] * shards
+        self._context = multiprocessing.get_context("spawn")
+
+    def run(self) -> None:
+        """This function runs the workers until all of them are done."""
+        logger.info("Supervisor starting %s workers", self.shards)
+        processes = {shard: self._start(shard) for shard in range(self.shards)}
+        try:
+            while processes:
+                time.sleep(1)
+                for shard, process in list(processes.items()):
+                    if process.is_alive():
+                        continue
+                    if process.exitcode == 0 or datetime.now() >= self.end_run_time:
+                        logger.info("Worker %s finished", shard)
+                        del processes[shard]
+                        continue
+                    self.restarts[shard] += 1
+                    logger.error("Worker %s exited with %s, restarting it", shard, process.exitcode)
+                    time.sleep(self.restart_delay_s)
+                    processes[shard] = self._start(shard)
+        finally:
+            for process in processes.values():
+                process.terminate()
+                process.join()
+
+    def _start(self, shard: int):
+        process = self._context.Process(
+            target=self.target, args=(shard, self.shards, *self.args), name="Overlort-shard" + str(shard)
+        )
+        process.start()
+        return process
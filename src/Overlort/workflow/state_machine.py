@@ -0,0 +1,90 @@
+from typing import NamedTuple, Optional
+
+
+class Step(NamedTuple):
+    """A step of the workflow.
+
+    :param index: the position of the step in the workflow
+    :type index: int
+    :param quantity: the quantity requested in the step
+    :type quantity: str
+    :param method: the method requested in the step
+    :type method: str
+    """
+
+    index: int
+    quantity: str
+    method: str
+
+
+class WorkflowStateMachine:
+    """A class compiling the steps of conf["workflow"] once into a table of
+    transitions, so the next step of a workflow is looked up instead of searched.
+
+    A workflow is in the state of the step, whose result arrived last. The state is
+    taken from the quantity and method of the request of that step. A quantity
+    requested more than once like "transport" is told apart by the entries of the
+    resultobject, as each request of it adds one and renames the earlier one to
+    "<quantity>-1". So the state needs no bookkeeping of its own and does not depend
+    on how many results of a step arrived already.
+
+    :param workflow: the steps as tuples of (quantity, method) or (quantity, method,
+        inputs)
+    :type workflow: list[tuple]
+    :raises ValueError: if the workflow has no steps
+    """
+
+    def __init__(self, workflow: list[tuple]):
+        if not workflow:
+            raise ValueError("The workflow needs at least one step")
+        self.steps = tuple(
+            Step(index=index, quantity=step[0], method=step[1])
+            for index, step in enumerate(workflow)
+        )
+        # (quantity, method) -> indices of the steps requesting it, in their order
+        self.positions: dict[tuple[str, str], list[int]] = {}
+        for step in self.steps:
+            self.positions.setdefault((step.quantity, step.method), []).append(step.index)
+        # state -> next step, the state -1 is a workflow without any requested step
+        self.transitions: dict[int, Optional[Step]] = {
+            index: self.steps[index + 1] if index + 1 < len(self.steps) else None
+            for index in range(-1, len(self.steps))
+        }
+
+    def state(self, resultobject: dict, last_req: dict) -> int:
+        """This function tells the state of a workflow.
+
+        :param resultobject: the requests and results of the workflow
+        :type resultobject: dict
+        :param last_req: the request, whose result arrived last, or the initial
+            request of the workflow
+        :type last_req: dict
+        :raises ValueError: if the request is not a step of the workflow
+        :return: the index of the step of the request or -1 for the initial request
+        :rtype: int
+        """
+        quantity, method = last_req["quantity"], last_req["methods"][0]
+        indices = self.positions.get((quantity, method))
+        if indices is None:
+            initial = resultobject["request_0"]["request"]["request"]
+            if quantity == initial["quantity"] and method == initial["methods"][0]:
+                return -1
+            raise ValueError("The workflow has no step " + str(quantity) + " with method " + str(method))
+        if len(indices) == 1:
+            return indices[0]
+        # the n-th request of a repeated quantity is the n-th step requesting it
+        requested = sum(1 for key in resultobject if key == quantity or key.startswith(quantity + "-"))
+        return indices[min(max(requested, 1), len(indices)) - 1]
+
+    def next_step(self, resultobject: dict, last_req: dict) -> Optional[Step]:
+        """This function returns the step to request after the one of a request.
+
+        :param resultobject: the requests and results of the workflow
+        :type resultobject: dict
+        :param last_req: the request, whose result arrived last, or the initial
+            request of the workflow
+        :type last_req: dict
+        :return: the next step or None, if the request was of the last step
+        :rtype: Optional[Step]
+        """
+        return self.transitions[self.state(resultobject, last_req)]
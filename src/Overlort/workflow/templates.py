@@ -0,0 +1,244 @@
+import copy
+import logging
+import threading
+from typing import Any, Callable, Iterable, NamedTuple
+
+logger = logging.getLogger("Overlogger")
+
+
+class Binding(NamedTuple):
+    """A field of an input template and the sources it is filled from.
+
+    :param path: the keys leading to the field in the template
+    :type path: tuple
+    :param sources: the sources tried in order, each a tuple of the kind
+        ("calculator", "param", "default", "nested" or "nested_list") and its
+        arguments
+    :type sources: tuple
+    :param leaf: False for a dict, whose fields have bindings of their own
+    :type leaf: bool
+    :param skip: the number of bindings of the fields inside this one, which are
+        skipped if this one is filled as a whole
+    :type skip: int
+    """
+
+    path: tuple
+    sources: tuple
+    leaf: bool
+    skip: int
+
+
+class TemplatePlan:
+    """A class holding the bindings of an input template, so filling it is a
+    single pass over the fields.
+
+    A field is filled from the first source, which provides a value:
+
+    1. the calculator named like the field
+    2. the field of the same name in the parameter named like the enclosing dict
+    3. the parameter named like the field
+    4. the default value of the field
+    5. a field of the same name inside one of the parameters, if it has the same
+       shape as in the template
+
+    A dict of the template is taken as a whole from 2. or 5., if the parameter is a
+    dict as well, otherwise its fields are filled one by one. Fields without a value keep the value of the template and
+    are reported as missing.
+
+    :param template: the input template
+    :type template: dict
+    :param bindings: the bindings of the fields in the order of the template
+    :type bindings: list[Binding]
+    :param calculators: the calculators by name, called with the parameters and
+        the scope passed to `fill`
+    :type calculators: dict[str, Callable[..., Any]]
+    :param default_values: the default values by name
+    :type default_values: dict
+    """
+
+    def __init__(
+        self,
+        template: dict,
+        bindings: list[Binding],
+        calculators: dict[str, Callable[..., Any]],
+        default_values: dict,
+    ):
+        self.template = template
+        self.bindings = bindings
+        self.calculators = calculators
+        self.default_values = default_values
+        # the fields, which can only be filled from the parameters
+        self.required = [
+            binding.path[-1] for binding in bindings
+            if binding.leaf and not any(
+                source[0] in ("calculator", "default") for source in binding.sources
+            )
+        ]
+        # the fields filled by calculators as (path, name)
+        self.calculated = [
+            (binding.path, binding.sources[0][1]) for binding in bindings
+            if binding.sources and binding.sources[0][0] == "calculator"
+        ]
+        self._nested = any(
+            source[0] in ("nested", "nested_list")
+            for binding in bindings for source in binding.sources
+        )
+
+    def fill(self, parameters: dict, scope: tuple = (), deferred: Iterable[str] = ()) -> tuple[list, dict]:
+        """This function fills a copy of the template with the parameters.
+
+        :param parameters: the parameters collected for the request
+        :type parameters: dict
+        :param scope: further arguments passed to the calculators, like the workflow
+            and cell their results are memoized for, defaults to ()
+        :type scope: tuple, optional
+        :param deferred: the calculators not called, as the caller fills their
+            fields itself, e.g. per cell; the fields keep the value of the template,
+            defaults to ()
+        :type deferred: Iterable[str], optional
+        :return: the fields, which could not be filled, and the filled template
+        :rtype: tuple[list, dict]
+        """
+        filled = copy.deepcopy(self.template)
+        index = self._index(parameters) if self._nested else {}
+        deferred = set(deferred)
+        miss = []
+        i = 0
+        while i < len(self.bindings):
+            binding = self.bindings[i]
+            if binding.sources and binding.sources[0][0] == "calculator" and binding.sources[0][1] in deferred:
+                i += binding.skip + 1
+                continue
+            found, value = self._resolve(binding, parameters, index, scope)
+            if found:
+                parent = filled
+                for key in binding.path[:-1]:
+                    parent = parent[key]
+                parent[binding.path[-1]] = value
+                i += binding.skip + 1
+                continue
+            if binding.leaf:
+                miss.append(binding.path[-1])
+            i += 1
+        return miss, filled
+
+    def _index(self, parameters: dict) -> dict:
+        # the fields inside the parameters, the later parameters win like before
+        index = {}
+        for value in parameters.values():
+            if isinstance(value, dict):
+                index.update(value)
+        return index
+
+    def _resolve(self, binding: Binding, parameters: dict, index: dict, scope: tuple) -> tuple[bool, Any]:
+        for source in binding.sources:
+            kind = source[0]
+            if kind == "calculator":
+                return True, self.calculators[source[1]](parameters, *scope)
+            if kind == "param":
+                value = parameters
+                for key in source[1]:
+                    if not isinstance(value, dict) or key not in value:
+                        break
+                    value = value[key]
+                else:
+                    if binding.leaf or isinstance(value, dict):
+                        return True, value
+            elif kind == "default":
+                return True, self.default_values[source[1]]
+            elif kind == "nested":
+                value = index.get(source[1])
+                if isinstance(value, dict) and value.keys() == source[2]:
+                    return True, value
+            elif kind == "nested_list":
+                value = index.get(source[1])
+                if isinstance(value, list) and any(
+                    isinstance(item, dict) and item.keys() == keys
+                    for item in value for keys in source[2]
+                ):
+                    return True, value
+        return False, None
+
+
+class TemplateCompiler:
+    """A class compiling the input templates of the FINALES server into plans and
+    caching them per (quantity, method). A plan is compiled again, if the template
+    changed. All methods are thread-safe.
+
+    :param calculators: the calculators by the name of the field they calculate,
+        called with the parameters and the scope passed to `TemplatePlan.fill`
+    :type calculators: dict[str, Callable[..., Any]]
+    :param default_values: the default values by the name of the field
+    :type default_values: dict
+    """
+
+    def __init__(self, calculators: dict[str, Callable[..., Any]], default_values: dict):
+        self.calculators = calculators
+        self.default_values = default_values
+        self._plans: dict[tuple[str, str], TemplatePlan] = {}
+        self._lock = threading.Lock()
+
+    def plan(self, quantity: str, method: str, template: dict) -> TemplatePlan:
+        """This function returns the plan for a template, compiling it on the first
+        use.
+
+        :param quantity: the name of the quantity
+        :type quantity: str
+        :param method: the name of the method
+        :type method: str
+        :param template: the input template
+        :type template: dict
+        :return: the plan
+        :rtype: TemplatePlan
+        """
+        key = (quantity, method)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None and plan.template is template:
+                return plan
+        plan = self.compile(template)
+        if plan.required:
+            logger.info(
+                "Template for %s with method %s needs from the parameters: %s", quantity, method, plan.required
+            )
+        with self._lock:
+            self._plans[key] = plan
+        return plan
+
+    def compile(self, template: dict) -> TemplatePlan:
+        """This function compiles a template into a plan.
+
+        :param template: the input template
+        :type template: dict
+        :return: the plan
+        :rtype: TemplatePlan
+        """
+        bindings: list[Binding] = []
+        self._compile(template, (), bindings)
+        return TemplatePlan(template, bindings, self.calculators, self.default_values)
+
+    def _compile(self, node: dict, path: tuple, bindings: list[Binding]) -> None:
+        for key, value in node.items():
+            field_path = path + (key,)
+            sources = []
+            if key in self.calculators:
+                sources.append(("calculator", key))
+            if path:
+                sources.append(("param", (path[-1], key)))
+            if isinstance(value, dict) and value and key not in self.calculators:
+                sources.append(("nested", key, value.keys()))
+                position = len(bindings)
+                bindings.append(None)
+                self._compile(value, field_path, bindings)
+                bindings[position] = Binding(
+                    field_path, tuple(sources), leaf=False, skip=len(bindings) - position - 1
+                )
+                continue
+            sources.append(("param", (key,)))
+            if key in self.default_values:
+                sources.append(("default", key))
+            if path and isinstance(value, list):
+                keys = tuple(item.keys() for item in value if isinstance(item, dict))
+                if keys:
+                    sources.append(("nested_list", path[-1], keys))
+            bindings.append(Binding(field_path, tuple(sources), leaf=True, skip=0))
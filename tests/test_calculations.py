@@ -0,0 +1,122 @@
+import pytest
+
+from Overlort.calculations import (
+    BATCH_QUANTITIES, CV_I_cutoff, CV_I_cutoff_formation, CalculationRegistry, I_max, calculate_batch, capacity,
+    volume,
+)
+from Overlort.calculations import registry as calculations
+
+CALCULATOR_CLASSES = {
+    "capacity": capacity, "I_max": I_max, "CV_I_cutoff": CV_I_cutoff,
+    "CV_I_cutoff_formation": CV_I_cutoff_formation, "volume": volume,
+}
+
+PARAMETER = {"battery_chemistry": {"cathode": {"mass_loading": 1.2, "size": 1.5}}, "batch_volume": 16}
+
+CELLS = [
+    {"cell_info": {"cell_id": "cell_" + str(i), "battery_chemistry": {"cathode": {"mass_loading": 1.0 + i / 7, "size": 1.5 + i / 3}}}}
+    for i in range(5)
+] + [{"cell_info": {"cell_id": "cell_5"}}]
+
+
+def _cell_parameter(parameter, cell):
+    # the parameters of a single cell, whose own cathode replaces the one of the batch
+    cathode = cell["cell_info"].get("battery_chemistry", parameter["battery_chemistry"])["cathode"]
+    return dict(parameter, battery_chemistry=dict(parameter["battery_chemistry"], cathode=cathode))
+
+
+@pytest.mark.parametrize("parameter", [PARAMETER, dict(PARAMETER, CV_I_cutoff=0.002)])
+def test_batch_equals_the_calculators_per_cell(parameter):
+    batch = calculate_batch(parameter, CELLS)
+    assert set(batch) == set(BATCH_QUANTITIES)
+    for name in BATCH_QUANTITIES:
+        assert batch[name].shape == (len(CELLS),)
+        for i, cell in enumerate(CELLS):
+            cell_parameter = _cell_parameter(parameter, cell)
+            scalar = CALCULATOR_CLASSES[name](parameter=cell_parameter).calculate(parameter=cell_parameter)
+            assert batch[name][i] == scalar
+            calculations.forget("batch")
+            assert calculations.calculate(name, cell_parameter, "batch", cell["cell_info"]["cell_id"]) == scalar
+    calculations.forget("batch")
+
+
+def test_batch_without_cells_is_the_parameter_cathode():
+    batch = calculate_batch(PARAMETER, names=["capacity", "volume"])
+    assert set(batch) == {"capacity", "volume"}
+    assert batch["capacity"][0] == capacity(parameter=PARAMETER).calculate(parameter=PARAMETER)
+
+
+def test_given_cutoff_needs_no_cathode():
+    batch = calculate_batch({"CV_I_cutoff": 0.002}, [{}, {}], names=["CV_I_cutoff"])
+    assert list(batch["CV_I_cutoff"]) == [0.002, 0.002]
+    with pytest.raises(KeyError):
+        calculate_batch({}, [{}], names=["capacity"])
+
+
+def _registry(calls, hook=None):
+    registry = CalculationRegistry(hook=hook)
+
+    @registry.register("area", inputs=(("cathode", "size"),))
+    def area(parameter, results):
+        calls.append("area")
+        return parameter["cathode"]["size"] * 2
+
+    @registry.register("charge", inputs=(("cathode", "mass_loading"),), depends=("area",))
+    def charge(parameter, results):
+        calls.append("charge")
+        return parameter["cathode"]["mass_loading"] * results["area"]
+
+    return registry
+
+
+def test_memoized_results_are_hit():
+    calls = []
+    registry = _registry(calls)
+    parameter = {"cathode": {"mass_loading": 2, "size": 3}, "other": 1}
+    assert registry.calculate("charge", parameter, "wf", "cell") == 12
+    # a parameter not read by the calculators does not invalidate the results
+    assert registry.calculate("charge", dict(parameter, other=2), "wf", "cell") == 12
+    assert calls == ["area", "charge"]
+    assert registry.stats()["charge"]["hits"] == 1
+    assert registry.stats()["area"] == dict(registry.stats()["area"], calls=2, hits=1)
+
+
+def test_memoized_results_are_kept_per_workflow_and_cell():
+    calls = []
+    registry = _registry(calls)
+    parameter = {"cathode": {"mass_loading": 2, "size": 3}}
+    for workflow, cell in [("wf", "a"), ("wf", "b"), ("other", "a")]:
+        registry.calculate("area", parameter, workflow, cell)
+    assert calls == ["area"] * 3
+    registry.forget("wf")
+    registry.calculate("area", parameter, "wf", "a")
+    registry.calculate("area", parameter, "other", "a")
+    assert calls == ["area"] * 4
+
+
+def test_changed_input_invalidates_the_result_and_its_dependents():
+    calls = []
+    registry = _registry(calls)
+    parameter = {"cathode": {"mass_loading": 2, "size": 3}}
+    registry.calculate("charge", parameter, "wf")
+    # only the calculator reading the changed input is evaluated again
+    assert registry.calculate("charge", {"cathode": {"mass_loading": 4, "size": 3}}, "wf") == 24
+    assert calls == ["area", "charge", "charge"]
+    # a changed dependency invalidates the calculators using it
+    assert registry.calculate("charge", {"cathode": {"mass_loading": 4, "size": 5}}, "wf") == 40
+    assert calls == ["area", "charge", "charge", "area", "charge"]
+
+
+def test_hook_sees_each_evaluation():
+    seen = []
+    registry = _registry([], hook=lambda name, elapsed_s, memoized: seen.append((name, memoized)))
+    parameter = {"cathode": {"mass_loading": 2, "size": 3}}
+    registry.calculate("charge", parameter)
+    registry.calculate("charge", parameter)
+    assert seen == [("area", False), ("charge", False), ("area", True), ("charge", True)]
+
+
+def test_unknown_dependency_is_refused():
+    registry = CalculationRegistry()
+    with pytest.raises(ValueError):
+        registry.register("charge", depends=("area",))(lambda parameter, results: 0)
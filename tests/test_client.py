@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from Overlort.connection.client import FINALESClient
+from Overlort.connection.poster import RequestPoster
+
+
+class _SlowServer:
+    # answers each request after a delay and records the most requests in flight
+    def __init__(self, delay_s=0.05):
+        self.in_flight = 0
+        self.peak = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._answer()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._answer()
+
+            def _answer(self):
+                with lock:
+                    server.in_flight += 1
+                    server.peak = max(server.peak, server.in_flight)
+                time.sleep(delay_s)
+                with lock:
+                    server.in_flight -= 1
+                data = json.dumps("ok").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = _SlowServer()
+    yield server
+    server.close()
+
+
+def test_requests_in_flight_are_limited(server):
+    client = FINALESClient("127.0.0.1", server.port, max_in_flight=3, pool_size=16)
+    threads = [threading.Thread(target=client.get, args=("/results_requested/",)) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.peak == 3
+
+
+def test_posts_of_several_posters_are_limited(server):
+    # the poster posts up to 8 requests at once, the client lets only 4 pass
+    client = FINALESClient("127.0.0.1", server.port, max_in_flight=4, pool_size=16)
+    posters = [RequestPoster(client, max_workers=8) for _ in range(2)]
+    threads = [
+        threading.Thread(target=poster.post_many, args=([{"quantity": "capacity"}] * 8,))
+        for poster in posters
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.peak == 4
+
+
+def test_no_limit_by_default(server):
+    client = FINALESClient("127.0.0.1", server.port, pool_size=16)
+    RequestPoster(client, max_workers=8).post_many([{"quantity": "capacity"}] * 8)
+    assert server.peak > 4
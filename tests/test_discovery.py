@@ -0,0 +1,77 @@
+from Overlort.workflow.discovery import RequestDiscovery
+
+SUPPORTED = [("degradationEOL", "degradation_workflow")]
+
+
+def _pending(uuid, quantity="degradationEOL", method="degradation_workflow"):
+    return {"uuid": uuid, "request": {"quantity": quantity, "methods": [method], "parameters": {}}}
+
+
+class _Validator:
+    # validates every request and counts the calls
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def __call__(self, pendingItem):
+        self.calls.append(pendingItem["uuid"])
+        if pendingItem["uuid"] in self.fail:
+            raise ValueError("out of range")
+        return dict(pendingItem["request"], validated=True)
+
+
+def test_requests_are_validated_once():
+    discovery = RequestDiscovery(SUPPORTED)
+    validate = _Validator()
+    for _ in range(3):
+        accepted = discovery.filter([_pending("a"), _pending("b")], validate)
+        assert [item["uuid"] for item in accepted] == ["a", "b"]
+        assert all(item["request"]["validated"] for item in accepted)
+    assert validate.calls == ["a", "b"]
+    assert (discovery.validated, discovery.skipped) == (2, 4)
+
+
+def test_requests_for_other_tenants_are_not_validated():
+    discovery = RequestDiscovery(SUPPORTED)
+    validate = _Validator()
+    pending = [
+        _pending("other quantity", quantity="capacity"),
+        _pending("other method", method="degradation_model"),
+        {"uuid": "no request"},
+        _pending("ours"),
+    ]
+    accepted = discovery.filter(pending, validate)
+    assert [item["uuid"] for item in accepted] == ["ours"]
+    assert validate.calls == ["ours"]
+    # the outcome for the other requests is remembered as well
+    discovery.filter(pending, validate)
+    assert validate.calls == ["ours"]
+
+
+def test_invalid_request_is_refused_once():
+    discovery = RequestDiscovery(SUPPORTED)
+    validate = _Validator(fail={"bad"})
+    assert discovery.filter([_pending("bad")], validate) == []
+    assert discovery.filter([_pending("bad")], validate) == []
+    assert validate.calls == ["bad"]
+
+
+def test_requests_no_longer_pending_are_forgotten():
+    discovery = RequestDiscovery(SUPPORTED)
+    validate = _Validator()
+    discovery.filter([_pending("a"), _pending("b")], validate)
+    discovery.filter([_pending("b")], validate)
+    # "a" was reserved and is pending again, e.g. after its status was reset
+    discovery.filter([_pending("a"), _pending("b")], validate)
+    assert validate.calls == ["a", "b", "a"]
+
+
+def test_seen_set_evicts_the_least_recently_pending():
+    discovery = RequestDiscovery(SUPPORTED, max_seen=2)
+    validate = _Validator()
+    discovery.filter([_pending("a"), _pending("b"), _pending("c")], validate)
+    assert list(discovery._seen) == ["b", "c"]
+    # "a" is validated again and evicts "b", which was seen least recently
+    discovery.filter([_pending("c"), _pending("a"), _pending("b")], validate)
+    assert validate.calls == ["a", "b", "c", "a", "b"]
+    assert len(discovery._seen) == 2
@@ -0,0 +1,128 @@
+import pytest
+
+from Overlort.workflow.limitations import LimitationValidator
+
+EC = {"SMILES": "C1COC(=O)O1", "InChIKey": "KMTRUDSVKNLOMY-UHFFFAOYSA-N"}
+LIPF6 = {"SMILES": "[Li+].F[P-](F)(F)(F)(F)F", "InChIKey": "AXPLOJNSKRXQPA-UHFFFAOYSA-N"}
+EMC = {"SMILES": "CCOC(=O)OC", "InChIKey": "JBTWLSYIZRCDFO-UHFFFAOYSA-N"}
+
+# limitations like those of the method "degradation_workflow"
+LIMITATIONS = {
+    "battery_chemistry": {
+        "electrolyte": [[
+            {"chemical": EC, "fraction": [{"min": 0.1, "max": 0.5}], "fraction_type": ["molPerMol"]},
+            {"chemical": LIPF6, "fraction": [{"min": 0, "max": 0.2}], "fraction_type": ["molPerMol"]},
+            {"chemical": EMC, "fraction": [{"min": 0.3, "max": 0.9}], "fraction_type": ["molPerMol"]},
+        ]],
+        "cathode": {"mass_loading": [{"min": 0.5, "max": 2}, {"min": 3, "max": 4}]},
+    },
+    "average_charging_rate": [{"min": 0.1, "max": 1}],
+    "input_cycles": [[{"min": 0, "max": 5}]],
+    "cycling_protocol": ["BIG-MAP-Standard", "fast"],
+    "temperature": 25,
+}
+
+
+def _electrolyte(ec=0.3, lipf6=0.1, emc=0.6, fraction_type="molPerMol"):
+    return [
+        {"chemical": chemical, "fraction": fraction, "fraction_type": fraction_type}
+        for chemical, fraction in [(EC, ec), (LIPF6, lipf6), (EMC, emc)] if fraction is not None
+    ]
+
+
+def _parameters(**changes):
+    parameters = {
+        "battery_chemistry": {"electrolyte": _electrolyte(), "cathode": {"mass_loading": 1.2}},
+        "average_charging_rate": 0.5,
+        "input_cycles": [[3.0, 2.9, 2.8], [3.1, 2.7]],
+        "cycling_protocol": "BIG-MAP-Standard",
+        "temperature": 25,
+    }
+    parameters.update(changes)
+    return parameters
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return LimitationValidator(LIMITATIONS)
+
+
+def test_valid_parameters(validator):
+    assert validator.validate(_parameters()) == []
+    # missing parameters are not checked
+    assert validator.validate({}) == []
+
+
+def test_ranges_of_single_numbers(validator):
+    assert validator.validate(_parameters(average_charging_rate=1.5)) == [
+        "average_charging_rate = 1.5 is out of range"
+    ]
+    # a number is fine within any of its ranges
+    chemistry = {"electrolyte": _electrolyte(), "cathode": {"mass_loading": 3.5}}
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == []
+    chemistry["cathode"]["mass_loading"] = 2.5
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == [
+        "battery_chemistry.cathode.mass_loading = 2.5 is out of range"
+    ]
+    assert validator.validate(_parameters(average_charging_rate="fast")) == [
+        "average_charging_rate is not a number"
+    ]
+
+
+def test_several_values_for_a_single_range(validator):
+    assert validator.validate(_parameters(average_charging_rate=[0.2, 0.9])) == []
+    [message] = validator.validate(_parameters(average_charging_rate=[0.2, 2, 3]))
+    assert message.startswith("average_charging_rate has 2 values out of range")
+
+
+def test_lists_of_numbers(validator):
+    [message] = validator.validate(_parameters(input_cycles=[[3.0, 2.9], [6.0, -1.0, 2.0]]))
+    assert message == "input_cycles has 2 values out of range, e.g. 6.0"
+    assert validator.validate(_parameters(input_cycles=[["a"]])) == ["input_cycles is not a list of numbers"]
+
+
+def test_allowed_values(validator):
+    assert validator.validate(_parameters(cycling_protocol="fast")) == []
+    assert validator.validate(_parameters(cycling_protocol="slow")) == [
+        "cycling_protocol = slow is not one of ['BIG-MAP-Standard', 'fast']"
+    ]
+    assert validator.validate(_parameters(temperature=30)) == ["temperature = 30 is not one of [25]"]
+
+
+@pytest.mark.parametrize("electrolyte", [
+    _electrolyte(ec=0.6, emc=0.3),
+    _electrolyte(fraction_type="wtPerWt"),
+    _electrolyte() + [{"chemical": {"SMILES": "O"}, "fraction": 0.01, "fraction_type": "molPerMol"}],
+    _electrolyte(emc=None),
+])
+def test_formulation_violations(validator, electrolyte):
+    chemistry = {"electrolyte": electrolyte, "cathode": {"mass_loading": 1.2}}
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == [
+        "battery_chemistry.electrolyte does not fit any of the allowed formulations"
+    ]
+
+
+def test_formulations(validator):
+    # a chemical missing in the request has a fraction of 0
+    chemistry = {"electrolyte": _electrolyte(lipf6=None, ec=0.4), "cathode": {"mass_loading": 1.2}}
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == []
+    # a chemical is found by either of its names, the formulation may be wrapped
+    electrolyte = [dict(part, chemical={"InChIKey": part["chemical"]["InChIKey"]}) for part in _electrolyte()]
+    chemistry = {"electrolyte": {"formulation": electrolyte}, "cathode": {"mass_loading": 1.2}}
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == []
+    chemistry = {"electrolyte": "EC:EMC", "cathode": {"mass_loading": 1.2}}
+    assert validator.validate(_parameters(battery_chemistry=chemistry)) == [
+        "battery_chemistry.electrolyte is not a formulation"
+    ]
+
+
+def test_all_violations_are_reported(validator):
+    violations = validator.validate(_parameters(
+        average_charging_rate=5, input_cycles=[[9]], cycling_protocol="slow",
+    ))
+    assert len(violations) == 3
+
+
+def test_no_limitations():
+    assert LimitationValidator({}).validate(_parameters()) == []
+    assert LimitationValidator(None).validate(_parameters()) == []
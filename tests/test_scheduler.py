@@ -0,0 +1,92 @@
+import pytest
+
+from Overlort.connection.scheduler import PollScheduler
+
+TRANSPORT = ("transport", "transport_service")
+CAPACITY = ("capacity", "cycling")
+
+
+def _scheduler(**kwargs):
+    scheduler = PollScheduler(**dict(dict(min_interval_s=5, max_interval_s=3600, backoff=2), **kwargs))
+    # requests known at the first sync are polled right away after a restart
+    scheduler.sync({}, now=0)
+    return scheduler
+
+
+def test_restored_requests_are_polled_right_away():
+    scheduler = PollScheduler(min_interval_s=5)
+    scheduler.sync({"a": TRANSPORT}, now=0)
+    assert scheduler.due(now=0) == {"a"}
+    scheduler.sync({"a": TRANSPORT, "b": TRANSPORT}, now=1)
+    assert scheduler.due(now=1) == {"a"}
+
+
+def test_new_request_waits_for_the_shortest_interval():
+    scheduler = _scheduler()
+    scheduler.sync({"a": TRANSPORT}, now=10)
+    assert scheduler.due(now=14) == set()
+    assert scheduler.due(now=15) == {"a"}
+    # a due request stays due until it is polled
+    assert scheduler.due(now=16) == {"a"}
+    assert scheduler.wait_s(max_s=60, now=16) == 0
+
+
+def test_backoff_is_capped_by_the_expected_duration():
+    scheduler = _scheduler(expected_duration_s={"capacity": 400})
+    scheduler.sync({"a": CAPACITY}, now=0)
+    intervals = []
+    now = 5
+    for _ in range(6):
+        assert scheduler.due(now=now) == {"a"}
+        scheduler.polled("a", found=False, now=now)
+        assert scheduler.due(now=now) == set()
+        interval = scheduler.wait_s(max_s=3600, now=now)
+        intervals.append(interval)
+        now += interval
+    # 5 s doubled per poll up to a tenth of the expected 400 s
+    assert intervals == [10, 20, 40, 40, 40, 40]
+
+
+def test_caps_without_expected_duration():
+    scheduler = _scheduler(max_interval_s=60)
+    assert scheduler.interval(TRANSPORT, attempts=1) == 10
+    assert scheduler.interval(TRANSPORT, attempts=10) == 60
+    assert scheduler.interval(None, attempts=1000) == 60
+    # a cap below the shortest interval is raised to it
+    scheduler.expected_duration_s = {"transport": 1}
+    assert scheduler.interval(TRANSPORT, attempts=3) == 5
+
+
+def test_observed_durations_set_the_first_poll():
+    scheduler = _scheduler()
+    scheduler.sync({"a": CAPACITY}, now=0)
+    scheduler.polled("a", found=True, now=30)
+    assert scheduler.expected_s(CAPACITY) == 30
+    scheduler.sync({"b": CAPACITY}, now=100)
+    assert scheduler.due(now=129) == set()
+    assert scheduler.due(now=130) == {"b"}
+
+
+def test_found_request_is_rescheduled_until_it_leaves_the_queue():
+    scheduler = _scheduler()
+    scheduler.sync({"a": TRANSPORT}, now=0)
+    assert scheduler.due(now=5) == {"a"}
+    scheduler.polled("a", found=True, now=5)
+    # handling the result failed, so the request is still open and polled again
+    scheduler.sync({"a": TRANSPORT}, now=6)
+    assert scheduler.due(now=9) == set()
+    assert scheduler.due(now=10) == {"a"}
+    # finding it again does not add a duration, as the step had ended before
+    scheduler.polled("a", found=True, now=10)
+    assert list(scheduler._durations[TRANSPORT]) == [5]
+    # once handled, the request leaves the queue and the scheduler
+    scheduler.sync({}, now=11)
+    assert scheduler.due(now=100) == set()
+    assert scheduler.wait_s(max_s=60, now=100) == 60
+
+
+@pytest.mark.parametrize("found", [True, False])
+def test_unknown_request_is_ignored(found):
+    scheduler = _scheduler()
+    scheduler.polled("missing", found=found, now=0)
+    assert scheduler.polls == 0
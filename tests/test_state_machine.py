@@ -0,0 +1,108 @@
+import glob
+import json
+
+import pytest
+
+from Overlort.workflow.state_machine import WorkflowStateMachine
+
+WORKFLOW = [
+    ("cycling_channel", "service"),
+    ("electrolyte", "flow", ["electrolyte"]),
+    ("transport", "transport_service"),
+    ("cell_assembly", "autobass_assembly", ["electrolyte", "anode", "cathode"]),
+    ("transport", "transport_service"),
+    ("capacity", "cycling"),
+    ("degradationEOL", "degradation_model"),
+]
+
+INITIAL = {"quantity": "degradationEOL", "methods": ["degradation_workflow"]}
+
+
+def _request(quantity, method):
+    return {"quantity": quantity, "methods": [method]}
+
+
+def _resultobject(*quantities):
+    # the entries as the Overlort adds them, a repeated quantity renames the earlier
+    resultobject = {"request_0": {"request": {"request": INITIAL}, "result": {}}}
+    for quantity in quantities:
+        if quantity in resultobject:
+            resultobject[quantity + "-1"] = resultobject.pop(quantity)
+        resultobject[quantity] = {"request": {}, "result": {}}
+    return resultobject
+
+
+def test_steps_follow_the_workflow():
+    machine = WorkflowStateMachine(WORKFLOW)
+    assert machine.next_step(_resultobject(), INITIAL).quantity == "cycling_channel"
+    requested = []
+    for step in machine.steps[:-1]:
+        requested.append(step.quantity)
+        following = machine.next_step(_resultobject(*requested), _request(step.quantity, step.method))
+        assert following == machine.steps[step.index + 1]
+
+
+def test_repeated_quantity_is_told_apart():
+    machine = WorkflowStateMachine(WORKFLOW)
+    first = _resultobject("cycling_channel", "electrolyte", "transport")
+    second = _resultobject("cycling_channel", "electrolyte", "transport", "cell_assembly", "transport")
+    transport = _request("transport", "transport_service")
+    assert machine.next_step(first, transport).quantity == "cell_assembly"
+    assert machine.next_step(second, transport).quantity == "capacity"
+
+
+def test_staggered_capacity_results():
+    # the capacity results of the cells arrive over several ticks, so the request
+    # for the degradation of the first cells adds an entry before the last result
+    machine = WorkflowStateMachine(WORKFLOW)
+    resultobject = _resultobject(
+        "cycling_channel", "electrolyte", "transport", "cell_assembly", "transport", "capacity"
+    )
+    capacity = _request("capacity", "cycling")
+    assert machine.next_step(resultobject, capacity).quantity == "degradationEOL"
+    resultobject["degradationEOL"] = {"request": {}, "result": {}}
+    for _ in range(3):
+        assert machine.next_step(resultobject, capacity).quantity == "degradationEOL"
+    assert machine.next_step(resultobject, _request("degradationEOL", "degradation_model")) is None
+
+
+def test_unknown_step_is_refused():
+    machine = WorkflowStateMachine(WORKFLOW)
+    with pytest.raises(ValueError):
+        machine.state(_resultobject(), _request("viscosity", "simulation"))
+
+
+def test_staggered_capacity_results_end_to_end(tmp_path):
+    # the Overlort against the stand-in server listing one new capacity result per query
+    pytest.importorskip("FINALES2")
+    from Overlort.benchmark.run import run_benchmark
+
+    report = run_benchmark(
+        workflows=2, cells=4, tick_s=0.05, timeout_s=60, directory=str(tmp_path),
+        max_new_results={"capacity": 1},
+    )
+    assert report["completed"] == 2
+    # the archive keeps the full degradation results of all cells
+    for path in glob.glob(str(tmp_path / "results_Overlort" / "*.json")):
+        if not path.endswith(".result.json"):
+            with open(path) as file:
+                results = json.load(file)["workflow"]["degradationEOL"]["result"]
+            assert len(results) == 4
+            assert all(result["result"]["data"] for result in results.values())
+
+
+def test_failed_post_does_not_duplicate_cells(tmp_path):
+    # one request for the degradation of a cell is refused, only that cell is posted again
+    pytest.importorskip("FINALES2")
+    from Overlort.benchmark.run import run_benchmark
+
+    report = run_benchmark(
+        workflows=1, cells=4, tick_s=0.05, timeout_s=60, directory=str(tmp_path / "state"),
+        failed_posts={"degradationEOL": 1},
+    )
+    assert report["completed"] == 1
+    [path] = glob.glob(str(tmp_path / "state" / "results_Overlort" / "*.result.json"))
+    with open(path) as file:
+        final_result = json.load(file)
+    assert len(final_result["data"]["degradationEOL"]) == 4
+    assert report["http_calls_by_endpoint"]["POST /requests/ 500"] == 1
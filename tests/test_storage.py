@@ -0,0 +1,172 @@
+import copy
+import json
+import os
+
+import pytest
+
+from Overlort.storage.journal import StateJournal, apply_record
+from Overlort.storage.migrate import migrate
+from Overlort.storage.sqlite_store import SQLiteStore
+
+STATE = {
+    "request_queue": [["r1", "wf1"]],
+    "resultobjects": {
+        "wf1": {
+            "request_0": {"request": {"uuid": "wf1"}, "result": {}},
+            "transport": {"request": {"quantity": "transport"}, "result": {}},
+        },
+    },
+}
+
+# the changes of a transport result and the capacity step of one cell, a workflow
+# added and ended and a step deleted after a failed request
+RECORDS = [
+    ("set", ["wf1", "transport", "result"], {"result": {"request_uuid": "r1", "data": {"x": 1}}}),
+    ("dequeue", None, ["r1", "wf1"]),
+    ("rename", ["wf1", "transport"], "transport-1"),
+    ("set", ["wf1", "capacity"], {"request": {}, "result": {}}),
+    ("set", ["wf1", "capacity", "request", "r2"], {"quantity": "capacity"}),
+    ("enqueue", None, ["r2", "wf1"]),
+    ("set", ["wf1", "capacity", "result", "r2"], {"result": {"request_uuid": "r2", "data": {}}}),
+    ("dequeue", None, ["r2", "wf1"]),
+    ("set", ["wf1", "degradationEOL"], {"request": {}, "result": {}}),
+    ("del", ["wf1", "degradationEOL"], None),
+    ("set", ["wf2"], {"request_0": {"request": {"uuid": "wf2"}, "result": {}}}),
+    ("enqueue", None, ["r3", "wf2"]),
+    ("del", ["wf2"], None),
+    ("dequeue", None, ["r3", "wf2"]),
+]
+
+
+def _expected(records):
+    state = copy.deepcopy(STATE)
+    for op, path, value in records:
+        apply_record(state, {"op": op, "path": path, "value": value})
+    return state
+
+
+def _state(loaded):
+    # the snapshot also keeps its creation time and the last change it covers
+    return {"request_queue": loaded["request_queue"], "resultobjects": loaded["resultobjects"]}
+
+
+def _record(store, records):
+    for op, path, value in records:
+        store.record(op, path, value)
+    store.commit()
+
+
+def _journal(tmp_path, **kwargs):
+    journal = StateJournal(str(tmp_path / "overlort_info.json"), **kwargs)
+    journal.compact(STATE["request_queue"], STATE["resultobjects"], wait=True)
+    return journal
+
+
+def test_journal_is_replayed(tmp_path):
+    journal = _journal(tmp_path)
+    _record(journal, RECORDS)
+    journal.close()
+    assert _state(StateJournal(journal.filepath).load()) == _expected(RECORDS)
+
+
+def test_journal_segments_are_replayed_until_the_snapshot_is_written(tmp_path):
+    journal = _journal(tmp_path)
+    _record(journal, RECORDS[:5])
+    # a compaction, whose snapshot was lost in a crash, left a closed segment
+    os.replace(journal.journalpath, journal.journalpath + ".5")
+    _record(journal, RECORDS[5:])
+    journal.close()
+    assert _state(StateJournal(journal.filepath).load()) == _expected(RECORDS)
+
+
+def test_compaction_drops_the_segments(tmp_path):
+    journal = _journal(tmp_path, compact_every=5)
+    _record(journal, RECORDS[:5])
+    assert journal.needs_compaction()
+    state = _expected(RECORDS[:5])
+    journal.compact(state["request_queue"], state["resultobjects"], wait=True)
+    assert not journal.needs_compaction()
+    assert not os.path.exists(journal.journalpath)
+    assert journal._segments() == []
+    _record(journal, RECORDS[5:])
+    journal.close()
+    loaded = StateJournal(journal.filepath).load()
+    assert loaded["journal_seq"] == 5
+    assert _state(loaded) == _expected(RECORDS)
+
+
+def test_torn_journal_record_is_ignored(tmp_path):
+    journal = _journal(tmp_path)
+    _record(journal, RECORDS[:3])
+    journal.close()
+    with open(journal.journalpath, "a") as fileobj:
+        fileobj.write('{"seq": 4, "op": "set", "pa')
+    assert _state(StateJournal(journal.filepath).load()) == _expected(RECORDS[:3])
+
+
+@pytest.mark.parametrize("content", ['{"request_queue": [], "resultob', "{}", ""])
+def test_invalid_newest_snapshot_falls_back(tmp_path, content):
+    journal = _journal(tmp_path)
+    older = _expected(RECORDS[:2])
+    journal.compact(older["request_queue"], older["resultobjects"], wait=True)
+    newest = _expected(RECORDS)
+    journal.compact(newest["request_queue"], newest["resultobjects"], wait=True)
+    assert os.path.exists(journal.filepath + ".2")
+    with open(journal.filepath, "w") as fileobj:
+        fileobj.write(content)
+    assert _state(StateJournal(journal.filepath).load()) == older
+
+
+def test_no_valid_snapshot_is_an_error(tmp_path):
+    journal = _journal(tmp_path)
+    journal.compact(STATE["request_queue"], STATE["resultobjects"], wait=True)
+    for path in [journal.filepath, journal.filepath + ".1"]:
+        with open(path, "w") as fileobj:
+            fileobj.write("{")
+    with pytest.raises(RuntimeError):
+        StateJournal(journal.filepath).load()
+    assert StateJournal(str(tmp_path / "missing.json")).load() is None
+
+
+def test_sqlite_round_trip(tmp_path):
+    store = SQLiteStore(str(tmp_path / "overlort.db"))
+    assert store.load() is None
+    store.compact(STATE["request_queue"], STATE["resultobjects"])
+    _record(store, RECORDS)
+    store.close()
+    loaded = SQLiteStore(store.filepath).load()
+    assert loaded == _expected(RECORDS)
+    assert list(loaded["resultobjects"]["wf1"]) == ["request_0", "transport-1", "capacity"]
+
+
+def test_sqlite_keeps_results_and_closed_workflows(tmp_path):
+    store = SQLiteStore(str(tmp_path / "overlort.db"))
+    store.compact(STATE["request_queue"], STATE["resultobjects"])
+    _record(store, RECORDS)
+    connection = store._connection
+    assert dict(connection.execute("SELECT uuid, status FROM workflows")) == {"wf1": "active", "wf2": "closed"}
+    assert dict(connection.execute("SELECT request_uuid, step FROM results")) == {"r1": "transport-1", "r2": "capacity"}
+    assert dict(connection.execute("SELECT name, status FROM steps WHERE workflow_uuid = 'wf1'")) == {
+        "request_0": "open", "transport-1": "done", "capacity": "done",
+    }
+
+
+def test_migrate_snapshot_and_journal(tmp_path):
+    journal = _journal(tmp_path)
+    _record(journal, RECORDS)
+    journal.close()
+    database = str(tmp_path / "overlort.db")
+    assert migrate(journal.filepath, database) == 1
+    assert SQLiteStore(database).load() == _expected(RECORDS)
+
+
+def test_migrate_overlort_info(tmp_path):
+    # a state saved before the journal, without journal_seq
+    snapshot = str(tmp_path / "overlort_info.json")
+    with open(snapshot, "w") as fileobj:
+        json.dump(dict(STATE, creation_time="2024-01-01 00:00:00 CET"), fileobj)
+    database = str(tmp_path / "overlort.db")
+    assert migrate(snapshot, database) == 1
+    assert SQLiteStore(database).load() == STATE
+    with pytest.raises(FileNotFoundError):
+        migrate(str(tmp_path / "missing.json"), database)
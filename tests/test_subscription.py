@@ -0,0 +1,72 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from Overlort.connection.subscription import ResultListener
+
+
+def _result(requestID):
+    return {"uuid": "result-" + requestID, "result": {"request_uuid": requestID, "data": {}}}
+
+
+def _push(listener, payload, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token is not None:
+        headers["Authorization"] = "Bearer " + token
+    request = urllib.request.Request(
+        "http://127.0.0.1:" + str(listener.port) + listener.path,
+        data=json.dumps(payload).encode("utf-8"), headers=headers, method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status
+
+
+@pytest.fixture
+def listener():
+    listener = ResultListener(port=0, token="secret")
+    listener.start()
+    yield listener
+    listener.close()
+
+
+def test_pushed_results_are_taken_once(listener):
+    assert _push(listener, [_result("a"), _result("b")], token="secret") == 202
+    assert listener.wait(1)
+    assert set(listener.take(["a", "c"])) == {"a"}
+    assert listener.take(["a", "b"]) == {"b": _result("b")}
+
+
+def test_push_without_token_is_refused(listener):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _push(listener, _result("a"))
+    assert error.value.code == 401
+    assert listener.received == 0
+
+
+def test_pushed_results_end_to_end(tmp_path):
+    # the polls are due only after the timeout, so the workflow completes by pushes
+    pytest.importorskip("FINALES2")
+    from Overlort.benchmark.run import run_benchmark
+
+    report = run_benchmark(
+        workflows=1, cells=2, tick_s=0.05, timeout_s=30, directory=str(tmp_path),
+        push=True, reconcile_interval_s=60,
+    )
+    assert report["completed"] == 1
+    # five steps for the workflow and two per cell
+    assert report["pushes"] == {"delivered": 5 + 2 * 2}
+
+
+def test_missed_push_is_polled_end_to_end(tmp_path):
+    pytest.importorskip("FINALES2")
+    from Overlort.benchmark.run import run_benchmark
+
+    report = run_benchmark(
+        workflows=1, cells=2, tick_s=0.05, timeout_s=30, directory=str(tmp_path),
+        push=True, reconcile_interval_s=0.5, missed_pushes={"capacity": 1},
+    )
+    assert report["completed"] == 1
+    assert report["pushes"]["missed"] == 1
+    assert any(key.startswith("GET /results_requested/") for key in report["http_calls_by_endpoint"])